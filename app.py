@@ -1,16 +1,39 @@
-from flask import Flask, render_template, request, flash, jsonify
+from flask import (
+    Flask, render_template, request, flash, jsonify, Response, g, stream_with_context, send_file, abort, url_for
+)
 import folium
+import pandas as pd
 import logging
 import asyncio
+import time
 from logging.config import dictConfig
 import os
 import sys
+from jinja2 import FileSystemBytecodeCache
 
-from config.settings import LOGGING
-from config.constants import MARKET_TAGS
+from config.settings import (
+    LOGGING, DATA_RELOAD_INTERVAL, ATLAS_DB_PATH, FRAGMENT_CACHE_SIZE, FRAGMENT_CACHE_TTL, JINJA_BYTECODE_CACHE_DIR,
+    COMPRESSION_LEVEL, COMPRESSION_BROTLI_QUALITY, COMPRESSION_MIN_SIZE, STATIC_DIST_DIR,
+    CITY_SEARCH_MAX_RESULTS, CITY_SEARCH_CACHE_SECONDS,
+    ADMISSION_MAX_IN_FLIGHT, ADMISSION_MAX_QUEUE, ADMISSION_MAX_WAIT, ADMISSION_DEGRADE_AT, REQUEST_DEADLINE_SECONDS
+)
+from config.constants import MARKET_TAGS, FEATURE_WEIGHT_PRESETS, OPPORTUNITY_COMPONENT_LABELS
 from engine.market_engine import MarketAnalysisEngine
+from engine.city_index import CityNotFound
+from engine.export import EXPORT_COLUMNS, EXPORT_FORMATS, iter_atlas_export
 from engine.search_engine import SearchEngine
 from services.seo_service import SEOService
+from services.atlas_service import AtlasStore
+from utils.metrics import (
+    REGISTRY, span, start_request_timing, end_request_timing, format_server_timing
+)
+from utils.telemetry import TELEMETRY
+from utils.profiling import profiled
+from utils.fragment_cache import FragmentCache
+from utils.compression import ResponseCompressor
+from utils.static_assets import IMMUTABLE_CACHE_CONTROL, StaticAssets
+from utils.admission import AdmissionController, Overloaded, degraded, degraded_features
+from utils.resilience import ClientDisconnected, circuit_snapshot, request_budget
 
 # Initialize logging
 dictConfig(LOGGING)
@@ -20,8 +43,30 @@ app = Flask(__name__, static_folder='static')
 app.secret_key = 'your_secret_key_here'  # Move to settings in production
 app.config['DEBUG'] = True
 
+if JINJA_BYTECODE_CACHE_DIR:
+    os.makedirs(JINJA_BYTECODE_CACHE_DIR, exist_ok=True)
+    # A freshly booted worker loads compiled templates instead of compiling them on its first request
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_BYTECODE_CACHE_DIR)
+fragment_cache = FragmentCache(app.jinja_env, max_size=FRAGMENT_CACHE_SIZE, ttl=FRAGMENT_CACHE_TTL)
+compressor = ResponseCompressor(min_size=COMPRESSION_MIN_SIZE, gzip_level=COMPRESSION_LEVEL,
+                                brotli_quality=COMPRESSION_BROTLI_QUALITY)
+# Hashed, precompressed copies of static/; rebuilt here only if the deploy step did not already
+static_assets = StaticAssets(app.static_folder, STATIC_DIST_DIR)
+static_assets.load()
+
 engine = MarketAnalysisEngine()
 search_engine = SearchEngine()
+# Per worker: bounds concurrent analyses, sheds the excess with 429s and degrades the rest under load
+admission = AdmissionController(max_in_flight=ADMISSION_MAX_IN_FLIGHT, max_queue=ADMISSION_MAX_QUEUE,
+                                max_wait=ADMISSION_MAX_WAIT, degrade_at=ADMISSION_DEGRADE_AT)
+# Opened on first use once the atlas job (python -m engine.atlas) has created the database
+atlas_store = None
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds',
+    'Time spent handling HTTP requests',
+    ['endpoint', 'method', 'status']
+)
 
 # Increase recursion limit for Heroku
 if 'DYNO' in os.environ:
@@ -32,11 +77,52 @@ if 'DYNO' in os.environ:
 def format_number(value):
     return "{:,}".format(int(value))
 
-def create_map(similar_cities, target_city, target_state):
+@app.before_request
+def ensure_data_reloader():
+    # Runs per worker process; a no-op once the reloader thread is up
+    engine.start_reloader(DATA_RELOAD_INTERVAL)
+
+@app.before_request
+def start_timing():
+    g.request_start = time.perf_counter()
+    g.timing_token = start_request_timing()
+
+@app.after_request
+def record_timing(response):
+    token = g.pop('timing_token', None)
+    if token is None:
+        return response
+    timings = end_request_timing(token)
+    elapsed = time.perf_counter() - g.pop('request_start')
+    REQUEST_SECONDS.observe(elapsed, endpoint=request.endpoint or 'unknown',
+                            method=request.method, status=response.status_code)
+    if timings:
+        response.headers['Server-Timing'] = f"{format_server_timing(timings)}, total;dur={elapsed * 1000:.1f}"
+    return response
+
+@app.after_request
+def compress_response(response):
+    # Registered after record_timing so it runs first, and its time shows up in Server-Timing
+    return compressor.compress(request, response)
+
+def parse_radius(values, default=None):
+    """Search radius in miles from form/query values; None for a nationwide search (scope=national)."""
+    if values.get('scope') == 'national':
+        return None
+    return int(values.get('radius', default))
+
+def search_params(radius, preset):
+    """Query parameters that repeat a search's radius (or nationwide scope) and preset."""
+    params = {'radius': radius} if radius else {'scope': 'national'}
+    if preset:
+        params['preset'] = preset
+    return params
+
+def create_map(similar_cities, target_city, target_state, zoom_start=8):
     target_city_state = f"{target_city}, {target_state}".lower().strip()
     
     target_lat, target_lon = similar_cities.loc[target_city_state, ['lat', 'lng']]
-    m = folium.Map(location=[target_lat, target_lon], zoom_start=8)
+    m = folium.Map(location=[target_lat, target_lon], zoom_start=zoom_start)
 
     for idx, row in similar_cities.iterrows():
         color = 'red' if idx == target_city_state else \
@@ -52,129 +138,396 @@ def create_map(similar_cities, target_city, target_state):
 
     return m._repr_html_()
 
+def asset_url(filename):
+    """URL of a static asset: its content-hashed copy if built, else the plain static URL."""
+    hashed = static_assets.hashed_path(filename)
+    return url_for('asset', filename=hashed) if hashed else url_for('static', filename=filename)
+
+app.jinja_env.globals.update(fragment=fragment_cache.render, market_map=create_map, asset_url=asset_url,
+                             degraded_features=degraded_features)
+
+RESULTS_TEMPLATES = ['results.html', 'components/target_card.html', 'components/market_chart.html',
+                     'components/city_grid.html', 'components/search_results.html', 'components/seo_summary.html']
+# Compile the results page at import; with gunicorn's preload_app, workers fork with it already compiled
+for template_name in RESULTS_TEMPLATES:
+    app.jinja_env.get_template(template_name)
+
+# Columns the results page shows per city in the city grid and on the map
+GRID_COLUMNS = ['city', 'state_id', 'population_proper', 'housing_units', 'home_value', 'cvr_org', 'leads_org',
+                'cvr_paid', 'leads_paid', 'distance_to_target', 'opportunity_score', 'tags']
+MAP_COLUMNS = ['lat', 'lng', 'opportunity_category']
+
+def results_fragment_inputs(similar_cities, target_city, target_state, radius, with_map=True):
+    """Inputs of the results page's target card, map and city grid fragments (no map when with_map is False)."""
+    # Group the city grid once, rather than filtering every city per category in the template
+    cities_by_category = {'High': [], 'Average': []}
+    for category, city in zip(similar_cities['opportunity_category'],
+                              similar_cities.reindex(columns=GRID_COLUMNS).to_dict('records')):
+        if category in cities_by_category:
+            cities_by_category[category].append(city)
+    return {
+        'target_data': similar_cities.loc[f"{target_city}, {target_state}".lower()].to_dict(),
+        'cities_by_category': cities_by_category,
+        # The market_chart fragment builds the map, and only when these inputs change
+        'map_cities': similar_cities[MAP_COLUMNS] if with_map else None,
+        'zoom_start': 8 if radius else 4,
+    }
+
+def serp_fragment_input(market_analysis):
+    """The market analysis without its timestamp, which changes on every call and is not displayed."""
+    if market_analysis is None:
+        return None
+    return {key: value for key, value in market_analysis.items() if key != 'timestamp'}
+
 @app.route('/')
 def index():
     logger.info("Index route accessed")
-    return render_template('index.html')
+    return render_template('index.html', feature_presets=FEATURE_WEIGHT_PRESETS)
 
 @app.route('/analyze', methods=['POST'])
+@admission.admit
+@request_budget(REQUEST_DEADLINE_SECONDS)
+@profiled
 async def analyze():
     try:
         target_city = request.form['city']
         target_state = request.form['state']
-        radius = int(request.form['radius'])  # Get the radius from the form
-        
-        app.logger.info(f"Analyzing market for {target_city}, {target_state} with radius {radius} miles")
-        
-        similar_cities = engine.find_similar_cities(target_city, target_state, radius_miles=radius)
-        app.logger.info(f"Found {len(similar_cities)} similar cities")
+        radius = parse_radius(request.form)  # Get the radius from the form
+        preset = request.form.get('preset') or None
         
-        # Convert DataFrame to list of dictionaries
-        similar_cities_list = similar_cities.to_dict('records')
-        app.logger.debug(f"Similar cities data: {similar_cities_list}")
+        app.logger.info("Analyzing market for %s, %s %s (preset %s)", target_city, target_state,
+                        f"within {radius} miles" if radius else "nationwide", preset)
         
-        target_data = similar_cities.loc[f"{target_city}, {target_state}".lower()].to_dict()
-        app.logger.debug(f"Target data: {target_data}")
+        similar_cities = engine.find_similar_cities(target_city, target_state, radius_miles=radius, preset=preset)
+        app.logger.info("Found %d similar cities", len(similar_cities))
         
-        map_html = create_map(similar_cities, target_city, target_state)
+        fragment_inputs = results_fragment_inputs(similar_cities, target_city, target_state, radius,
+                                                  with_map=not degraded('map'))
+        app.logger.debug("Similar cities data: %s", fragment_inputs['cities_by_category'])
+        app.logger.debug("Target data: %s", fragment_inputs['target_data'])
 
-        market_analysis = await search_engine.analyze_market(target_city, target_state)
-        
-        # Add some debug logging
-        app.logger.debug(f"Similar cities list: {similar_cities_list}")
+        market_analysis = await search_engine.analyze_market(target_city, target_state,
+                                                             cached_only=degraded('live_serp'))
         
         # Extract websites and filter out None/empty values
-        competitor_domains = [
-            city.get('website') 
-            for city in similar_cities_list 
-            if city.get('website')
-        ]
+        competitor_domains = [website for website in similar_cities['website'].dropna() if website]
         
-        app.logger.debug(f"Competitor domains to analyze: {competitor_domains}")
+        app.logger.debug("Competitor domains to analyze: %s", competitor_domains)
         
         seo_metrics = {}
-        if competitor_domains:  # Only proceed if we have domains to analyze
+        if competitor_domains and not degraded('competitor_seo'):  # Only proceed if we have domains to analyze
             try:
                 seo_service = SEOService()
-                seo_metrics = await seo_service.get_bulk_metrics(set(competitor_domains))  # Use bulk_metrics instead
-                app.logger.debug(f"SEO Metrics retrieved: {seo_metrics}")
+                with span('competitor_seo'):
+                    seo_metrics = await seo_service.get_bulk_metrics(set(competitor_domains))  # Use bulk_metrics instead
+                app.logger.debug("SEO Metrics retrieved: %s", seo_metrics)
             except Exception as e:
-                app.logger.error(f"Error fetching SEO metrics: {str(e)}")
+                app.logger.error("Error fetching SEO metrics: %s", e)
                 seo_metrics = {}
         
-        return render_template('results.html',
-                           target_city=target_city,
-                           target_state=target_state,
-                           target_data=target_data,
-                           similar_cities=similar_cities_list,
-                           map_html=map_html,
-                           market_tags=MARKET_TAGS,
-                           market_analysis=market_analysis,
-                           seo_metrics=seo_metrics)  # Verify this is being passed
+        with span('render'):
+            return render_template('results.html',
+                               target_city=target_city,
+                               target_state=target_state,
+                               **fragment_inputs,
+                               market_tags=MARKET_TAGS,
+                               market_analysis=serp_fragment_input(market_analysis),
+                               seo_metrics=seo_metrics,  # Verify this is being passed
+                               radius=radius,
+                               preset=preset,
+                               score_weights=engine.opportunity_engine.weights,
+                               component_labels=OPPORTUNITY_COMPONENT_LABELS)
+    except CityNotFound as e:
+        app.logger.warning("City not found: %s, %s", target_city, target_state)
+        return render_template('cityerror.html', city=target_city, state=target_state,
+                               suggestions=e.suggestions, search_params=search_params(radius, preset))
     except Exception as e:
-        app.logger.error(f"Error in analyze route: {str(e)}")
+        app.logger.error("Error in analyze route: %s", e)
         return render_template('404.html', error=str(e))
 
 @app.route('/results', methods=['GET'])
+@admission.admit
+@request_budget(REQUEST_DEADLINE_SECONDS)
+@profiled
 async def results():
     try:
         target_city = request.args.get('city')
         target_state = request.args.get('state')
-        radius = int(request.args.get('radius'))
-        
-        app.logger.info(f"Analyzing market for {target_city}, {target_state} with radius {radius} miles")
+        radius = parse_radius(request.args)
+        preset = request.args.get('preset') or None
         
-        similar_cities = engine.find_similar_cities(target_city, target_state, radius_miles=radius)
-        app.logger.info(f"Found {len(similar_cities)} similar cities")
+        app.logger.info("Analyzing market for %s, %s %s (preset %s)", target_city, target_state,
+                        f"within {radius} miles" if radius else "nationwide", preset)
         
-        # Convert DataFrame to list of dictionaries
-        similar_cities_list = similar_cities.to_dict('records')
-        app.logger.debug(f"Similar cities data: {similar_cities_list}")
+        similar_cities = engine.find_similar_cities(target_city, target_state, radius_miles=radius, preset=preset)
+        app.logger.info("Found %d similar cities", len(similar_cities))
         
-        target_data = similar_cities.loc[f"{target_city}, {target_state}".lower()].to_dict()
-        app.logger.debug(f"Target data: {target_data}")
-        
-        map_html = create_map(similar_cities, target_city, target_state)
+        fragment_inputs = results_fragment_inputs(similar_cities, target_city, target_state, radius,
+                                                  with_map=not degraded('map'))
+        app.logger.debug("Similar cities data: %s", fragment_inputs['cities_by_category'])
+        app.logger.debug("Target data: %s", fragment_inputs['target_data'])
 
-        market_analysis = await search_engine.analyze_market(target_city, target_state)
+        market_analysis = await search_engine.analyze_market(target_city, target_state,
+                                                             cached_only=degraded('live_serp'))
         
         # Get SEO metrics for competitor domains
         seo_metrics = {}
         competitor_domains = [city.website for city in similar_cities if hasattr(city, 'website') and city.website]
         
-        try:
-            seo_service = SEOService()
-            seo_metrics = await seo_service.get_metrics_for_domains(competitor_domains)
-        except Exception as e:
-            app.logger.error(f"Error fetching SEO metrics: {e}")
-            seo_metrics = {}  # Fallback to empty dict if there's an error
-
-        return render_template(
-            'results.html',
-            target_city=target_city,
-            target_state=target_state,
-            target_data=target_data,
-            similar_cities=similar_cities,
-            map_html=map_html,
-            market_tags=MARKET_TAGS,
-            seo_metrics=seo_metrics
-        )
+        if not degraded('competitor_seo'):
+            try:
+                seo_service = SEOService()
+                with span('competitor_seo'):
+                    seo_metrics = await seo_service.get_metrics_for_domains(competitor_domains)
+            except Exception as e:
+                app.logger.error("Error fetching SEO metrics: %s", e)
+                seo_metrics = {}  # Fallback to empty dict if there's an error
+
+        with span('render'):
+            return render_template(
+                'results.html',
+                target_city=target_city,
+                target_state=target_state,
+                **fragment_inputs,
+                market_tags=MARKET_TAGS,
+                market_analysis=serp_fragment_input(market_analysis),
+                seo_metrics=seo_metrics,
+                radius=radius,
+                preset=preset,
+                score_weights=engine.opportunity_engine.weights,
+                component_labels=OPPORTUNITY_COMPONENT_LABELS
+            )
     except ValueError as e:
-        if "not found in the dataset" in str(e):
-            app.logger.warning(f"City not found: {target_city}, {target_state}")
-            return render_template('cityerror.html', city=target_city, state=target_state)
+        if isinstance(e, CityNotFound):
+            app.logger.warning("City not found: %s, %s", target_city, target_state)
+            return render_template('cityerror.html', city=target_city, state=target_state,
+                                   suggestions=e.suggestions, search_params=search_params(radius, preset))
         else:
-            app.logger.error(f"Error in analyze route: {str(e)}", exc_info=True)
+            app.logger.error("Error in analyze route: %s", e, exc_info=True)
             return render_template('cityerror.html', error_message=str(e))
     except Exception as e:
-        app.logger.error(f"Error in analyze route: {str(e)}", exc_info=True)
+        app.logger.error("Error in analyze route: %s", e, exc_info=True)
         return render_template('cityerror.html', error_message=str(e))
 
+@app.route('/cities', methods=['GET'])
+def cities():
+    """Typeahead over the cities dataset (q, limit): prefix completions, or fuzzy matches if none."""
+    query = request.args.get('q', '')
+    limit = max(1, min(request.args.get('limit', 8, type=int), CITY_SEARCH_MAX_RESULTS))
+    match, matches = engine.city_index.search(query, limit)
+    response = jsonify({'query': query, 'match': match, 'cities': matches})
+    # Answers only change with the data, so the browser can reuse them as the user retypes
+    response.cache_control.public = True
+    response.cache_control.max_age = CITY_SEARCH_CACHE_SECONDS
+    return response
+
+@app.route('/competitors', methods=['GET'])
+async def competitors():
+    try:
+        target_city = request.args.get('city')
+        target_state = request.args.get('state')
+        radius = parse_radius(request.args, 100)
+        preset = request.args.get('preset') or None
+
+        app.logger.info("Cross-market competitor analysis for %s, %s %s", target_city, target_state,
+                        f"within {radius} miles" if radius else "nationwide")
+
+        similar_cities = engine.find_similar_cities(target_city, target_state, radius_miles=radius, preset=preset)
+        markets = list(zip(similar_cities['city'], similar_cities['state_id']))
+        # The dataset's spelling of the target, which the market keys use, not the query string's
+        target_key = f"{target_city}, {target_state}".lower().strip()
+        target_market = None
+        if target_key in similar_cities.index:
+            target_market = tuple(similar_cities.loc[target_key, ['city', 'state_id']])
+
+        presence = await search_engine.analyze_competitor_presence(markets, target_market=target_market)
+        matrix = presence.pop('matrix').tocoo()
+        presence['matrix'] = {
+            'shape': list(matrix.shape),
+            'entries': [[int(r), int(c), int(v)] for r, c, v in zip(matrix.row, matrix.col, matrix.data)]
+        }
+        return jsonify(presence)
+    except ValueError as e:
+        app.logger.warning("Competitor analysis failed: %s", e)
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error("Error in competitors route: %s", e, exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+# Columns returned per city by /sweep
+SWEEP_COLUMNS = ['city', 'state_id', 'distance_to_target', 'similarity_score', 'opportunity_score',
+                 'opportunity_category', 'users_org', 'leads_org', 'users_paid', 'leads_paid']
+
+# Columns returned per city by /rescore
+RESCORE_COLUMNS = ['city', 'state_id', 'raw_opportunity_score', 'opportunity_score', 'opportunity_category']
+
+def city_records(similar_cities, columns):
+    frame = similar_cities.reindex(columns=columns)
+    # Missing GA4 values become null rather than NaN, which is not valid JSON
+    return [{key: (None if pd.isna(value) else value.item() if hasattr(value, 'item') else value)
+             for key, value in row.items()} for row in frame.to_dict('records')]
+
+@app.route('/sweep', methods=['GET'])
+def sweep():
+    try:
+        target_city = request.args.get('city')
+        target_state = request.args.get('state')
+        radii = [int(r) for r in request.args.get('radii', '25,50,100,200').split(',') if r.strip()]
+        preset = request.args.get('preset') or None
+
+        app.logger.info("Radius sweep for %s, %s over %s miles", target_city, target_state, radii)
+
+        results = engine.sweep_similar_cities(target_city, target_state, radii, preset=preset)
+        return jsonify({
+            'target': f"{target_city}, {target_state}",
+            'preset': preset,
+            # A radius that failed on its own carries an error instead of cities
+            'sweep': [{'radius': radius, 'error': str(similar_cities)} if isinstance(similar_cities, ValueError)
+                      else {'radius': radius, 'cities': city_records(similar_cities, SWEEP_COLUMNS)}
+                      for radius, similar_cities in results.items()]
+        })
+    except CityNotFound as e:
+        app.logger.warning("Radius sweep failed: %s", e)
+        return jsonify({'error': str(e), 'suggestions': e.suggestions}), 400
+    except ValueError as e:
+        app.logger.warning("Radius sweep failed: %s", e)
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error("Error in sweep route: %s", e, exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/rescore', methods=['POST'])
+def rescore():
+    """Re-weight the opportunity scores of a result set; body: city, state, radius/scope, preset, weights."""
+    try:
+        params = request.get_json(silent=True) or {}
+        target_city = params.get('city')
+        target_state = params.get('state')
+        radius = parse_radius(params, 100)
+        preset = params.get('preset') or None
+        weights = params.get('weights') or {}
+        if not isinstance(weights, dict):
+            raise ValueError("weights must be an object of component name -> weight")
+
+        similar_cities = engine.rescore_similar_cities(target_city, target_state, weights, radius_miles=radius,
+                                                       preset=preset)
+        return jsonify({
+            'target': f"{target_city}, {target_state}",
+            'weights': engine.opportunity_engine.resolve_weights(weights),
+            'cities': [{'city_state': key, **record} for key, record in
+                       zip(similar_cities.index, city_records(similar_cities, RESCORE_COLUMNS))]
+        })
+    except ValueError as e:
+        app.logger.warning("Rescore failed: %s", e)
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error("Error in rescore route: %s", e, exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/export', methods=['GET'])
+def export():
+    """Stream the atlas's opportunity scores for every market as CSV or Parquet (format, limit)."""
+    # Scoring every market is minutes of CPU, so this serves the atlas job's rows rather than scoring here
+    store = get_atlas_store()
+    run = store.run_info() if store else None
+    if run is None:
+        return jsonify({'error': 'No atlas has been computed; run python -m engine.atlas, '
+                                 'or python -m engine.export for a file'}), 404
+    try:
+        fmt = request.args.get('format', 'csv')
+        limit = request.args.get('limit', type=int)
+        stream = iter_atlas_export(store, fmt, limit=limit)
+        params = run['params']
+        app.logger.info("Exporting atlas as %s (data version %s, %s, preset %s)", fmt, params['data_version'],
+                        f"within {params['radius_miles']} miles" if params['radius_miles'] else "nationwide",
+                        params['preset'])
+        filename = f"opportunity_scores_{params['data_version']}.{fmt}"
+        return Response(stream_with_context(stream), mimetype=EXPORT_FORMATS[fmt], headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            # Same meaning as in /atlas: complete once the job finished, stale once newer data is loaded
+            'X-Atlas-Complete': 'true' if run.get('finished_at') else 'false',
+            'X-Atlas-Stale': 'true' if params['data_version'] != engine.data.version else 'false',
+        })
+    except (ValueError, RuntimeError) as e:
+        app.logger.warning("Export failed: %s", e)
+        return jsonify({'error': str(e)}), 400
+
+def get_atlas_store():
+    global atlas_store
+    if atlas_store is None and ATLAS_DB_PATH and os.path.exists(ATLAS_DB_PATH):
+        atlas_store = AtlasStore(ATLAS_DB_PATH, EXPORT_COLUMNS)
+    return atlas_store
+
+@app.route('/atlas', methods=['GET'])
+def atlas():
+    """Precomputed opportunity scores from the atlas job (state, category, min_score, city/state, limit, offset)."""
+    store = get_atlas_store()
+    run = store.run_info() if store else None
+    if run is None:
+        return jsonify({'error': 'No atlas has been computed; run python -m engine.atlas'}), 404
+    try:
+        limit = min(request.args.get('limit', 100, type=int), 1000)
+        offset = request.args.get('offset', 0, type=int)
+        city_states = None
+        if request.args.get('city'):
+            city_states = [f"{request.args.get('city')}, {request.args.get('state', '')}"]
+        markets = store.query(state=request.args.get('state') if city_states is None else None,
+                              category=request.args.get('category') or None,
+                              min_score=request.args.get('min_score', type=float),
+                              city_states=city_states, limit=max(limit, 0), offset=max(offset, 0))
+        return jsonify({
+            'run': run,
+            # The scores were computed from this data version; a reload since makes them stale
+            'stale': run['params']['data_version'] != engine.data.version,
+            'markets': markets,
+        })
+    except Exception as e:
+        app.logger.error("Error in atlas route: %s", e, exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/assets/<path:filename>', methods=['GET'])
+def asset(filename):
+    """Content-hashed static asset, precompressed if the client accepts it; cacheable for a year."""
+    found = static_assets.resolve(filename, request.accept_encodings)
+    if found is None:
+        abort(404)
+    path, encoding, mimetype = found
+    response = send_file(path, mimetype=mimetype, conditional=True, max_age=31536000)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/metrics/upstreams', methods=['GET'])
+def upstream_metrics():
+    snapshot = TELEMETRY.snapshot()
+    for upstream, circuit in circuit_snapshot().items():
+        snapshot.setdefault(upstream, {})['circuit'] = circuit
+    return jsonify(snapshot)
+
+@app.route('/data/version', methods=['GET'])
+def data_version():
+    return jsonify({**engine.data.describe(), 'result_cache': engine.result_cache.stats()})
+
 @app.errorhandler(404)
 def page_not_found(e):
-    logger.error(f"404 error: {request.url}")
+    logger.error("404 error: %s", request.url)
     return render_template('404.html'), 404
 
+@app.errorhandler(Overloaded)
+def overloaded(e):
+    return render_template('busy.html', retry_after=e.retry_after), 429, {'Retry-After': str(e.retry_after)}
+
+@app.errorhandler(ClientDisconnected)
+def client_disconnected(e):
+    # Nobody is left to read this; 499 marks it in the access log and metrics
+    return '', 499
+
 if __name__ == '__main__':
     # Get port from environment variable or default to 5000
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,196 @@
+"""
+ASGI entry point.
+
+Run with:
+    hypercorn asgi:app --config file:hypercorn.conf.py
+
+Flask stays a WSGI app: the synchronous part of each request (routing,
+hooks, sync views) runs on a worker-wide thread pool, and async views are
+scheduled back onto the server's event loop. That loop lives as long as the
+worker, so SearchService/SEOService semaphores and pooled HTTP connections
+persist across requests instead of being rebuilt on a fresh loop per request.
+
+Once a request's body has been read, the adapter keeps listening for
+http.disconnect; if the client goes away first, views wrapped in
+utils.resilience.request_budget are cancelled.
+"""
+import asyncio
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.wsgi import WsgiToAsgi
+
+from config import ASGI_THREADS
+from utils.api_utils import register_persistent_loop, close_client_pools
+from utils.resilience import DISCONNECT_ENVIRON_KEY, ClientDisconnect
+
+logger = logging.getLogger(__name__)
+
+def build_environ(scope: dict, body) -> dict:
+    """
+    Build the WSGI environ for an ASGI HTTP scope (PEP 3333 from the ASGI HTTP spec).
+
+    Args:
+        scope: ASGI HTTP connection scope
+        body: File-like object holding the complete request body
+
+    Returns:
+        WSGI environ
+    """
+    script_name = scope.get('root_path', '').encode('utf8').decode('latin1')
+    path_info = scope['path'].encode('utf8').decode('latin1')
+    if path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name,
+        'PATH_INFO': path_info,
+        'QUERY_STRING': scope['query_string'].decode('ascii'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1').upper().replace('-', '_')
+        if name not in ('CONTENT_LENGTH', 'CONTENT_TYPE'):
+            name = f"HTTP_{name}"
+        value = value.decode('latin1')
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    """
+    WSGI-to-ASGI adapter that runs requests concurrently on the loop's default executor.
+
+    asgiref's own adapter runs every WSGI request on one shared thread (thread_sensitive=True); this
+    one runs each request through sync_to_async(thread_sensitive=False). Flask's async views call
+    async_to_sync from that thread, which schedules them back onto the server's loop. Once the body
+    has been read, the adapter keeps listening for http.disconnect and exposes it to the request as
+    environ[DISCONNECT_ENVIRON_KEY].
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            raise ValueError(f"WSGI adapter received a non-HTTP scope '{scope['type']}'")
+        with SpooledTemporaryFile(max_size=65536) as body:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                body.write(message.get('body', b''))
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+            client_disconnect = ClientDisconnect()
+            # The body is complete; from here on the only message left is http.disconnect
+            watcher = asyncio.ensure_future(self._watch_disconnect(receive, client_disconnect))
+            try:
+                await sync_to_async(self._run_wsgi_app, thread_sensitive=False)(
+                    scope, body, client_disconnect, async_to_sync(send))
+            finally:
+                watcher.cancel()
+
+    @staticmethod
+    async def _watch_disconnect(receive, client_disconnect: ClientDisconnect):
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            client_disconnect.set()
+
+    def _run_wsgi_app(self, scope, body, client_disconnect: ClientDisconnect, sync_send):
+        """Run the WSGI app on a pool thread, sending its response through sync_send."""
+        environ = build_environ(scope, body)
+        environ[DISCONNECT_ENVIRON_KEY] = client_disconnect
+        response_start = {}
+        started = False
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and started:
+                raise exc_info[1].with_traceback(exc_info[2])
+            response_start.update({
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers],
+            })
+
+        iterable = self.wsgi_application(environ, start_response)
+        try:
+            for chunk in iterable:
+                if not chunk:
+                    continue
+                if not started:
+                    started = True
+                    sync_send(response_start)
+                sync_send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            # Closes streamed responses, e.g. /export's generator, even when the client has gone away
+            if hasattr(iterable, 'close'):
+                iterable.close()
+        if not started:
+            sync_send(response_start)
+        sync_send({'type': 'http.response.body'})
+
+class ASGIApp:
+    """
+    ASGI wrapper for the Flask app with lifespan handling.
+
+    Args:
+        wsgi_app: The Flask (WSGI) application
+        threads: Size of the thread pool running the WSGI side of requests
+    """
+
+    def __init__(self, wsgi_app, threads: int = ASGI_THREADS):
+        self.wsgi_app = wsgi_app
+        self.threads = threads
+        self.http_app = PooledWsgiToAsgi(wsgi_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http_app(scope, receive, send)
+        else:
+            raise ValueError(f"Unsupported ASGI scope type '{scope['type']}'")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                loop = asyncio.get_running_loop()
+                loop.set_default_executor(ThreadPoolExecutor(self.threads, thread_name_prefix='asgi-wsgi'))
+                register_persistent_loop(loop)
+                logger.info("ASGI worker started with %d request threads", self.threads)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await close_client_pools()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+def create_asgi_app(wsgi_app=None, threads: int = ASGI_THREADS) -> ASGIApp:
+    """
+    Build the ASGI application.
+
+    Args:
+        wsgi_app: Flask application to serve (defaults to app.app)
+        threads: Size of the request thread pool per worker
+
+    Returns:
+        ASGI callable
+    """
+    if wsgi_app is None:
+        from app import app as wsgi_app
+    return ASGIApp(wsgi_app, threads)
+
+app = create_asgi_app()
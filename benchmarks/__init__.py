@@ -0,0 +1,4 @@
+"""
+Benchmarks for the market analysis application.
+Run individual modules from the project root, e.g. `python -m benchmarks.bench_models`.
+"""
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""
+Throughput scaling of the opportunity atlas job (engine/atlas.py).
+
+Scores the same markets of a synthetic dataset with 1..N worker processes
+and reports, per worker count:
+
+- wall time and markets per second, including worker startup
+- speedup and parallel efficiency relative to one worker
+- busy worker time per market, which grows when workers contend for cores
+
+Each run writes a fresh atlas table; the stored rows must be identical
+across worker counts (scores within 1e-9, same categories and tags), and
+the benchmark exits with status 1 if they are not, so it doubles as a check.
+
+Speedup is bounded by the cores actually available to this process, which
+the report prints; worker counts above that measure contention only.
+
+Usage:
+    python -m benchmarks.bench_atlas [--workers 1,2,4,8] [--markets 2000] [--scale 1] [--radius 100 | --national]
+                                     [--partition-size 128] [--json report.json]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import generate
+from engine.atlas import run_atlas
+from engine.export import EXPORT_COLUMNS
+from engine.market_engine import MarketAnalysisEngine
+from services.atlas_service import AtlasStore
+
+def available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def default_worker_counts() -> List[int]:
+    """1, 2, 4, ... up to and including the CPU count."""
+    cpus, counts = available_cpus(), [1]
+    while counts[-1] * 2 < cpus:
+        counts.append(counts[-1] * 2)
+    if cpus > 1:
+        counts.append(cpus)
+    return counts
+
+def compare(expected: pd.DataFrame, actual: pd.DataFrame) -> List[str]:
+    """Differences between two atlas tables (empty if they match)."""
+    if not expected.index.equals(actual.index):
+        return [f"different markets stored ({len(expected)} vs {len(actual)})"]
+    problems = []
+    if not np.allclose(expected['opportunity_score'], actual['opportunity_score'], rtol=0, atol=1e-9, equal_nan=True):
+        problems.append('opportunity_score differs')
+    for col in ['opportunity_category', 'tags']:
+        if not expected[col].fillna('').equals(actual[col].fillna('')):
+            problems.append(f"{col} differs")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', help='Comma-separated worker counts (default: 1, 2, 4, ... up to the CPU count)')
+    parser.add_argument('--markets', type=int, default=2000, help='Markets to score per run')
+    parser.add_argument('--scale', type=float, default=1.0, help='Synthetic dataset multiple')
+    scope = parser.add_mutually_exclusive_group()
+    scope.add_argument('--radius', type=int, default=100, help='Neighborhood radius in miles')
+    scope.add_argument('--national', action='store_true', help='Nationwide neighborhoods')
+    parser.add_argument('--preset', default='balanced', help='Feature preset')
+    parser.add_argument('--partition-size', type=int, default=128, help='Markets per worker task')
+    parser.add_argument('--data-dir', help='Where to write the synthetic dataset (default: a temp dir)')
+    parser.add_argument('--json', help='Also write the report as JSON to this path')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    worker_counts = [int(n) for n in args.workers.split(',')] if args.workers else default_worker_counts()
+    radius = None if args.national else args.radius
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        info = generate(args.scale, args.data_dir or tmp_dir)
+        engine = MarketAnalysisEngine(info['city_data_path'], info['ga4_data_path'],
+                                      ga4_delta_dir=None, result_cache_size=0)
+        rng = np.random.default_rng(1)
+        keys = engine.city_data.index.unique()
+        targets = list(rng.choice(keys, size=min(args.markets, len(keys)), replace=False))
+
+        runs: List[Dict] = []
+        reference, mismatches = None, {}
+        for workers in worker_counts:
+            store = AtlasStore(os.path.join(tmp_dir, f"atlas_{workers}.sqlite3"), EXPORT_COLUMNS)
+            stats = run_atlas(engine.data, store, workers=workers, radius_miles=radius, preset=args.preset,
+                              partition_size=args.partition_size, targets=targets, restart=True)
+            rows = pd.DataFrame(store.query(limit=len(targets))).set_index('city_state').sort_index()
+            if reference is None:
+                reference = rows
+            else:
+                problems = compare(reference, rows)
+                if problems:
+                    mismatches[workers] = problems
+            runs.append({
+                'workers': workers,
+                'markets': stats['markets'],
+                'seconds': stats['seconds'],
+                'markets_per_second': stats['markets_per_second'],
+                'worker_ms_per_market': stats['worker_seconds'] * 1000 / max(stats['markets'], 1),
+            })
+
+    base = runs[0]['markets_per_second'] if runs and runs[0]['workers'] == 1 else None
+    for run in runs:
+        run['speedup'] = run['markets_per_second'] / base if base else None
+        run['efficiency'] = run['speedup'] / run['workers'] if base else None
+
+    report = {
+        'cpus': available_cpus(),
+        'markets': len(targets),
+        'radius_miles': radius,
+        'preset': args.preset,
+        'runs': runs,
+        'mismatches': {str(workers): problems for workers, problems in mismatches.items()},
+    }
+
+    print(f"\n{len(targets):,} markets, {'nationwide' if radius is None else f'{radius} mi'} neighborhoods, "
+          f"preset {args.preset}, {report['cpus']} CPU(s) available")
+    print(f"\n  {'workers':>7}  {'seconds':>8}  {'markets/s':>9}  {'speedup':>7}  {'efficiency':>10}  "
+          f"{'busy ms/market':>14}")
+    for run in runs:
+        speedup = f"{run['speedup']:.2f}x" if base else '-'
+        efficiency = f"{run['efficiency']:.0%}" if base else '-'
+        print(f"  {run['workers']:>7}  {run['seconds']:>8.1f}  {run['markets_per_second']:>9.1f}  {speedup:>7}  "
+              f"{efficiency:>10}  {run['worker_ms_per_market']:>14.1f}")
+    if max(worker_counts) > report['cpus']:
+        print(f"\n  note: runs with more than {report['cpus']} workers share cores; they measure contention, not scaling")
+    for workers, problems in mismatches.items():
+        print(f"  MISMATCH {workers} workers: {'; '.join(problems)}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Latency and accuracy of the city search index behind GET /cities.
+
+Builds engine.city_index.CityIndex over a synthetic (or the real) cities
+dataset and reports its build time, then:
+
+- typeahead: every prefix of random city names ("c", "ch", "chi", ...),
+  looked up as the endpoint does on each keystroke (CityIndex.search)
+- typos: the same cities with one random edit to the name (a deleted,
+  inserted, substituted or swapped letter), looked up with their state
+  through CityIndex.suggest, as the "did you mean" page does; reports how
+  often the intended city is the first suggestion, or among the top 5
+
+Synthetic datasets name every city "City <n>", so all names share most of
+their trigrams and typo lookups there are a worst case rather than typical.
+
+Exits with status 1 if the p99 of either lookup exceeds --max-p99-ms or if
+fewer than --min-recall of the typos find the intended city in the top 5,
+so it doubles as a check.
+
+Usage:
+    python -m benchmarks.bench_city_search [--scale 1] [--queries 500] [--max-p99-ms 5] [--min-recall 0.9]
+                                           [--json report.json]
+"""
+import argparse
+import json
+import logging
+import statistics
+import string
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from benchmarks.synthetic import generate
+from config.settings import CITY_DATA_PATH
+from engine.city_index import CityIndex
+from utils.data_utils import load_city_data
+
+def misspell(name: str, rng: np.random.Generator) -> str:
+    """The name with one random edit among its letters."""
+    letters = [i for i, char in enumerate(name) if char.isalpha()]
+    i = int(rng.choice(letters))
+    edit = rng.integers(4)
+    if edit == 0 and len(letters) > 3:
+        return name[:i] + name[i + 1:]
+    if edit == 1:
+        return name[:i] + rng.choice(list(string.ascii_lowercase)) + name[i:]
+    if edit == 2 and i + 1 < len(name) and name[i + 1].isalpha() and name[i] != name[i + 1]:
+        return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+    replacement = rng.choice([c for c in string.ascii_lowercase if c != name[i].lower()])
+    return name[:i] + replacement + name[i + 1:]
+
+def timed(lookup: Callable, queries: List[str]) -> Dict[str, float]:
+    """p50/p99 latency of a lookup over the queries, in milliseconds."""
+    times = []
+    for query in queries:
+        start = time.perf_counter()
+        lookup(query)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {'queries': len(times), 'p50_ms': statistics.median(times) * 1000,
+            'p99_ms': times[min(len(times) - 1, int(len(times) * 0.99))] * 1000}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, help='Use a synthetic dataset at this multiple instead of data/')
+    parser.add_argument('--queries', type=int, default=500, help='Random cities to type and misspell')
+    parser.add_argument('--max-p99-ms', type=float, default=5.0, help='Fail if a lookup p99 exceeds this')
+    parser.add_argument('--min-recall', type=float, default=0.9, help='Fail if fewer typos find the city in the top 5')
+    parser.add_argument('--data-dir', help='Where to write the synthetic dataset (default: a temp dir)')
+    parser.add_argument('--json', help='Also write the report as JSON to this path')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        city_path = generate(args.scale, args.data_dir or tmp_dir)['city_data_path'] if args.scale else CITY_DATA_PATH
+        city_data = load_city_data(city_path).set_index('city_state')
+
+    start = time.perf_counter()
+    index = CityIndex(city_data)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    rng = np.random.default_rng(1)
+    rows = city_data.iloc[rng.choice(len(city_data), size=min(args.queries, len(city_data)), replace=False)]
+    prefixes = [city[:n] for city in rows['city'] for n in range(1, len(city) + 1)]
+    typos = [f"{misspell(city, rng)}, {state}" for city, state in zip(rows['city'], rows['state_id'].astype(str))]
+
+    # Warm up once so the first lookups do not pay for lazy imports and allocations
+    index.search(prefixes[0])
+    index.suggest(typos[0])
+    first = top5 = 0
+    for typo, key in zip(typos, rows.index):
+        keys = [match['key'] for match in index.suggest(typo, 5)]
+        first += bool(keys) and keys[0] == key
+        top5 += key in keys
+
+    report = {
+        'cities': len(index),
+        'build_ms': build_ms,
+        'typeahead': timed(index.search, prefixes),
+        'typos': {**timed(index.suggest, typos), 'top1': first / len(typos), 'top5': top5 / len(typos)},
+    }
+
+    print(f"\n{report['cities']:,} cities, index built in {build_ms:.0f} ms\n")
+    print(f"  {'lookup':<12}{'queries':>9}{'p50':>11}{'p99':>11}{'top 1':>8}{'top 5':>8}")
+    for name in ('typeahead', 'typos'):
+        row = report[name]
+        recall = f"{row['top1']:>8.3f}{row['top5']:>8.3f}" if 'top5' in row else ''
+        print(f"  {name:<12}{row['queries']:>9,}{row['p50_ms']:>8.3f} ms{row['p99_ms']:>8.3f} ms{recall}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    failures = [f"{name} p99 {report[name]['p99_ms']:.2f} ms" for name in ('typeahead', 'typos')
+                if report[name]['p99_ms'] > args.max_p99_ms]
+    if report['typos']['top5'] < args.min_recall:
+        failures.append(f"typo recall {report['typos']['top5']:.3f}")
+    if failures:
+        print(f"\nFailed: {', '.join(failures)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Bytes on the wire for the results page, with and without compression.
+
+results.html is rendered for several targets as /analyze renders it, then
+compressed the way ResponseCompressor does: gzip at levels 1, 6 and 9 and,
+when the optional brotli package is installed, brotli at qualities 4 and 11.
+For each setting the report gives the median compressed size, the share of
+bytes saved and the median time to compress one page. The precompressed
+static assets are listed with their variant sizes.
+
+Three checks run through the Flask test client and fail the run (exit 1) if
+they do not hold:
+
+- a results-sized HTML response is compressed and decodes to the original
+- a hashed static asset is served precompressed, with an immutable
+  Cache-Control, and decodes to the source file
+- a streamed CSV export (of a 50-market atlas built in a temp database) is
+  compressed and decodes to the uncompressed stream
+
+The app is imported with its upstream APIs pointed at the local stand-ins
+(benchmarks/standins.py).
+
+Usage:
+    python -m benchmarks.bench_compression [--targets 10] [--radius 100] [--json report.json]
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.bench_render import free_port
+
+def measure(compress: Callable[[bytes], bytes], pages: List[bytes]) -> Dict[str, float]:
+    """Median compressed size, bytes saved and compression time over pages."""
+    sizes, times = [], []
+    for page in pages:
+        start = time.perf_counter()
+        sizes.append(len(compress(page)))
+        times.append(time.perf_counter() - start)
+    raw = statistics.median(len(page) for page in pages)
+    size = statistics.median(sizes)
+    return {'bytes': size, 'saved_pct': 100 * (1 - size / raw), 'ms': statistics.median(times) * 1000}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--targets', type=int, default=10, help='Target markets to render')
+    parser.add_argument('--radius', type=int, default=100, help='Search radius in miles')
+    parser.add_argument('--json', help='Also write the report as JSON to this path')
+    args = parser.parse_args()
+
+    serper_port, semrush_port = free_port(), free_port()
+    # Settings are read when config is first imported, so the environment has to be in place before that
+    os.environ.update(SERPER_BASE_URL=f"http://127.0.0.1:{serper_port}",
+                      SEMRUSH_BASE_URL=f"http://127.0.0.1:{semrush_port}", SERPER_API_KEY='bench',
+                      SEMRUSH_API_KEY='bench', SERP_SNAPSHOT_DB_PATH='', DATA_RELOAD_INTERVAL='0',
+                      JINJA_BYTECODE_CACHE_DIR=tempfile.mkdtemp(prefix='jinja_cache_'),
+                      ATLAS_DB_PATH=os.path.join(tempfile.mkdtemp(prefix='atlas_'), 'atlas.sqlite3'))
+    from benchmarks.standins import SemrushHandler, SerperHandler, StandInServer
+    serper = StandInServer(SerperHandler, port=serper_port).start()
+    semrush = StandInServer(SemrushHandler, port=semrush_port).start()
+    import app as webapp
+    from flask import Response
+    from config.constants import MARKET_TAGS, OPPORTUNITY_COMPONENT_LABELS
+    from config.settings import ATLAS_DB_PATH
+    from engine.export import EXPORT_COLUMNS, export_rows
+    from services.atlas_service import AtlasStore
+    from utils.compression import brotli
+    logging.disable(logging.WARNING)
+
+    engine = webapp.engine
+    keys = engine.ga4_data.index.intersection(engine.city_data.index)[:args.targets]
+    first_city, first_state = engine.city_data.loc[keys[0], ['city', 'state_id']]
+    market_analysis = asyncio.run(webapp.search_engine.analyze_market(first_city, first_state))
+    pages = []
+    with webapp.app.test_request_context():
+        for key in keys:
+            city, state = engine.city_data.loc[key, ['city', 'state_id']]
+            similar_cities = engine.find_similar_cities(city, state, radius_miles=args.radius)
+            html = webapp.render_template(
+                'results.html', target_city=city, target_state=state,
+                **webapp.results_fragment_inputs(similar_cities, city, state, args.radius),
+                market_tags=MARKET_TAGS, market_analysis=market_analysis, seo_metrics={}, radius=args.radius,
+                preset=None, score_weights=engine.opportunity_engine.weights,
+                component_labels=OPPORTUNITY_COMPONENT_LABELS,
+            )
+            pages.append(html.encode('utf-8'))
+
+    settings = {f"gzip -{level}": (lambda page, level=level: gzip.compress(page, compresslevel=level))
+                for level in (1, 6, 9)}
+    if brotli is not None:
+        for quality in (4, 11):
+            settings[f"br q{quality}"] = lambda page, quality=quality: brotli.compress(page, quality=quality)
+    report = {
+        'pages': len(pages),
+        'raw_bytes': statistics.median(len(page) for page in pages),
+        'encodings': {name: measure(compress, pages) for name, compress in settings.items()},
+        'static_assets': webapp.static_assets.manifest,
+    }
+
+    checks = {}
+    client = webapp.app.test_client()
+
+    @webapp.app.route('/_bench/page')
+    def bench_page():
+        return Response(pages[0], mimetype='text/html')
+
+    response = client.get('/_bench/page', headers={'Accept-Encoding': 'gzip'})
+    checks['dynamic_page'] = (response.headers.get('Content-Encoding') == 'gzip'
+                              and gzip.decompress(response.data) == pages[0])
+
+    source = 'js/chart_utils.js'
+    hashed = webapp.static_assets.hashed_path(source)
+    if hashed:
+        with open(os.path.join(webapp.app.static_folder, source), 'rb') as f:
+            original = f.read()
+        response = client.get(f"/assets/{hashed}", headers={'Accept-Encoding': 'gzip'})
+        body = response.data
+        response.close()
+        checks['static_asset'] = (response.headers.get('Content-Encoding') == 'gzip'
+                                  and 'immutable' in response.headers.get('Cache-Control', '')
+                                  and gzip.decompress(body) == original)
+    else:
+        checks['static_asset'] = False
+
+    # /export streams the atlas table; score 50 markets into it the way the atlas job does
+    store = AtlasStore(ATLAS_DB_PATH, EXPORT_COLUMNS)
+    export_keys = engine.city_data.index.unique()[:50]
+    store.start({'data_version': engine.data.version, 'radius_miles': args.radius, 'preset': None,
+                 'n_similar': 15}, len(export_keys))
+    for rows in export_rows(engine.iter_market_scores(radius_miles=args.radius, targets=export_keys)):
+        store.write(rows)
+    store.finish()
+    plain = client.get('/export?limit=50').data
+    response = client.get('/export?limit=50', headers={'Accept-Encoding': 'gzip'})
+    checks['streamed_export'] = (response.headers.get('Content-Encoding') == 'gzip'
+                                 and gzip.decompress(response.data) == plain)
+    report['export_bytes'] = {'raw': len(plain), 'gzip': len(response.data)}
+    report['checks'] = checks
+
+    serper.stop()
+    semrush.stop()
+
+    print(f"\nresults.html, {report['pages']} targets, median {report['raw_bytes']:,.0f} bytes uncompressed")
+    print(f"\n  {'encoding':<12}{'bytes':>10}{'saved':>9}{'time':>11}")
+    for name, row in report['encodings'].items():
+        print(f"  {name:<12}{row['bytes']:>10,.0f}{row['saved_pct']:>8.1f}%{row['ms']:>8.2f} ms")
+    if brotli is None:
+        print("  (brotli is not installed; pip install brotli to compare it)")
+    print("\nstatic assets")
+    for rel, entry in report['static_assets'].items():
+        sizes = ', '.join(f"{encoding} {size:,}" for encoding, size in entry['encodings'].items())
+        print(f"  {entry['path']:<36}{entry['size']:>8,} bytes{'  (' + sizes + ')' if sizes else ''}")
+    print(f"\nexport of 50 markets: {report['export_bytes']['raw']:,} -> {report['export_bytes']['gzip']:,} bytes")
+    print("\nchecks: " + ', '.join(f"{name} {'ok' if ok else 'FAILED'}" for name, ok in checks.items()))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if not all(checks.values()):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
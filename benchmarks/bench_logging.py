@@ -0,0 +1,127 @@
+"""
+Per-request CPU cost of logging in MarketAnalysisEngine.find_similar_cities.
+
+Runs the same requests under several logging setups and reports, per request,
+CPU time on the calling (request) thread, total process CPU time including
+the queue listener thread, and wall time. The `eager` setup logs at DEBUG
+through a synchronous handler, which is what every request paid before the
+DataFrame dumps were demoted to lazy DEBUG records.
+
+Output goes to os.devnull so terminal speed does not skew the numbers.
+
+Usage:
+    python -m benchmarks.bench_logging [--scale 1] [--radius 100] [--requests 50] [--json report.json]
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.synthetic import generate
+from engine.market_engine import MarketAnalysisEngine
+from utils.logging_utils import AsyncQueueHandler, JsonFormatter, SamplingFilter
+
+STANDARD_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# name -> (root level, queued, sample rates, formatter)
+SCENARIOS = {
+    'eager': (logging.DEBUG, False, {}, 'standard'),
+    'info_sync': (logging.INFO, False, {}, 'standard'),
+    'info_queued': (logging.INFO, True, {}, 'standard'),
+    'info_queued_json': (logging.INFO, True, {}, 'json'),
+    'info_queued_sampled': (logging.INFO, True, {'engine': 0.1}, 'standard'),
+}
+
+def configure(level: int, queued: bool, rates: Dict[str, float], formatter: str, stream):
+    """Replace the root handlers with the given setup; returns the queue handler if any."""
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+    console = logging.StreamHandler(stream)
+    console.name = 'bench_console'
+    console.setFormatter(JsonFormatter() if formatter == 'json' else logging.Formatter(STANDARD_FORMAT))
+    head = AsyncQueueHandler([console.name]) if queued else console
+    head.addFilter(SamplingFilter(rates))
+    root.addHandler(head)
+    root.setLevel(level)
+    return head if queued else None
+
+def run_scenario(engine: MarketAnalysisEngine, targets: List, radius: int, requests: int, stream,
+                 name: str) -> Dict:
+    level, queued, rates, formatter = SCENARIOS[name]
+    queue_handler = configure(level, queued, rates, formatter, stream)
+
+    # Warm up caches and the listener thread outside the timed region
+    engine.find_similar_cities(*targets[0], radius_miles=radius)
+    if queue_handler:
+        queue_handler.flush()
+
+    thread_cpu, wall = [], []
+    process_start = time.process_time()
+    for i in range(requests):
+        city, state = targets[i % len(targets)]
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        engine.find_similar_cities(city, state, radius_miles=radius)
+        thread_cpu.append(time.thread_time() - cpu_start)
+        wall.append(time.perf_counter() - wall_start)
+    if queue_handler:
+        queue_handler.flush()
+    process_cpu = time.process_time() - process_start
+
+    return {
+        'scenario': name,
+        'request_thread_cpu_ms': statistics.mean(thread_cpu) * 1000,
+        'process_cpu_ms': process_cpu / requests * 1000,
+        'wall_p50_ms': statistics.median(wall) * 1000,
+        'dropped': queue_handler.dropped if queue_handler else 0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=1.0, help='Synthetic dataset multiple')
+    parser.add_argument('--radius', type=int, default=100, help='Search radius in miles')
+    parser.add_argument('--requests', type=int, default=50, help='Requests per scenario')
+    parser.add_argument('--targets', type=int, default=10, help='Distinct target cities')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma-separated scenario names')
+    parser.add_argument('--data-dir', help='Where to write the synthetic dataset (default: a temp dir)')
+    parser.add_argument('--json', help='Also write the report as JSON to this path')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir, open(os.devnull, 'w') as devnull:
+        info = generate(args.scale, args.data_dir or tmp_dir)
+        configure(logging.WARNING, False, {}, 'standard', devnull)
+        engine = MarketAnalysisEngine(info['city_data_path'], info['ga4_data_path'],
+                                      ga4_delta_dir=None, result_cache_size=0)
+
+        rng = np.random.default_rng(1)
+        candidates = engine.ga4_data.index.intersection(engine.city_data.index)
+        targets = [engine.city_data.loc[key, ['city', 'state_id']].tolist()
+                   for key in rng.choice(candidates, size=min(args.targets, len(candidates)), replace=False)]
+
+        report = [run_scenario(engine, targets, args.radius, args.requests, devnull, name)
+                  for name in args.scenarios.split(',')]
+        configure(logging.WARNING, False, {}, 'standard', devnull)
+
+    baseline = report[0]
+    print(f"\n{args.requests} requests per scenario, {info['city_rows']:,} cities, radius {args.radius} mi\n")
+    print(f"  {'scenario':<22}{'request-thread CPU':>20}{'process CPU':>14}{'wall p50':>12}{'saved/request':>16}")
+    for row in report:
+        saved = baseline['request_thread_cpu_ms'] - row['request_thread_cpu_ms']
+        print(f"  {row['scenario']:<22}{row['request_thread_cpu_ms']:>17.2f} ms{row['process_cpu_ms']:>11.2f} ms"
+              f"{row['wall_p50_ms']:>9.2f} ms{saved:>13.2f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {len(report)} scenarios to {args.json}")
+
+if __name__ == '__main__':
+    main()
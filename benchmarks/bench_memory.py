@@ -0,0 +1,99 @@
+"""
+Memory footprint of the market datasets: legacy load vs the declared schema.
+
+The legacy load reads every column with inferred dtypes
+(`pd.read_csv(path, low_memory=False)`) and builds lowercase city_state keys
+per frame, as MarketAnalysisEngine did before config/schema.py. The schema
+load projects the used columns, coerces them to compact dtypes and interns
+the keys (utils/data_utils.py).
+
+Reported per dataset: deep pandas memory, memory retained after load
+(tracemalloc; counts strings shared between frames once), peak memory
+during load and load time.
+
+Usage:
+    python -m benchmarks.bench_memory [--scale 1] [--data-dir DIR] [--json report.json]
+"""
+import argparse
+import gc
+import json
+import logging
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+import pandas as pd
+
+from benchmarks.synthetic import generate
+from config.settings import CITY_DATA_PATH, GA4_DATA_PATH
+from utils.data_utils import frame_memory, load_city_data, load_ga4_data
+
+def legacy_load(path: str) -> pd.DataFrame:
+    df = pd.read_csv(path, low_memory=False)
+    if 'city' in df.columns and 'state_id' in df.columns:
+        df['city_state'] = df['city'] + ', ' + df['state_id']
+    df['city_state'] = df['city_state'].str.lower().str.strip()
+    return df.set_index('city_state')
+
+def schema_load(loader: Callable) -> Callable:
+    return lambda path: loader(path).set_index('city_state')
+
+def measure(load: Callable, city_path: str, ga4_path: str) -> Dict:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    city_data = load['city'](city_path)
+    ga4_data = load['ga4'](ga4_path)
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'load_s': elapsed,
+        'retained_mib': retained / 2**20,
+        'peak_mib': peak / 2**20,
+        'city_deep_mib': frame_memory(city_data) / 2**20,
+        'ga4_deep_mib': frame_memory(ga4_data) / 2**20,
+        'city_columns': city_data.shape[1],
+        'ga4_columns': ga4_data.shape[1],
+        'city_dtypes': city_data.dtypes.astype(str).value_counts().to_dict(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, help='Use a synthetic dataset at this multiple instead of data/')
+    parser.add_argument('--data-dir', help='Where to write the synthetic dataset (default: a temp dir)')
+    parser.add_argument('--json', help='Also write the report as JSON to this path')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    loaders = {
+        'legacy': {'city': legacy_load, 'ga4': legacy_load},
+        'schema': {'city': schema_load(load_city_data), 'ga4': schema_load(load_ga4_data)},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.scale:
+            info = generate(args.scale, args.data_dir or tmp_dir)
+            city_path, ga4_path = info['city_data_path'], info['ga4_data_path']
+        else:
+            city_path, ga4_path = CITY_DATA_PATH, GA4_DATA_PATH
+        report = {name: measure(load, city_path, ga4_path) for name, load in loaders.items()}
+
+    print(f"\ncities: {city_path}\nga4:    {ga4_path}\n")
+    print(f"  {'':<18}{'legacy':>12}{'schema':>12}{'saved':>10}")
+    for key, label in [('city_deep_mib', 'cities (deep)'), ('ga4_deep_mib', 'ga4 (deep)'),
+                       ('retained_mib', 'retained'), ('peak_mib', 'peak during load')]:
+        legacy, schema = report['legacy'][key], report['schema'][key]
+        saved = 1 - schema / legacy if legacy else 0.0
+        print(f"  {label:<18}{legacy:>8.2f} MiB{schema:>8.2f} MiB{saved:>10.0%}")
+    print(f"  {'load time':<18}{report['legacy']['load_s']:>10.2f} s{report['schema']['load_s']:>10.2f} s")
+    for name in loaders:
+        print(f"\n  {name} city dtypes: {report[name]['city_dtypes']}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Compare the slotted model records and msgpack codec against plain
+dataclasses serialized with pickle.
+
+Reports memory per result/metrics pair, payload size and encode/decode
+throughput. Expect the codec to encode faster and smaller than pickle but
+to decode more slowly; the slotted records are what save memory.
+
+Usage:
+    python -m benchmarks.bench_models [--count 100000]
+"""
+import argparse
+import gc
+import pickle
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+from models import SearchResult, SEOMetrics, encode, decode
+
+@dataclass
+class LegacySearchResult:
+    """The pre-slots SearchResult definition, kept here as the baseline."""
+    domain: str
+    rank: int
+    url: str
+    title: str
+
+@dataclass
+class LegacySEOMetrics:
+    """The pre-slots SEOMetrics definition, kept here as the baseline."""
+    domain: str
+    authority_score: float
+    backlink_count: int
+    referring_domains: int
+
+def _build(result_cls, metrics_cls, count):
+    # Share the string objects across runs so only per-instance overhead is measured
+    domains = [f"investor{i % 500}.com" for i in range(count)]
+    urls = [f"https://{d}/sell-fast" for d in domains]
+    results = [result_cls(domains[i], i % 10 + 1, urls[i], "We Buy Houses") for i in range(count)]
+    metrics = [metrics_cls(domains[i], 42.0, 1000 + i, 50) for i in range(count)]
+    return results, metrics
+
+def measure_memory(result_cls, metrics_cls, count):
+    """Return bytes allocated per (result, metrics) pair, excluding shared strings."""
+    domains = [f"investor{i % 500}.com" for i in range(count)]
+    urls = [f"https://{d}/sell-fast" for d in domains]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    results = [result_cls(domains[i], i % 10 + 1, urls[i], "We Buy Houses") for i in range(count)]
+    metrics = [metrics_cls(domains[i], 42.0, 1000 + i, 50) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del results, metrics
+    return (after - before) / count
+
+def measure_codec(payload, dumps, loads, repeat=3):
+    """Return (encoded bytes, best encode seconds, best decode seconds)."""
+    encode_times, decode_times = [], []
+    data = dumps(payload)
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = dumps(payload)
+        encode_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        loads(data)
+        decode_times.append(time.perf_counter() - start)
+    return len(data), min(encode_times), min(decode_times)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=100_000, help='Records per model type')
+    args = parser.parse_args()
+
+    print(f"Memory per SearchResult + SEOMetrics pair ({args.count:,} pairs)")
+    legacy_mem = measure_memory(LegacySearchResult, LegacySEOMetrics, args.count)
+    slotted_mem = measure_memory(SearchResult, SEOMetrics, args.count)
+    print(f"  dataclass        {legacy_mem:8.1f} B  ({legacy_mem * 100_000 / 2**20:6.1f} MiB per 100k)")
+    print(f"  slotted record   {slotted_mem:8.1f} B  ({slotted_mem * 100_000 / 2**20:6.1f} MiB per 100k)")
+
+    print(f"\nSerialization of {args.count:,} results + {args.count:,} metrics")
+    rows = [
+        ('dataclass + pickle', _build(LegacySearchResult, LegacySEOMetrics, args.count),
+         lambda o: pickle.dumps(o, protocol=pickle.HIGHEST_PROTOCOL), pickle.loads),
+        ('slotted + pickle', _build(SearchResult, SEOMetrics, args.count),
+         lambda o: pickle.dumps(o, protocol=pickle.HIGHEST_PROTOCOL), pickle.loads),
+        ('slotted + msgpack codec', _build(SearchResult, SEOMetrics, args.count), encode, decode),
+    ]
+    print(f"  {'format':<26}{'size (MiB)':>12}{'encode/s':>14}{'decode/s':>14}")
+    total = 2 * args.count
+    for name, payload, dumps, loads in rows:
+        size, enc, dec = measure_codec(list(payload), dumps, loads)
+        print(f"  {name:<26}{size / 2**20:>12.2f}{total / enc:>14,.0f}{total / dec:>14,.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Recall and latency of the nationwide similarity index.
+
+Builds the feature-preset matrices over a synthetic (or the real) cities
+dataset, then for each index variant reports build time, per-query latency
+and recall@k against a brute-force scan of the same matrix:
+
+- exact:  KD-tree over all features (recall must be 1.0)
+- pca<N>: KD-tree over N PCA components, candidates re-ranked exactly
+
+Exits with status 1 if the exact index misses a neighbor, or if an
+approximate variant falls below --min-recall, so it doubles as a check.
+
+Usage:
+    python -m benchmarks.bench_national [--scale 1] [--components 0,12] [--k 25] [--queries 200]
+                                        [--preset balanced] [--min-recall 0.95] [--json report.json]
+"""
+import argparse
+import json
+import logging
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict
+
+import numpy as np
+
+from benchmarks.synthetic import generate
+from config.constants import FEATURE_WEIGHT_PRESETS
+from config.settings import CITY_DATA_PATH, NATIONAL_INDEX_OVERSAMPLE
+from engine.feature_presets import build_preset_matrices
+from engine.national_index import NationalIndex, brute_force_neighbors
+from utils.data_utils import load_city_data
+
+def bench_index(matrix: np.ndarray, positions: np.ndarray, k: int, components: int, oversample: int) -> Dict:
+    start = time.perf_counter()
+    index = NationalIndex(matrix, components, oversample)
+    build_s = time.perf_counter() - start
+
+    latencies, recalls = [], []
+    for position in positions:
+        start = time.perf_counter()
+        _, found = index.query(position, k)
+        latencies.append(time.perf_counter() - start)
+        expected_distances, expected = brute_force_neighbors(matrix, position, k)
+        # Ties at the k-th distance can be broken either way; count any row within that distance as a hit
+        kth = expected_distances[-1]
+        hits = np.linalg.norm(matrix[found] - matrix[position], axis=1) <= kth + 1e-6
+        recalls.append(hits.sum() / len(expected))
+
+    latencies.sort()
+    return {
+        'variant': 'exact' if index.exact else f"pca{components}",
+        'build_ms': build_s * 1000,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        'recall': float(np.mean(recalls)),
+        'min_recall': float(np.min(recalls)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, help='Use a synthetic dataset at this multiple instead of data/')
+    parser.add_argument('--components', default='0,12', help='Comma-separated PCA sizes (0 = exact)')
+    parser.add_argument('--k', type=int, default=25, help='Neighbors per query')
+    parser.add_argument('--queries', type=int, default=200, help='Random target cities to query')
+    parser.add_argument('--preset', default='balanced', choices=sorted(FEATURE_WEIGHT_PRESETS))
+    parser.add_argument('--oversample', type=int, default=NATIONAL_INDEX_OVERSAMPLE,
+                        help='Candidates per neighbor re-ranked by PCA variants')
+    parser.add_argument('--min-recall', type=float, default=0.95, help='Fail if a PCA variant recalls less')
+    parser.add_argument('--data-dir', help='Where to write the synthetic dataset (default: a temp dir)')
+    parser.add_argument('--json', help='Also write the report as JSON to this path')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        city_path = generate(args.scale, args.data_dir or tmp_dir)['city_data_path'] if args.scale else CITY_DATA_PATH
+        city_data = load_city_data(city_path).set_index('city_state')
+
+    presets = build_preset_matrices(city_data, {args.preset: FEATURE_WEIGHT_PRESETS[args.preset]})
+    matrix = presets.matrices[args.preset]
+    rng = np.random.default_rng(1)
+    positions = rng.choice(len(matrix), size=min(args.queries, len(matrix)), replace=False)
+
+    report = [bench_index(matrix, positions, args.k, int(c), args.oversample) for c in args.components.split(',')]
+
+    print(f"\n{len(matrix):,} cities x {matrix.shape[1]} features, preset {args.preset}, "
+          f"k={args.k}, {len(positions)} queries\n")
+    print(f"  {'variant':<10}{'build':>11}{'p50':>11}{'p99':>11}{'recall':>9}{'worst':>8}")
+    for row in report:
+        print(f"  {row['variant']:<10}{row['build_ms']:>8.1f} ms{row['p50_ms']:>8.2f} ms{row['p99_ms']:>8.2f} ms"
+              f"{row['recall']:>9.3f}{row['min_recall']:>8.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    failed = [row['variant'] for row in report
+              if row['recall'] < (1.0 if row['variant'] == 'exact' else args.min_recall)]
+    if failed:
+        print(f"\nRecall below threshold: {', '.join(failed)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
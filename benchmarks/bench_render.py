@@ -0,0 +1,141 @@
+"""
+Rendering cost of the results page: template compilation and fragment caching.
+
+Two measurements:
+
+- compile: loading results.html and its fragments into a fresh Jinja
+  environment, as a newly booted worker does on its first request, once
+  compiling from source and once from a populated bytecode cache
+- render: results.html for several targets, with the fragment cache off
+  (every fragment rendered, including the folium map), with all fragments
+  missing (first view of each target) and with all fragments cached
+  (repeat views)
+
+The app is imported with its upstream APIs pointed at the local stand-ins
+(benchmarks/standins.py); one market analysis is fetched and reused for every
+target, since only rendering is timed.
+
+Usage:
+    python -m benchmarks.bench_render [--targets 20] [--repeat 5] [--radius 100] [--json report.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def compile_ms(template_dir: str, names: List[str], bytecode_dir: str = None, repeat: int = 5) -> float:
+    """Median time to load the named templates into a fresh environment."""
+    times = []
+    for _ in range(repeat):
+        env = Environment(loader=FileSystemLoader(template_dir),
+                          bytecode_cache=FileSystemBytecodeCache(bytecode_dir) if bytecode_dir else None)
+        start = time.perf_counter()
+        for name in names:
+            env.get_template(name)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+def median_ms(fn: Callable, calls: List) -> float:
+    times = []
+    for args in calls:
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--targets', type=int, default=20, help='Target markets to render')
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh environments for the compile timing')
+    parser.add_argument('--radius', type=int, default=100, help='Search radius in miles')
+    parser.add_argument('--json', help='Also write the report as JSON to this path')
+    args = parser.parse_args()
+
+    serper_port, semrush_port = free_port(), free_port()
+    bytecode_dir = tempfile.mkdtemp(prefix='jinja_cache_')
+    # Settings are read when config is first imported, so the environment has to be in place before that
+    os.environ.update(SERPER_BASE_URL=f"http://127.0.0.1:{serper_port}",
+                      SEMRUSH_BASE_URL=f"http://127.0.0.1:{semrush_port}", SERPER_API_KEY='bench',
+                      SEMRUSH_API_KEY='bench', SERP_SNAPSHOT_DB_PATH='', DATA_RELOAD_INTERVAL='0',
+                      JINJA_BYTECODE_CACHE_DIR=bytecode_dir)
+    from benchmarks.standins import SemrushHandler, SerperHandler, StandInServer
+    serper = StandInServer(SerperHandler, port=serper_port).start()
+    semrush = StandInServer(SemrushHandler, port=semrush_port).start()
+    import app as webapp
+    from config.constants import MARKET_TAGS, OPPORTUNITY_COMPONENT_LABELS
+    from utils.fragment_cache import FragmentCache
+    logging.disable(logging.WARNING)
+
+    template_dir = os.path.join(webapp.app.root_path, 'templates')
+    # Importing the app compiled the templates into bytecode_dir
+    report = {
+        'compile_source_ms': compile_ms(template_dir, webapp.RESULTS_TEMPLATES, None, args.repeat),
+        'compile_bytecode_ms': compile_ms(template_dir, webapp.RESULTS_TEMPLATES, bytecode_dir, args.repeat),
+    }
+
+    engine = webapp.engine
+    keys = engine.ga4_data.index.intersection(engine.city_data.index)[:args.targets]
+    first_city, first_state = engine.city_data.loc[keys[0], ['city', 'state_id']]
+    market_analysis = webapp.serp_fragment_input(
+        asyncio.run(webapp.search_engine.analyze_market(first_city, first_state))
+    )
+    contexts = []
+    for key in keys:
+        city, state = engine.city_data.loc[key, ['city', 'state_id']]
+        similar_cities = engine.find_similar_cities(city, state, radius_miles=args.radius)
+        contexts.append(dict(
+            target_city=city, target_state=state,
+            **webapp.results_fragment_inputs(similar_cities, city, state, args.radius),
+            market_tags=MARKET_TAGS, market_analysis=market_analysis, seo_metrics={}, radius=args.radius,
+            preset=None, score_weights=engine.opportunity_engine.weights,
+            component_labels=OPPORTUNITY_COMPONENT_LABELS,
+        ))
+
+    def render(context: Dict):
+        webapp.render_template('results.html', **context)
+
+    def use_cache(max_size: int):
+        cache = FragmentCache(webapp.app.jinja_env, max_size=max_size, ttl=None)
+        webapp.app.jinja_env.globals['fragment'] = cache.render
+        return cache
+
+    with webapp.app.test_request_context():
+        render(contexts[0])  # warm-up
+        use_cache(0)
+        report['render_uncached_ms'] = median_ms(render, [(context,) for context in contexts])
+        cache = use_cache(len(contexts) * len(webapp.RESULTS_TEMPLATES))
+        report['render_cold_fragments_ms'] = median_ms(render, [(context,) for context in contexts])
+        report['render_cached_fragments_ms'] = median_ms(render, [(context,) for context in contexts])
+        report['fragment_cache'] = cache.stats()
+
+    serper.stop()
+    semrush.stop()
+
+    print(f"\nresults.html and {len(webapp.RESULTS_TEMPLATES) - 1} fragments, {len(contexts)} targets")
+    print(f"\n  {'compile from source':<28}{report['compile_source_ms']:>8.1f} ms")
+    print(f"  {'load from bytecode cache':<28}{report['compile_bytecode_ms']:>8.1f} ms"
+          f"  ({report['compile_source_ms'] / report['compile_bytecode_ms']:.1f}x)")
+    print(f"\n  {'render, no fragment cache':<28}{report['render_uncached_ms']:>8.1f} ms")
+    print(f"  {'render, fragments missing':<28}{report['render_cold_fragments_ms']:>8.1f} ms")
+    print(f"  {'render, fragments cached':<28}{report['render_cached_fragments_ms']:>8.1f} ms"
+          f"  ({report['render_uncached_ms'] / report['render_cached_fragments_ms']:.1f}x)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
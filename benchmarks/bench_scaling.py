@@ -0,0 +1,172 @@
+"""
+Scaling benchmark for the request hot paths over synthetic nationwide datasets.
+
+Generates cities.csv / ga4data.csv at each requested multiple of today's
+row counts and reports latency and peak traced memory of:
+
+- MarketAnalysisEngine construction (data load)
+- MarketAnalysisEngine.filter_cities_by_distance, per radius
+- MarketAnalysisEngine.find_similar_cities, per radius (neighborhood-scaled
+  and with a precomputed feature preset)
+- OpportunityEngine.calculate_opportunity_score
+- SearchEngine ranking/performance aggregation
+- extract_base_domain
+
+Usage:
+    python -m benchmarks.bench_scaling [--scales 1,10,100] [--radii 25,50,100,200]
+                                       [--targets 5] [--data-dir DIR] [--json report.json]
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from benchmarks.synthetic import generate
+from engine.market_engine import MarketAnalysisEngine
+from engine.search_engine import SearchEngine
+from models import SearchResult, SEOMetrics
+from utils.domain_utils import extract_base_domain
+
+GA4_COLUMNS = ['users_org', 'cvr_org', 'leads_org', 'users_paid', 'cvr_paid', 'leads_paid', 'unique_sites']
+
+def measure(fn: Callable, repeat: int = 5) -> Dict[str, float]:
+    """Time fn `repeat` times, then run it once more under tracemalloc for peak memory."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'p50_ms': statistics.median(timings) * 1000,
+        'max_ms': timings[-1] * 1000,
+        'peak_mib': peak / 2**20
+    }
+
+def _synthetic_serp(n_results: int):
+    search_results = {}
+    seo_metrics = {}
+    terms = ['we buy houses', 'sell my house fast', 'sell my house fast for cash']
+    per_term = max(n_results // len(terms), 1)
+    for t, term in enumerate(terms):
+        results = []
+        for rank in range(1, per_term + 1):
+            domain = f"investor{(rank * 7 + t) % (per_term * 2)}.com"
+            results.append(SearchResult(domain=domain, rank=rank, url=f"https://{domain}/", title=term))
+            seo_metrics[domain] = SEOMetrics(domain=domain, authority_score=35.0, backlink_count=1200, referring_domains=80)
+        search_results[term] = results
+    return search_results, seo_metrics
+
+def bench_scale(scale: float, data_dir: str, radii: List[int], n_targets: int, repeat: int) -> List[Dict]:
+    rows = []
+    scale_dir = os.path.join(data_dir, f"{scale:g}x")
+    info = generate(scale, scale_dir)
+    print(f"\n== {scale:g}x: {info['city_rows']:,} cities, {info['ga4_rows']:,} GA4 rows")
+
+    def record(name, radius, stats):
+        row = {'benchmark': name, 'scale': scale, 'city_rows': info['city_rows'], 'radius': radius, **stats}
+        rows.append(row)
+        radius_label = f"{radius:>5}" if radius is not None else '    -'
+        print(f"  {name:<32}{radius_label}  p50 {stats['p50_ms']:>10.2f} ms  "
+              f"max {stats['max_ms']:>10.2f} ms  peak {stats['peak_mib']:>9.2f} MiB")
+
+    engines = []
+    record('engine_load', None, measure(
+        lambda: engines.append(MarketAnalysisEngine(info['city_data_path'], info['ga4_data_path'],
+                                                    ga4_delta_dir=None, result_cache_size=0)), repeat=1
+    ))
+    engine = engines[0]
+    del engines[1:]
+
+    rng = np.random.default_rng(1)
+    candidates = engine.ga4_data.index.intersection(engine.city_data.index)
+    targets = [engine.city_data.loc[key, ['city', 'state_id']].tolist()
+               for key in rng.choice(candidates, size=min(n_targets, len(candidates)), replace=False)]
+
+    for radius in radii:
+        target_keys = [f"{city}, {state}".lower() for city, state in targets]
+        record('filter_cities_by_distance', radius, measure(
+            lambda: [engine.filter_cities_by_distance(key, radius) for key in target_keys], repeat=repeat
+        ))
+        record('find_similar_cities', radius, measure(
+            lambda: [engine.find_similar_cities(city, state, radius_miles=radius) for city, state in targets],
+            repeat=repeat
+        ))
+        record('find_similar_cities[preset]', radius, measure(
+            lambda: [engine.find_similar_cities(city, state, radius_miles=radius, preset='balanced')
+                     for city, state in targets],
+            repeat=repeat
+        ))
+
+    # Score a realistic neighborhood: the inputs find_similar_cities hands to the opportunity engine
+    city, state = targets[0]
+    target_key = f"{city}, {state}".lower()
+    scored = engine.find_similar_cities(city, state, radius_miles=max(radii))
+    input_columns = list(engine.city_data.columns) + ['distance_to_target', 'similarity_score'] + GA4_COLUMNS
+    neighborhood = scored[[c for c in input_columns if c in scored.columns]]
+    record('calculate_opportunity_score', None, measure(
+        lambda: engine.opportunity_engine.calculate_opportunity_score(neighborhood.copy(), target_key),
+        repeat=repeat
+    ))
+
+    search_engine = SearchEngine()
+    search_results, seo_metrics = _synthetic_serp(int(30 * scale))
+
+    def aggregate():
+        domains = search_engine._extract_unique_domains(search_results)
+        ibuyers = search_engine._calculate_ibuyer_metrics(domains)
+        search_engine._analyze_rankings(search_results, seo_metrics)
+        performance = search_engine._analyze_domain_performance(search_results, seo_metrics)
+        search_engine._create_summary(domains, ibuyers, seo_metrics, performance)
+
+    record('search_engine_aggregation', None, measure(aggregate, repeat=repeat))
+
+    urls = [f"https://www.investor{i}.example.co.uk/we-buy-houses?page={i}" for i in range(int(1000 * scale))]
+    record('extract_base_domain', None, measure(lambda: [extract_base_domain(u) for u in urls], repeat=repeat))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='1,10,100', help='Comma-separated dataset multiples')
+    parser.add_argument('--radii', default='25,50,100,200', help='Comma-separated radii in miles')
+    parser.add_argument('--targets', type=int, default=5, help='Target cities per measurement')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed repetitions per measurement')
+    parser.add_argument('--data-dir', help='Where to write synthetic datasets (default: a temp dir)')
+    parser.add_argument('--json', help='Also write the report as JSON to this path')
+    parser.add_argument('--with-logging', action='store_true', help='Keep INFO logging enabled while timing')
+    args = parser.parse_args()
+
+    if not args.with_logging:
+        logging.disable(logging.INFO)
+
+    scales = [float(s) for s in args.scales.split(',')]
+    radii = [int(r) for r in args.radii.split(',')]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = args.data_dir or tmp_dir
+        report = []
+        for scale in scales:
+            report.extend(bench_scale(scale, data_dir, radii, args.targets, args.repeat))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {len(report)} measurements to {args.json}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""
+Golden comparison and timing of the opportunity scoring kernel.
+
+Scores the same neighborhoods with the original pandas implementation of
+OpportunityEngine.calculate_opportunity_score (kept below as
+`legacy_score`) and with the NumPy kernel (engine/scoring_kernel.py), then:
+
+- checks every output column, the categories and the tags for equality
+  (floats within --rtol; the legacy path does its arithmetic on the float32
+  city columns while the kernel uses float64, so exact equality is not
+  expected), including edge cases such as markets without GA4
+  data, a missing similarity column and a target outside its neighborhood
+- reports per-neighborhood time for the legacy path, the kernel one
+  neighborhood at a time, and the kernel scoring all neighborhoods in one
+  batched call
+
+Exits with status 1 on any mismatch, so it doubles as a check.
+
+Usage:
+    python -m benchmarks.bench_scoring [--scale 1] [--neighborhoods 200] [--radius 100] [--rtol 1e-6]
+                                       [--json report.json]
+"""
+import argparse
+import json
+import logging
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from benchmarks.synthetic import generate
+from config.constants import MARKET_TAGS
+from config.schema import GA4_COLUMNS
+from engine.market_engine import MarketAnalysisEngine
+from engine.opportunity_engine import OpportunityEngine
+
+def legacy_score(df: pd.DataFrame, target_city_state: str) -> pd.DataFrame:
+    """OpportunityEngine.calculate_opportunity_score as implemented before the NumPy kernel."""
+    for col in ['unique_sites', 'housing_units', 'users_org', 'users_paid']:
+        if col not in df.columns:
+            df[col] = 1
+
+    ga4_columns = ['users_org', 'cvr_org', 'leads_org', 'users_paid', 'cvr_paid', 'leads_paid']
+    metrics_df = pd.DataFrame(index=df.index)
+    std_ga4_columns = [f'std_{col}' for col in ga4_columns]
+    metrics_df[std_ga4_columns] = StandardScaler().fit_transform(df[ga4_columns].fillna(df[ga4_columns].mean()))
+    avg_performance = metrics_df[metrics_df.index != target_city_state][std_ga4_columns].mean()
+    metrics_df['performance_diff'] = (metrics_df[std_ga4_columns] - avg_performance).mean(axis=1)
+    df = df.join(metrics_df)
+
+    metrics_df = pd.DataFrame(index=df.index)
+    metrics_df['network_penetration'] = (df['unique_sites'] / df['housing_units']) * 100
+    metrics_df['avg_network_penetration'] = metrics_df['network_penetration'].mean()
+    total_users = df['users_org'] + df['users_paid'] + 1
+    metrics_df['engagement_diversity'] = df['unique_sites'] / total_users
+    avg_penetration = metrics_df['network_penetration'].mean()
+    metrics_df['growth_potential'] = (avg_penetration - metrics_df['network_penetration']) / avg_penetration
+    total_leads = df['leads_org'] + df['leads_paid']
+    metrics_df['performance_efficiency'] = total_leads / (df['unique_sites'] + 1)
+    metrics_df['log_unique_sites'] = np.log1p(df['unique_sites'])
+    metrics_df['log_housing_units'] = np.log1p(df['housing_units'])
+    metrics_df['saturation_risk'] = 1 - (1 / (1 + np.exp(-(metrics_df['log_unique_sites'] - metrics_df['log_housing_units']))))
+    df = df.join(metrics_df)
+
+    if 'similarity_score' in df.columns and not df['similarity_score'].isna().all():
+        df['norm_similarity'] = 1 - (
+            (df['similarity_score'] - df['similarity_score'].min()) /
+            (df['similarity_score'].max() - df['similarity_score'].min())
+        )
+    else:
+        df['norm_similarity'] = 1
+    df['raw_opportunity_score'] = (
+        0.3 * df['norm_similarity'] +
+        0.2 * (1 - df['performance_diff']) +
+        0.1 * df['network_penetration'] +
+        0.1 * df['engagement_diversity'] +
+        0.1 * df['growth_potential'] +
+        0.1 * df['performance_efficiency'] +
+        0.1 * (1 - df['saturation_risk'])
+    )
+    df['normalized_log_housing'] = (df['log_housing_units'] - df['log_housing_units'].min()) / (
+        df['log_housing_units'].max() - df['log_housing_units'].min()
+    )
+    df['opportunity_score'] = df['raw_opportunity_score'] * (1 + df['normalized_log_housing'])
+    min_score, max_score = df['opportunity_score'].min(), df['opportunity_score'].max()
+    if min_score != max_score:
+        df['opportunity_score'] = (df['opportunity_score'] - min_score) / (max_score - min_score)
+    else:
+        df['opportunity_score'] = 1
+    df['opportunity_category'] = pd.qcut(df['opportunity_score'], q=3, labels=['Low', 'Average', 'High'],
+                                         duplicates='drop')
+    df['tags'] = df.apply(lambda row: [tag for tag, data in MARKET_TAGS.items() if data['condition'](row)], axis=1)
+    return df
+
+def compare(expected: pd.DataFrame, actual: pd.DataFrame, rtol: float) -> List[str]:
+    """Differences between two scored frames (empty if they match)."""
+    problems = []
+    if list(expected.columns) != list(actual.columns):
+        problems.append(f"columns differ: {list(expected.columns)} vs {list(actual.columns)}")
+        return problems
+    for col in expected.columns:
+        a, b = expected[col], actual[col]
+        if col == 'tags':
+            if a.tolist() != b.tolist():
+                problems.append('tags differ')
+        elif col == 'opportunity_category':
+            if a.astype(str).tolist() != b.astype(str).tolist():
+                problems.append('categories differ')
+        elif pd.api.types.is_numeric_dtype(a):
+            if not np.allclose(a.to_numpy(float), b.to_numpy(float), rtol=rtol, atol=1e-6, equal_nan=True):
+                problems.append(f"{col} differs (max abs diff {np.nanmax(np.abs(a.to_numpy(float) - b.to_numpy(float))):.3g})")
+        elif not a.equals(b):
+            problems.append(f"{col} differs")
+    return problems
+
+def edge_cases(neighborhoods: List[Tuple[pd.DataFrame, str]]) -> Dict[str, Tuple[pd.DataFrame, str]]:
+    df, target = neighborhoods[0]
+    cases = {}
+    missing = df.copy()
+    missing.loc[missing.index[1:4], GA4_COLUMNS] = np.nan
+    cases['missing_ga4_rows'] = (missing, target)
+    cases['no_similarity_column'] = (df.drop(columns=['similarity_score']), target)
+    nan_similarity = df.copy()
+    nan_similarity['similarity_score'] = np.nan
+    cases['all_nan_similarity'] = (nan_similarity, target)
+    cases['target_outside'] = (df[df.index != target].copy(), target)
+    cases['zero_housing_units'] = (df.assign(housing_units=df['housing_units'].where(df.index != df.index[2], 0)), target)
+    return cases
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=1.0, help='Synthetic dataset multiple')
+    parser.add_argument('--neighborhoods', type=int, default=200, help='Target neighborhoods to score')
+    parser.add_argument('--radius', type=int, default=100, help='Search radius in miles')
+    parser.add_argument('--rtol', type=float, default=1e-6, help='Relative tolerance for float columns')
+    parser.add_argument('--data-dir', help='Where to write the synthetic dataset (default: a temp dir)')
+    parser.add_argument('--json', help='Also write the report as JSON to this path')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        info = generate(args.scale, args.data_dir or tmp_dir)
+        engine = MarketAnalysisEngine(info['city_data_path'], info['ga4_data_path'],
+                                      ga4_delta_dir=None, result_cache_size=0)
+
+    # Neighborhoods exactly as find_similar_cities hands them to the opportunity engine
+    rng = np.random.default_rng(1)
+    candidates = engine.ga4_data.index.intersection(engine.city_data.index)
+    input_columns = list(engine.city_data.columns) + ['distance_to_target', 'similarity_score'] + GA4_COLUMNS
+    neighborhoods = []
+    for key in rng.choice(candidates, size=min(args.neighborhoods, len(candidates)), replace=False):
+        city, state = engine.city_data.loc[key, ['city', 'state_id']]
+        scored = engine.find_similar_cities(city, state, radius_miles=args.radius)
+        neighborhoods.append((scored[[c for c in input_columns if c in scored.columns]].copy(), key))
+
+    opportunity_engine = OpportunityEngine()
+    cases = {f"neighborhood_{i}": case for i, case in enumerate(neighborhoods)}
+    cases.update(edge_cases(neighborhoods))
+
+    mismatches, skipped = {}, []
+    for name, (df, target) in cases.items():
+        try:
+            expected = legacy_score(df.copy(), target)
+        except ValueError:
+            # pd.qcut cannot label neighborhoods with tied terciles; the kernel still categorizes them
+            skipped.append(name)
+            continue
+        actual, _ = opportunity_engine.calculate_opportunity_score(df.copy(), target)
+        problems = compare(expected, actual, args.rtol)
+        if problems:
+            mismatches[name] = problems
+
+    frames, targets = [df for df, _ in neighborhoods], [target for _, target in neighborhoods]
+    batched = opportunity_engine.calculate_opportunity_scores([df.copy() for df in frames], targets)
+    for i, (df, target) in enumerate(neighborhoods):
+        single, _ = opportunity_engine.calculate_opportunity_score(df.copy(), target)
+        problems = compare(single, batched[i], args.rtol)
+        if problems:
+            mismatches[f"batch_{i}"] = problems
+
+    def timed(fn) -> float:
+        start = time.perf_counter()
+        fn()
+        return time.perf_counter() - start
+
+    legacy_ms = statistics.median(timed(lambda: legacy_score(df.copy(), target)) for df, target in neighborhoods) * 1000
+    kernel_ms = statistics.median(
+        timed(lambda: opportunity_engine.calculate_opportunity_score(df.copy(), target)) for df, target in neighborhoods
+    ) * 1000
+    batch_ms = timed(lambda: opportunity_engine.calculate_opportunity_scores([df.copy() for df in frames],
+                                                                             targets)) * 1000 / len(frames)
+
+    report = {
+        'cases': len(cases),
+        'compared': len(cases) - len(skipped) + len(neighborhoods),
+        'skipped_legacy_errors': skipped,
+        'mismatches': mismatches,
+        'rows_per_neighborhood': statistics.mean(len(df) for df in frames),
+        'legacy_ms': legacy_ms,
+        'kernel_ms': kernel_ms,
+        'kernel_batched_ms': batch_ms,
+    }
+
+    print(f"\n{report['compared']} comparisons ({len(neighborhoods)} neighborhoods of ~{report['rows_per_neighborhood']:.0f} "
+          f"markets, {len(cases) - len(neighborhoods)} edge cases, batch vs single)")
+    if skipped:
+        print(f"  skipped (legacy pd.qcut error): {', '.join(skipped)}")
+    for name, problems in mismatches.items():
+        print(f"  MISMATCH {name}: {'; '.join(problems)}")
+    print(f"\n  {'legacy pandas':<24}{legacy_ms:>8.2f} ms / neighborhood")
+    print(f"  {'kernel':<24}{kernel_ms:>8.2f} ms / neighborhood  ({legacy_ms / kernel_ms:.1f}x)")
+    print(f"  {'kernel, one batch':<24}{batch_ms:>8.2f} ms / neighborhood  ({legacy_ms / batch_ms:.1f}x)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Serper calls and wall time: one query per request vs batched queries.
+
+Runs SearchService against local Serper stand-ins (benchmarks/standins.py)
+with a fixed per-request latency:
+
+- one market: get_all_search_terms with batching off (one request per term,
+  a second apart, as before) and on (all terms in one request)
+- several markets: get_search_terms_for_markets for --markets markets, with
+  batching off (every market's terms one at a time, markets concurrently),
+  on, and on with batches of --small-batch queries
+
+For each run the report gives the wall time and the requests the stand-in
+received. Four checks fail the run (exit 1) if they do not hold:
+
+- batched results equal the one-query-per-request results for every market
+  and term
+- a batched run makes one request per batch_size queries
+- small batches split the queries into the expected number of requests and
+  still give the same results
+- against a stand-in that rejects arrays, the batched service falls back to
+  single queries, gives the same results and pauses batching
+
+Usage:
+    python -m benchmarks.bench_serper_batch [--markets 10] [--latency constant:0.25] [--small-batch 4]
+                                            [--json report.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import sys
+import time
+from typing import Dict
+
+from benchmarks.bench_render import free_port
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--markets', type=int, default=10, help='Markets fetched together')
+    parser.add_argument('--latency', default='constant:0.25', help='Stand-in latency per request')
+    parser.add_argument('--small-batch', type=int, default=4, help='Batch size for the chunked run')
+    parser.add_argument('--json', help='Also write the report as JSON to this path')
+    args = parser.parse_args()
+
+    serper_port = free_port()
+    # Settings are read when config is first imported, so the environment has to be in place before that
+    os.environ.update(SERPER_BASE_URL=f"http://127.0.0.1:{serper_port}", SERPER_API_KEY='bench',
+                      SERP_SNAPSHOT_DB_PATH='', CIRCUIT_FAILURE_THRESHOLD='0', REQUEST_DEADLINE_SECONDS='0')
+    from benchmarks.standins import SerperHandler, SingleQuerySerperHandler, StandInServer
+    from config.settings import CITY_DATA_PATH
+    from services.search_service import SearchService
+    from utils.data_utils import load_city_data
+    logging.disable(logging.WARNING)
+
+    serper = StandInServer(SerperHandler, port=serper_port, latency=args.latency).start()
+    single_only = StandInServer(SingleQuerySerperHandler, latency=args.latency).start()
+    city_data = load_city_data(CITY_DATA_PATH)
+    markets = list(zip(city_data['city'][:args.markets], city_data['state_id'].astype(str)[:args.markets]))
+    terms = len(SearchService().search_terms)
+
+    async def timed(server: StandInServer, fetch) -> Dict:
+        requests = server.stats['requests']
+        start = time.perf_counter()
+        results = await fetch()
+        return {'seconds': time.perf_counter() - start, 'requests': server.stats['requests'] - requests,
+                'results': results}
+
+    async def run() -> Dict:
+        single, batched = SearchService(batch_size=0), SearchService()
+        small = SearchService(batch_size=args.small_batch)
+        fallback = SearchService()
+        fallback.base_url = f"{single_only.url}/search"
+        city, state = markets[0]
+        return {
+            'one_market_single': await timed(serper, lambda: single.get_all_search_terms(city, state)),
+            'one_market_batched': await timed(serper, lambda: batched.get_all_search_terms(city, state)),
+            'markets_single': await timed(serper, lambda: single.get_search_terms_for_markets(markets)),
+            'markets_batched': await timed(serper, lambda: batched.get_search_terms_for_markets(markets)),
+            'markets_small_batches': await timed(serper, lambda: small.get_search_terms_for_markets(markets)),
+            'markets_fallback': await timed(single_only, lambda: fallback.get_search_terms_for_markets(markets)),
+            'fallback_batching': fallback.batching,
+        }
+
+    runs = asyncio.run(run())
+    serper.stop()
+    single_only.stop()
+
+    expected = runs['markets_single']['results']
+    checks = {
+        'same_results': (runs['markets_batched']['results'] == expected
+                         and runs['one_market_batched']['results'] == runs['one_market_single']['results']
+                         and all(len(results) == terms for results in expected.values())),
+        'one_request_per_batch': (runs['one_market_batched']['requests'] == 1
+                                  and runs['markets_batched']['requests'] == math.ceil(len(markets) * terms / 100)),
+        'small_batches': (runs['markets_small_batches']['results'] == expected
+                          and runs['markets_small_batches']['requests']
+                          == math.ceil(len(markets) * terms / args.small_batch)),
+        'fallback': runs['markets_fallback']['results'] == expected and not runs['fallback_batching'],
+    }
+    report = {
+        'markets': len(markets),
+        'terms': terms,
+        'latency': args.latency,
+        'runs': {name: {'seconds': run['seconds'], 'requests': run['requests']}
+                 for name, run in runs.items() if isinstance(run, dict)},
+        'checks': checks,
+    }
+
+    print(f"\n{terms} search terms per market, stand-in latency {args.latency}\n")
+    print(f"  {'run':<24}{'markets':>8}{'requests':>10}{'time':>10}")
+    for name, run in report['runs'].items():
+        count = 1 if name.startswith('one_market') else len(markets)
+        print(f"  {name:<24}{count:>8}{run['requests']:>10}{run['seconds']:>9.2f}s")
+    print("\nchecks: " + ', '.join(f"{name} {'ok' if ok else 'FAILED'}" for name, ok in checks.items()))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if not all(checks.values()):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
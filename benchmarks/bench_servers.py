@@ -0,0 +1,68 @@
+"""
+Side-by-side load test of the serving modes.
+
+Runs benchmarks.loadtest once per server setup with identical load and
+stand-in settings, then prints throughput, latency percentiles and error
+counts next to each other:
+
+- hypercorn-asgi:   asgi.py under hypercorn.conf.py, as deployed by the
+                    Procfile (one persistent event loop per worker)
+- gunicorn-gthread: gunicorn.conf.py (threaded workers, Flask async views on
+                    a fresh asgiref event loop per request)
+- gunicorn-gevent:  the same config with gevent workers, which fail every
+                    upstream call (see gunicorn.conf.py)
+
+Usage:
+    python -m benchmarks.bench_servers [--servers gunicorn-gthread,hypercorn-asgi] [--users 20]
+                                       [--duration 60] [--latency lognormal:0.25:0.5] [--json report.json]
+"""
+import copy
+import json
+import os
+import sys
+
+from benchmarks.loadtest import build_parser, print_report, run_loadtest
+from config.settings import BASE_DIR
+
+GUNICORN_CONFIG = os.path.join(BASE_DIR, 'gunicorn.conf.py')
+HYPERCORN_CONFIG = os.path.join(BASE_DIR, 'hypercorn.conf.py')
+
+# name -> (config file, gunicorn worker class override, custom server command)
+SERVERS = {
+    'hypercorn-asgi': (
+        HYPERCORN_CONFIG, None,
+        f"{sys.executable} -m hypercorn asgi:app --config file:{{config}} --bind 127.0.0.1:{{port}}"
+    ),
+    'gunicorn-gthread': (GUNICORN_CONFIG, None, None),
+    'gunicorn-gevent': (GUNICORN_CONFIG, 'gevent', None),
+}
+
+def main():
+    parser = build_parser()
+    parser.description = __doc__
+    parser.add_argument('--servers', default=','.join(SERVERS), help='Comma-separated server setups to compare')
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.servers.split(','):
+        config, worker_class, server_cmd = SERVERS[name]
+        run_args = copy.copy(args)
+        run_args.config, run_args.worker_class, run_args.server_cmd = config, worker_class, server_cmd
+        print(f"\n=== {name} ===")
+        results[name] = run_loadtest(run_args)
+        print_report(results[name])
+
+    print(f"\n{args.users} users, {args.duration:.0f}s each, upstream latency {args.latency}\n")
+    print(f"  {'server':<18}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'ok':>7}{'errors':>8}")
+    for name, report in results.items():
+        latency = report['latency_ms']
+        ok = report['outcomes'].get('ok', 0)
+        print(f"  {name:<18}{report['throughput_rps']:>8.2f}{latency['p50']:>9.0f}{latency['p95']:>9.0f}"
+              f"{latency['p99']:>9.0f}{ok:>7}{report['requests'] - ok:>8}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+"""
+End-to-end load test of /analyze against local Serper/SEMrush stand-ins.
+
+Starts the stand-ins (see benchmarks/standins.py), launches the app under
+gunicorn with the given config, drives it with concurrent virtual users
+and reports throughput, p50/p95/p99 latency and worker saturation.
+
+Requests shed by admission control (429) are retried after their
+Retry-After, as a well-behaved client would; pages served at a degradation
+tier are counted by the optional work they skipped (X-Degraded).
+
+Worker saturation is reported two ways: client-side occupancy (mean
+in-flight requests over the worker pool's nominal concurrency, via
+Little's law) and per-worker CPU utilization sampled from /proc.
+
+Usage:
+    python -m benchmarks.loadtest [--config gunicorn.conf.py] [--users 20] [--duration 60]
+                                  [--latency lognormal:0.25:0.5] [--error-rate 0.01] [--rate-limit 50]
+                                  [--server-cmd "hypercorn asgi:app --config file:{config} --bind 127.0.0.1:{port}"]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import runpy
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import pandas as pd
+
+from benchmarks.standins import add_standin_arguments, start_standins
+from config.settings import ASGI_THREADS, BASE_DIR, CITY_DATA_PATH, GA4_DATA_PATH
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return float('nan')
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def load_targets(limit: int = 500) -> List[Tuple[str, str]]:
+    """City/state pairs present in both datasets, so every request can complete."""
+    cities = pd.read_csv(CITY_DATA_PATH, usecols=['city', 'state_id'])
+    cities['city_state'] = (cities['city'] + ', ' + cities['state_id']).str.lower().str.strip()
+    ga4 = pd.read_csv(GA4_DATA_PATH, usecols=['city_state'])
+    known = set(ga4['city_state'].str.lower().str.strip())
+    both = cities[cities['city_state'].isin(known)]
+    sample = both.sample(n=min(limit, len(both)), random_state=0)
+    return list(zip(sample['city'], sample['state_id']))
+
+def worker_capacity(config_path: str, worker_class: Optional[str] = None) -> Dict:
+    """Read the pool shape from a gunicorn or hypercorn config file."""
+    config = runpy.run_path(config_path)
+    workers = int(config.get('workers', 1))
+    worker_class = worker_class or str(config.get('worker_class', 'sync'))
+    if worker_class in ('gevent', 'eventlet'):
+        per_worker = int(config.get('worker_connections', 1000))
+    elif worker_class in ('asyncio', 'uvloop', 'trio'):
+        per_worker = ASGI_THREADS
+    else:
+        per_worker = int(config.get('threads', 1))
+    return {'workers': workers, 'worker_class': worker_class, 'per_worker': per_worker,
+            'capacity': workers * per_worker}
+
+class ProcSampler(threading.Thread):
+    """Samples CPU utilization of a server's worker processes from /proc."""
+
+    def __init__(self, master_pid: int, interval: float = 1.0):
+        super().__init__(daemon=True)
+        self.master_pid = master_pid
+        self.interval = interval
+        self.samples: Dict[int, List[float]] = {}
+        self._stop_event = threading.Event()
+        self._ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+    def _children(self) -> List[int]:
+        pids = []
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+                if int(fields[1]) == self.master_pid:
+                    pids.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+        return pids or [self.master_pid]
+
+    def _cpu_seconds(self, pid: int) -> Optional[float]:
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / self._ticks
+        except (OSError, IndexError, ValueError):
+            return None
+
+    def run(self):
+        if not os.path.isdir('/proc'):
+            return
+        previous = {pid: self._cpu_seconds(pid) for pid in self._children()}
+        last = time.monotonic()
+        while not self._stop_event.wait(self.interval):
+            now = time.monotonic()
+            current = {pid: self._cpu_seconds(pid) for pid in self._children()}
+            for pid, cpu in current.items():
+                if cpu is not None and previous.get(pid) is not None:
+                    self.samples.setdefault(pid, []).append((cpu - previous[pid]) / (now - last))
+            previous, last = current, now
+
+    def stop(self):
+        self._stop_event.set()
+
+class LoadRunner:
+    """Virtual users issuing POST /analyze in a closed loop."""
+
+    def __init__(self, base_url: str, targets: List[Tuple[str, str]], radii: List[int],
+                 think_time: float, request_timeout: float):
+        self.base_url = base_url
+        self.targets = targets
+        self.radii = radii
+        self.think_time = think_time
+        self.request_timeout = request_timeout
+        self.latencies: List[float] = []
+        # Every response, including 429s and error pages
+        self.all_latencies: List[float] = []
+        self.outcomes: Counter = Counter()
+        self.degraded: Counter = Counter()
+        self.in_flight = 0
+        self.occupancy_samples: List[int] = []
+
+    async def _user(self, client: httpx.AsyncClient, deadline: float, rng: random.Random):
+        while time.monotonic() < deadline:
+            city, state = rng.choice(self.targets)
+            form = {'city': city, 'state': state, 'radius': str(rng.choice(self.radii))}
+            start = time.monotonic()
+            self.in_flight += 1
+            retry_after = 0.0
+            try:
+                response = await client.post(f"{self.base_url}/analyze", data=form)
+                if response.status_code == 200 and 'Market Analysis Results' in response.text:
+                    outcome = 'ok'
+                    if response.headers.get('X-Degraded'):
+                        self.degraded[response.headers['X-Degraded']] += 1
+                else:
+                    outcome = f"http_{response.status_code}" if response.status_code != 200 else 'error_page'
+                    retry_after = float(response.headers.get('Retry-After', 0))
+            except httpx.TimeoutException:
+                outcome = 'timeout'
+            except httpx.HTTPError as e:
+                outcome = type(e).__name__
+            finally:
+                self.in_flight -= 1
+            elapsed = time.monotonic() - start
+            self.outcomes[outcome] += 1
+            if outcome == 'ok':
+                self.latencies.append(elapsed)
+            if outcome in ('ok', 'error_page') or outcome.startswith('http_'):
+                self.all_latencies.append(elapsed)
+            if retry_after:
+                await asyncio.sleep(min(retry_after, max(0.0, deadline - time.monotonic())))
+            elif self.think_time:
+                await asyncio.sleep(rng.expovariate(1 / self.think_time))
+
+    async def _sample_occupancy(self, deadline: float):
+        while time.monotonic() < deadline:
+            self.occupancy_samples.append(self.in_flight)
+            await asyncio.sleep(0.25)
+
+    async def run(self, users: int, duration: float, ramp_up: float):
+        deadline = time.monotonic() + duration
+        limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+        async with httpx.AsyncClient(timeout=self.request_timeout, limits=limits) as client:
+            tasks = [asyncio.ensure_future(self._sample_occupancy(deadline))]
+            for i in range(users):
+                tasks.append(asyncio.ensure_future(self._user(client, deadline, random.Random(i))))
+                if ramp_up:
+                    await asyncio.sleep(ramp_up / users)
+            # Requests still in flight at the deadline are abandoned, not counted
+            await asyncio.sleep(max(0.0, deadline - time.monotonic()))
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode} before becoming ready")
+        try:
+            if httpx.get(f"{base_url}/", timeout=2.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {base_url} not ready after {timeout:.0f}s")
+
+def run_loadtest(args) -> Dict:
+    serper, semrush = start_standins(args)
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+
+    env = dict(os.environ,
+               PORT=str(port),
+               SERPER_BASE_URL=serper.url,
+               SEMRUSH_BASE_URL=semrush.url,
+               SERPER_API_KEY='loadtest',
+               SEMRUSH_API_KEY='loadtest',
+               SERP_SNAPSHOT_MAX_AGE_HOURS='0')
+    if args.server_cmd:
+        cmd = shlex.split(args.server_cmd.format(port=port, config=args.config))
+    else:
+        cmd = [sys.executable, '-m', 'gunicorn', 'app:app', '-c', args.config, '--bind', f"127.0.0.1:{port}"]
+        if args.worker_class:
+            cmd += ['--worker-class', args.worker_class]
+    capacity = worker_capacity(args.config, args.worker_class)
+
+    print(f"Starting server: {' '.join(cmd)}")
+    log = open(args.server_log, 'w') if args.server_log else subprocess.DEVNULL
+    process = subprocess.Popen(cmd, cwd=BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        wait_until_ready(base_url, process)
+        sampler = ProcSampler(process.pid)
+        sampler.start()
+
+        runner = LoadRunner(base_url, load_targets(), [int(r) for r in args.radii.split(',')],
+                            args.think_time, args.request_timeout)
+        print(f"Driving {args.users} virtual users for {args.duration:.0f}s ...")
+        started = time.monotonic()
+        asyncio.run(runner.run(args.users, args.duration, args.ramp_up))
+        elapsed = time.monotonic() - started
+        sampler.stop()
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        serper.stop()
+        semrush.stop()
+        if log is not subprocess.DEVNULL:
+            log.close()
+
+    latencies = sorted(runner.latencies)
+    completed = sum(runner.outcomes.values())
+    mean_in_flight = (sum(runner.occupancy_samples) / len(runner.occupancy_samples)
+                      if runner.occupancy_samples else 0.0)
+    throughput = len(latencies) / elapsed if elapsed else 0.0
+    mean_latency = sum(latencies) / len(latencies) if latencies else 0.0
+    worker_cpu = {str(pid): {'mean': sum(s) / len(s), 'max': max(s)}
+                  for pid, s in sampler.samples.items() if s}
+
+    return {
+        'server': ' '.join(cmd),
+        'pool': capacity,
+        'users': args.users,
+        'duration_s': elapsed,
+        'requests': completed,
+        'outcomes': dict(runner.outcomes),
+        'throughput_rps': throughput,
+        'latency_ms': {
+            'p50': percentile(latencies, 50) * 1000,
+            'p95': percentile(latencies, 95) * 1000,
+            'p99': percentile(latencies, 99) * 1000,
+            'max': (latencies[-1] * 1000) if latencies else float('nan'),
+            'p99_all_responses': percentile(sorted(runner.all_latencies), 99) * 1000,
+        },
+        'degraded': dict(runner.degraded),
+        'saturation': {
+            'mean_in_flight': mean_in_flight,
+            'littles_law_concurrency': throughput * mean_latency,
+            'pool_occupancy': mean_in_flight / capacity['capacity'] if capacity['capacity'] else 0.0,
+            'worker_cpu': worker_cpu,
+        },
+        'upstreams': {'serper': serper.stats, 'semrush': semrush.stats},
+    }
+
+def print_report(report: Dict):
+    latency = report['latency_ms']
+    saturation = report['saturation']
+    pool = report['pool']
+    print(f"\nServer:      {report['server']}")
+    print(f"Pool:        {pool['workers']} x {pool['worker_class']} ({pool['per_worker']} slots each)")
+    print(f"Requests:    {report['requests']} in {report['duration_s']:.1f}s  {report['outcomes']}")
+    print(f"Throughput:  {report['throughput_rps']:.2f} req/s")
+    print(f"Latency:     p50 {latency['p50']:.0f} ms  p95 {latency['p95']:.0f} ms  "
+          f"p99 {latency['p99']:.0f} ms  max {latency['max']:.0f} ms")
+    print(f"             p99 {latency['p99_all_responses']:.0f} ms over all responses, including 429s")
+    if report['degraded']:
+        print(f"Degraded:    {report['degraded']}")
+    print(f"In flight:   mean {saturation['mean_in_flight']:.1f} "
+          f"(pool occupancy {saturation['pool_occupancy']:.1%})")
+    for pid, cpu in saturation['worker_cpu'].items():
+        print(f"Worker {pid}: CPU mean {cpu['mean']:.0%}  max {cpu['max']:.0%}")
+    print(f"Upstreams:   serper {report['upstreams']['serper']}  semrush {report['upstreams']['semrush']}")
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default=os.path.join(BASE_DIR, 'gunicorn.conf.py'), help='gunicorn (or hypercorn, with --server-cmd) config file')
+    parser.add_argument('--worker-class', help='Override the gunicorn worker class (and pool shape) from --config')
+    parser.add_argument('--server-cmd', help='Custom server command; {port} and {config} are substituted')
+    parser.add_argument('--users', type=int, default=20, help='Concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=60.0, help='Test duration in seconds')
+    parser.add_argument('--ramp-up', type=float, default=5.0, help='Seconds over which users are started')
+    parser.add_argument('--think-time', type=float, default=0.0, help='Mean pause between a user\'s requests')
+    parser.add_argument('--radii', default='50,100,200', help='Radii to sample from')
+    parser.add_argument('--request-timeout', type=float, default=120.0)
+    parser.add_argument('--server-log', help='Write server output to this file')
+    parser.add_argument('--json', help='Also write the report as JSON to this path')
+    add_standin_arguments(parser)
+    return parser
+
+def main():
+    args = build_parser().parse_args()
+    report = run_loadtest(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""
+Local stand-ins for the Serper and SEMrush APIs.
+
+The Serper stand-in answers POST /search with organic results in Serper's
+JSON shape, for one query or a JSON array of them (answered with an array in
+the same order; SingleQuerySerperHandler rejects arrays with a 400, like an
+endpoint without batch support). Throttling and latency apply per HTTP
+request, whatever its number of queries. The SEMrush stand-in answers GET /analytics/v1/ with the
+semicolon-separated backlinks_overview CSV. Results are deterministic per
+query/domain. Both servers inject latency drawn from a configurable
+distribution, fail a configurable share of requests with 500s and throttle
+with 429 + Retry-After once a requests-per-second budget is exhausted.
+
+Point the app at them with SERPER_BASE_URL / SEMRUSH_BASE_URL.
+
+Usage:
+    python -m benchmarks.standins [--serper-port 8101] [--semrush-port 8102]
+                                  [--latency lognormal:0.25:0.5] [--error-rate 0.01] [--rate-limit 50]
+"""
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+from config.constants import IBUYERS
+
+class LatencyModel:
+    """Samples response delays in seconds.
+
+    Spec format is `kind:arg1:arg2`:
+        constant:SECONDS
+        uniform:LOW:HIGH
+        lognormal:MEDIAN:SIGMA
+    """
+
+    def __init__(self, spec: str = 'constant:0'):
+        parts = spec.split(':')
+        self.kind = parts[0]
+        self.args = [float(p) for p in parts[1:]]
+        if self.kind not in ('constant', 'uniform', 'lognormal'):
+            raise ValueError(f"Unknown latency distribution '{self.kind}'")
+        self._rng = random.Random()
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == 'constant':
+                return self.args[0] if self.args else 0.0
+            if self.kind == 'uniform':
+                return self._rng.uniform(self.args[0], self.args[1])
+            median, sigma = self.args
+            return self._rng.lognormvariate(0.0, sigma) * median
+
+class TokenBucket:
+    """Requests-per-second budget; rate <= 0 disables throttling."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> Optional[float]:
+        """Consume a token; return None on success or seconds until one is available."""
+        if self.rate <= 0:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return None
+            return (1 - self.tokens) / self.rate
+
+class _StandInHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, handler, latency: str, error_rate: float, rate_limit: float,
+                 seed: Optional[int]):
+        super().__init__(address, handler)
+        self.latency = LatencyModel(latency)
+        self.error_rate = error_rate
+        self.bucket = TokenBucket(rate_limit)
+        self.rng = random.Random(seed)
+        self.stats = {'requests': 0, 'throttled': 0, 'errors': 0}
+        self._stats_lock = threading.Lock()
+
+    def count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-response (e.g. a server under test being stopped) are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _admit(self) -> bool:
+        """Apply throttling, error injection and latency; return False if already answered."""
+        server = self.server
+        server.count('requests')
+        retry_after = server.bucket.take()
+        if retry_after is not None:
+            server.count('throttled')
+            self._send(429, b'Too Many Requests', 'text/plain', {'Retry-After': str(max(1, round(retry_after)))})
+            return False
+        time.sleep(server.latency.sample())
+        if server.rng.random() < server.error_rate:
+            server.count('errors')
+            self._send(500, b'Internal Server Error', 'text/plain')
+            return False
+        return True
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[dict] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+def _seeded(text: str) -> random.Random:
+    return random.Random(int(hashlib.md5(text.encode()).hexdigest()[:8], 16))
+
+class SerperHandler(_StandInHandler):
+    """Mimics POST https://google.serper.dev/search."""
+
+    accepts_batches = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if urlparse(self.path).path.rstrip('/') != '/search':
+            self._send(404, b'Not Found', 'text/plain')
+            return
+        if not self._admit():
+            return
+        try:
+            query = json.loads(body or b'{}')
+        except ValueError:
+            self._send(400, b'{"message": "Invalid JSON"}', 'application/json')
+            return
+        if isinstance(query, list):
+            if not self.accepts_batches:
+                self._send(400, b'{"message": "Batch queries are not supported"}', 'application/json')
+                return
+            self._send(200, json.dumps([self.search(q) for q in query]).encode(), 'application/json')
+            return
+        self._send(200, json.dumps(self.search(query)).encode(), 'application/json')
+
+    @staticmethod
+    def search(query: dict) -> dict:
+        q = query.get('q', '')
+        num = int(query.get('num', 10))
+        rng = _seeded(q)
+        pool = [f"investor{i}.com" for i in range(60)] + IBUYERS
+        domains = rng.sample(pool, k=min(num, len(pool)))
+        return {
+            'searchParameters': {'q': q, 'gl': query.get('gl', 'us'), 'hl': query.get('hl', 'en'), 'num': num},
+            'organic': [
+                {'title': f"{q.title()} - {domain}", 'link': f"https://www.{domain}/{rank}", 'position': rank}
+                for rank, domain in enumerate(domains, 1)
+            ],
+            'credits': 1
+        }
+
+class SingleQuerySerperHandler(SerperHandler):
+    """A Serper stand-in that answers one query per request only."""
+
+    accepts_batches = False
+
+class SemrushHandler(_StandInHandler):
+    """Mimics GET https://api.semrush.com/analytics/v1/ (backlinks_overview)."""
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path.rstrip('/') != '/analytics/v1':
+            self._send(404, b'Not Found', 'text/plain')
+            return
+        if not self._admit():
+            return
+        params = parse_qs(parsed.query)
+        target = params.get('target', [''])[0]
+        rng = _seeded(target)
+        csv_body = (
+            "target;ascore;total;domains_num\r\n"
+            f"{target};{rng.randint(1, 90)};{rng.randint(10, 500000)};{rng.randint(5, 20000)}\r\n"
+        )
+        self._send(200, csv_body.encode(), 'text/csv')
+
+class StandInServer:
+    """Runs a stand-in handler on a background thread."""
+
+    def __init__(self, handler, host: str = '127.0.0.1', port: int = 0, latency: str = 'constant:0',
+                 error_rate: float = 0.0, rate_limit: float = 0.0, seed: Optional[int] = None):
+        self.httpd = _StandInHTTPServer((host, port), handler, latency, error_rate, rate_limit, seed)
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def stats(self) -> dict:
+        return dict(self.httpd.stats)
+
+    def start(self) -> 'StandInServer':
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def add_standin_arguments(parser: argparse.ArgumentParser):
+    """Register the stand-in behavior options on a CLI parser."""
+    parser.add_argument('--latency', default='lognormal:0.25:0.5',
+                        help='Upstream latency: constant:S | uniform:LO:HI | lognormal:MEDIAN:SIGMA')
+    parser.add_argument('--semrush-latency', help='SEMrush latency if different from --latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with 500')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='Requests/second before 429s (0 = off)')
+
+def start_standins(args, serper_port: int = 0, semrush_port: int = 0):
+    """Start Serper and SEMrush stand-ins configured from parsed CLI args."""
+    serper = StandInServer(SerperHandler, port=serper_port, latency=args.latency,
+                           error_rate=args.error_rate, rate_limit=args.rate_limit).start()
+    semrush = StandInServer(SemrushHandler, port=semrush_port, latency=args.semrush_latency or args.latency,
+                            error_rate=args.error_rate, rate_limit=args.rate_limit).start()
+    return serper, semrush
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--serper-port', type=int, default=8101)
+    parser.add_argument('--semrush-port', type=int, default=8102)
+    add_standin_arguments(parser)
+    args = parser.parse_args()
+
+    serper, semrush = start_standins(args, args.serper_port, args.semrush_port)
+    print(f"SERPER_BASE_URL={serper.url}")
+    print(f"SEMRUSH_BASE_URL={semrush.url}")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"serper {serper.stats}  semrush {semrush.stats}")
+    except KeyboardInterrupt:
+        serper.stop()
+        semrush.stop()
+
+if __name__ == '__main__':
+    main()
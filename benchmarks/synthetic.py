@@ -0,0 +1,169 @@
+"""
+Generate synthetic cities.csv / ga4data.csv files at a multiple of today's row counts.
+
+Cities are drawn around metro centers inside the continental US so that
+radius queries see realistic neighborhood sizes, and a GA4 row exists for
+the same share of cities as in the real data.
+
+Usage:
+    python -m benchmarks.synthetic --scale 10 --out /tmp/market-data-10x
+"""
+import argparse
+import os
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.settings import CITY_DATA_PATH, GA4_DATA_PATH
+
+# Approximate row count of the simplemaps US cities export used for cities.csv;
+# the real file is used instead when it is present.
+DEFAULT_CITY_ROWS = 31_000
+DEFAULT_GA4_ROWS = 12_984
+
+FEATURES = [
+    'population', 'population_proper', 'density', 'incorporated', 'age_median',
+    'age_over_65', 'family_dual_income', 'income_household_median', 'income_household_six_figure',
+    'home_ownership', 'housing_units', 'home_value', 'rent_median', 'education_college_or_above',
+    'race_white', 'race_black', 'hispanic', 'income_individual_median', 'rent_burden', 'poverty'
+]
+
+STATES = [
+    'AL', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'FL', 'GA', 'ID', 'IL', 'IN', 'IA', 'KS', 'KY', 'LA',
+    'ME', 'MD', 'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ', 'NM', 'NY', 'NC', 'ND',
+    'OH', 'OK', 'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY'
+]
+
+CHUNK_ROWS = 250_000
+
+def _count_rows(path: str, default: int) -> int:
+    if not os.path.exists(path):
+        return default
+    with open(path, 'rb') as f:
+        return max(sum(1 for _ in f) - 1, 0)
+
+def base_row_counts() -> Tuple[int, int]:
+    """Return (city rows, GA4 rows) of the real dataset, or the defaults when absent."""
+    return _count_rows(CITY_DATA_PATH, DEFAULT_CITY_ROWS), _count_rows(GA4_DATA_PATH, DEFAULT_GA4_ROWS)
+
+def _city_chunk(rng: np.random.Generator, start: int, size: int, centers: np.ndarray,
+                center_states: np.ndarray) -> pd.DataFrame:
+    # 80% of cities cluster around a metro center, the rest are spread uniformly
+    clustered = rng.random(size) < 0.8
+    center_idx = rng.integers(0, len(centers), size)
+    lat = np.where(clustered, centers[center_idx, 0] + rng.normal(0, 0.6, size), rng.uniform(25.5, 48.5, size))
+    lng = np.where(clustered, centers[center_idx, 1] + rng.normal(0, 0.8, size), rng.uniform(-123.5, -70.5, size))
+    states = np.where(clustered, center_states[center_idx], rng.choice(STATES, size))
+
+    population = np.round(rng.lognormal(8.0, 1.6, size))
+    housing_units = np.round(population * rng.uniform(0.35, 0.5, size))
+    income = np.round(rng.lognormal(11.0, 0.35, size))
+
+    df = pd.DataFrame({
+        'city': [f"City {i}" for i in range(start, start + size)],
+        'state_id': states,
+        'lat': lat.round(4),
+        'lng': lng.round(4),
+        'population': population,
+        'population_proper': np.round(population * rng.uniform(0.6, 1.0, size)),
+        'density': np.round(rng.lognormal(6.5, 1.0, size), 1),
+        'incorporated': rng.integers(0, 2, size),
+        'age_median': np.round(rng.normal(39, 6, size), 1),
+        'age_over_65': np.round(rng.uniform(5, 35, size), 1),
+        'family_dual_income': np.round(rng.uniform(20, 70, size), 1),
+        'income_household_median': income,
+        'income_household_six_figure': np.round(rng.uniform(5, 60, size), 1),
+        'home_ownership': np.round(rng.uniform(30, 90, size), 1),
+        'housing_units': housing_units,
+        'home_value': np.round(income * rng.uniform(2.5, 7.0, size)),
+        'rent_median': np.round(rng.uniform(600, 3000, size)),
+        'education_college_or_above': np.round(rng.uniform(5, 80, size), 1),
+        'race_white': np.round(rng.uniform(10, 98, size), 1),
+        'race_black': np.round(rng.uniform(0, 60, size), 1),
+        'hispanic': np.round(rng.uniform(0, 80, size), 1),
+        'income_individual_median': np.round(income * rng.uniform(0.4, 0.7, size)),
+        'rent_burden': np.round(rng.uniform(15, 45, size), 1),
+        'poverty': np.round(rng.uniform(2, 40, size), 1),
+        'website': np.where(rng.random(size) < 0.3,
+                            [f"https://www.investor{i}.com" for i in range(start, start + size)], ''),
+    })
+    # Sprinkle missing values so the imputation path is exercised
+    for feature in ('home_value', 'rent_median', 'age_median'):
+        df.loc[rng.random(size) < 0.03, feature] = np.nan
+    return df
+
+def _ga4_chunk(rng: np.random.Generator, cities: pd.DataFrame) -> pd.DataFrame:
+    size = len(cities)
+    users_org = np.round(rng.lognormal(5.0, 1.5, size)).astype(int)
+    users_paid = np.round(rng.lognormal(4.5, 1.5, size)).astype(int)
+    cvr_org = rng.uniform(0.01, 0.12, size)
+    cvr_paid = rng.uniform(0.01, 0.12, size)
+    return pd.DataFrame({
+        'city': cities['city'].values,
+        'state': cities['state_id'].values,
+        'city_state': (cities['city'] + ', ' + cities['state_id']).values,
+        'users_org': users_org,
+        'users_paid': users_paid,
+        'leads_org': np.round(users_org * cvr_org).astype(int),
+        'leads_paid': np.round(users_paid * cvr_paid).astype(int),
+        'cvr_org': cvr_org,
+        'cvr_paid': cvr_paid,
+        'unique_sites': rng.integers(0, 800, size),
+    })
+
+def generate(scale: float, out_dir: str, seed: int = 0) -> Dict[str, str]:
+    """
+    Write synthetic cities.csv and ga4data.csv to out_dir.
+
+    Args:
+        scale: Multiple of today's row counts
+        out_dir: Output directory (created if needed)
+        seed: Random seed
+
+    Returns:
+        Dictionary with 'city_data_path', 'ga4_data_path', 'city_rows' and 'ga4_rows'
+    """
+    base_cities, base_ga4 = base_row_counts()
+    city_rows = int(base_cities * scale)
+    ga4_share = base_ga4 / base_cities if base_cities else 0.4
+
+    os.makedirs(out_dir, exist_ok=True)
+    city_path = os.path.join(out_dir, 'cities.csv')
+    ga4_path = os.path.join(out_dir, 'ga4data.csv')
+
+    rng = np.random.default_rng(seed)
+    n_centers = max(50, int(300 * scale ** 0.5))
+    centers = np.column_stack([rng.uniform(26, 48, n_centers), rng.uniform(-122.5, -71.5, n_centers)])
+    center_states = rng.choice(STATES, n_centers)
+
+    ga4_rows = 0
+    for start in range(0, city_rows, CHUNK_ROWS):
+        size = min(CHUNK_ROWS, city_rows - start)
+        cities = _city_chunk(rng, start, size, centers, center_states)
+        cities.to_csv(city_path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+
+        ga4 = _ga4_chunk(rng, cities[rng.random(size) < ga4_share])
+        ga4.to_csv(ga4_path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+        ga4_rows += len(ga4)
+
+    return {
+        'city_data_path': city_path,
+        'ga4_data_path': ga4_path,
+        'city_rows': city_rows,
+        'ga4_rows': ga4_rows
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=1.0, help="Multiple of today's row counts")
+    parser.add_argument('--out', required=True, help='Output directory')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    info = generate(args.scale, args.out, args.seed)
+    print(f"Wrote {info['city_rows']:,} cities to {info['city_data_path']}")
+    print(f"Wrote {info['ga4_rows']:,} GA4 rows to {info['ga4_data_path']}")
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,95 @@
 from .settings import (
     CITY_DATA_PATH,
     GA4_DATA_PATH,
+    GA4_DELTA_DIR,
+    DATA_RELOAD_INTERVAL,
+    NATIONAL_INDEX_COMPONENTS,
+    NATIONAL_INDEX_OVERSAMPLE,
+    NATIONAL_DEFAULT_PRESET,
+    CITY_SEARCH_MAX_RESULTS,
+    CITY_SEARCH_CACHE_SECONDS,
+    RESULT_CACHE_SIZE,
+    RESULT_CACHE_TTL,
+    ATLAS_DB_PATH,
+    ATLAS_WORKERS,
+    FRAGMENT_CACHE_SIZE,
+    FRAGMENT_CACHE_TTL,
+    JINJA_BYTECODE_CACHE_DIR,
+    COMPRESSION_LEVEL,
+    COMPRESSION_BROTLI_QUALITY,
+    COMPRESSION_MIN_SIZE,
+    STATIC_DIST_DIR,
     SERPER_API_KEY,
     SEMRUSH_API_KEY,
+    SERPER_BASE_URL,
+    SEMRUSH_BASE_URL,
+    SERPER_BATCH_SIZE,
+    SERPER_CREDITS_PER_QUERY,
+    SEMRUSH_UNITS_PER_REQUEST,
+    SERP_SNAPSHOT_DB_PATH,
+    SERP_SNAPSHOT_MAX_AGE_HOURS,
+    ADMISSION_MAX_IN_FLIGHT,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_MAX_WAIT,
+    ADMISSION_DEGRADE_AT,
+    REQUEST_DEADLINE_SECONDS,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_SECONDS,
+    ASGI_THREADS,
+    PROFILE_DIR,
+    PROFILE_SECRET,
+    PROFILE_SAMPLE_RATE,
     LOGGING
 )
-from .constants import MARKET_TAGS, IBUYERS
+from .constants import (
+    MARKET_TAGS, IBUYERS, FEATURE_WEIGHT_PRESETS, OPPORTUNITY_SCORE_WEIGHTS, OPPORTUNITY_COMPONENT_LABELS
+)
 
 __all__ = [
     'CITY_DATA_PATH',
     'GA4_DATA_PATH',
+    'GA4_DELTA_DIR',
+    'DATA_RELOAD_INTERVAL',
+    'NATIONAL_INDEX_COMPONENTS',
+    'NATIONAL_INDEX_OVERSAMPLE',
+    'NATIONAL_DEFAULT_PRESET',
+    'CITY_SEARCH_MAX_RESULTS',
+    'CITY_SEARCH_CACHE_SECONDS',
+    'RESULT_CACHE_SIZE',
+    'RESULT_CACHE_TTL',
+    'ATLAS_DB_PATH',
+    'ATLAS_WORKERS',
+    'FRAGMENT_CACHE_SIZE',
+    'FRAGMENT_CACHE_TTL',
+    'JINJA_BYTECODE_CACHE_DIR',
+    'COMPRESSION_LEVEL',
+    'COMPRESSION_BROTLI_QUALITY',
+    'COMPRESSION_MIN_SIZE',
+    'STATIC_DIST_DIR',
     'SERPER_API_KEY',
     'SEMRUSH_API_KEY',
+    'SERPER_BASE_URL',
+    'SEMRUSH_BASE_URL',
+    'SERPER_BATCH_SIZE',
+    'SERPER_CREDITS_PER_QUERY',
+    'SEMRUSH_UNITS_PER_REQUEST',
+    'SERP_SNAPSHOT_DB_PATH',
+    'SERP_SNAPSHOT_MAX_AGE_HOURS',
+    'ADMISSION_MAX_IN_FLIGHT',
+    'ADMISSION_MAX_QUEUE',
+    'ADMISSION_MAX_WAIT',
+    'ADMISSION_DEGRADE_AT',
+    'REQUEST_DEADLINE_SECONDS',
+    'CIRCUIT_FAILURE_THRESHOLD',
+    'CIRCUIT_RESET_SECONDS',
+    'ASGI_THREADS',
+    'PROFILE_DIR',
+    'PROFILE_SECRET',
+    'PROFILE_SAMPLE_RATE',
     'LOGGING',
     'MARKET_TAGS',
+    'FEATURE_WEIGHT_PRESETS',
+    'OPPORTUNITY_SCORE_WEIGHTS',
+    'OPPORTUNITY_COMPONENT_LABELS',
     'IBUYERS'
 ]
\ No newline at end of file
@@ -1,3 +1,62 @@
+# Named feature-weight presets for similarity matching. Features not listed
+# keep a weight of 1; each preset's scaled matrix is built when data loads
+# (see engine/feature_presets.py).
+FEATURE_WEIGHT_PRESETS = {
+    "balanced": {
+        "name": "Balanced",
+        "description": "All demographic features weighted equally",
+        "weights": {}
+    },
+    "demographics-heavy": {
+        "name": "Demographics-heavy",
+        "description": "Emphasizes age, household makeup, education and race/ethnicity",
+        "weights": {
+            "age_median": 2.5, "age_over_65": 2, "family_dual_income": 1.5,
+            "education_college_or_above": 2, "race_white": 2, "race_black": 2, "hispanic": 2,
+            "home_value": 0.5, "rent_median": 0.5
+        }
+    },
+    "housing-market": {
+        "name": "Housing market",
+        "description": "Emphasizes home values, rents, ownership and housing stock",
+        "weights": {
+            "home_value": 3, "rent_median": 2.5, "home_ownership": 2, "housing_units": 2,
+            "rent_burden": 2, "density": 1.5,
+            "race_white": 0.5, "race_black": 0.5, "hispanic": 0.5
+        }
+    },
+    "income-focused": {
+        "name": "Income-focused",
+        "description": "Emphasizes household and individual income, six-figure share and poverty",
+        "weights": {
+            "income_household_median": 3, "income_individual_median": 2.5, "income_household_six_figure": 2.5,
+            "poverty": 2, "family_dual_income": 1.5, "education_college_or_above": 1.5
+        }
+    }
+}
+
+# Default weights of the opportunity score components (see engine/scoring_kernel.py).
+# performance_diff and saturation_risk count against a market and enter the score as (1 - value).
+OPPORTUNITY_SCORE_WEIGHTS = {
+    "norm_similarity": 0.3,
+    "performance_diff": 0.2,
+    "network_penetration": 0.1,
+    "engagement_diversity": 0.1,
+    "growth_potential": 0.1,
+    "performance_efficiency": 0.1,
+    "saturation_risk": 0.1
+}
+
+OPPORTUNITY_COMPONENT_LABELS = {
+    "norm_similarity": "Similarity to target",
+    "performance_diff": "GA4 performance gap",
+    "network_penetration": "Network penetration",
+    "engagement_diversity": "Engagement diversity",
+    "growth_potential": "Growth potential",
+    "performance_efficiency": "Lead efficiency",
+    "saturation_risk": "Saturation risk"
+}
+
 # Market tags configuration
 MARKET_TAGS = {
     "high_growth_potential": {
@@ -0,0 +1,44 @@
+"""
+Declared schema of the market datasets.
+
+Only the columns listed here are read from cities.csv and ga4data.csv; see
+utils/data_utils.py for the loaders that apply it.
+"""
+
+# Demographic features used for similarity matching
+FEATURE_COLUMNS = [
+    'population', 'population_proper', 'density', 'incorporated', 'age_median',
+    'age_over_65', 'family_dual_income', 'income_household_median', 'income_household_six_figure',
+    'home_ownership', 'housing_units', 'home_value', 'rent_median', 'education_college_or_above',
+    'race_white', 'race_black', 'hispanic', 'income_individual_median', 'rent_burden', 'poverty'
+]
+
+# GA4 metrics merged onto the similar cities
+GA4_COLUMNS = ['users_org', 'cvr_org', 'leads_org', 'users_paid', 'cvr_paid', 'leads_paid', 'unique_sites']
+
+# cities.csv: column -> dtype. Coordinates stay float64 so haversine distances
+# match the source data; features are float32 since they are standardized anyway.
+CITY_SCHEMA = {
+    'city': 'object',
+    'state_id': 'category',
+    'lat': 'float64',
+    'lng': 'float64',
+    **{feature: 'float32' for feature in FEATURE_COLUMNS},
+    'website': 'object',
+}
+
+# ga4data.csv: column -> dtype. Counts missing from the export are treated as 0.
+GA4_SCHEMA = {
+    'city_state': 'object',
+    'users_org': 'int32',
+    'users_paid': 'int32',
+    'leads_org': 'int32',
+    'leads_paid': 'int32',
+    'cvr_org': 'float32',
+    'cvr_paid': 'float32',
+    'unique_sites': 'int32',
+}
+
+# Columns that must be present in each file
+CITY_REQUIRED_COLUMNS = ['city', 'state_id', 'lat', 'lng'] + FEATURE_COLUMNS
+GA4_REQUIRED_COLUMNS = ['city_state'] + GA4_COLUMNS
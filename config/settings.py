@@ -7,12 +7,103 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # Data files
 CITY_DATA_PATH = os.path.join(BASE_DIR, 'data', 'cities.csv')
 GA4_DATA_PATH = os.path.join(BASE_DIR, 'data', 'ga4data.csv')
+# Daily GA4 delta CSVs (same columns as ga4data.csv), applied in file name order
+GA4_DELTA_DIR = os.getenv('GA4_DELTA_DIR', os.path.join(BASE_DIR, 'data', 'ga4_deltas'))
+# How often each worker checks the data files for changes, in seconds (0 = never reload)
+DATA_RELOAD_INTERVAL = float(os.getenv('DATA_RELOAD_INTERVAL', '60'))
+
+# Nationwide similarity index: PCA dimensions to index (0 = exact KD-tree over all features)
+NATIONAL_INDEX_COMPONENTS = int(os.getenv('NATIONAL_INDEX_COMPONENTS', '0'))
+# With PCA, candidates fetched per requested neighbor and re-ranked exactly
+NATIONAL_INDEX_OVERSAMPLE = int(os.getenv('NATIONAL_INDEX_OVERSAMPLE', '16'))
+# Preset used for nationwide searches when none is selected
+NATIONAL_DEFAULT_PRESET = os.getenv('NATIONAL_DEFAULT_PRESET', 'balanced')
+
+# City typeahead (GET /cities): most matches per query, and how long browsers may reuse an answer, in seconds
+CITY_SEARCH_MAX_RESULTS = int(os.getenv('CITY_SEARCH_MAX_RESULTS', '20'))
+CITY_SEARCH_CACHE_SECONDS = int(os.getenv('CITY_SEARCH_CACHE_SECONDS', '300'))
+
+# In-process cache of similar-city results, invalidated per city when the data changes (0 = off)
+RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', '512'))
+RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', '3600'))
+
+# National opportunity atlas (see engine/atlas.py): results table, and worker processes (0 = one per CPU)
+ATLAS_DB_PATH = os.getenv('ATLAS_DB_PATH', os.path.join(BASE_DIR, 'data', 'atlas.sqlite3'))
+ATLAS_WORKERS = int(os.getenv('ATLAS_WORKERS', '0'))
+
+# Rendered template fragments cached per worker, keyed by their inputs (0 = render every time)
+FRAGMENT_CACHE_SIZE = int(os.getenv('FRAGMENT_CACHE_SIZE', '256'))
+FRAGMENT_CACHE_TTL = float(os.getenv('FRAGMENT_CACHE_TTL', '3600'))
+# Compiled Jinja templates, shared by workers and kept across restarts (empty = compile in memory only)
+JINJA_BYTECODE_CACHE_DIR = os.getenv('JINJA_BYTECODE_CACHE_DIR', os.path.join(BASE_DIR, 'data', 'jinja_cache'))
+
+# Response compression (see utils/compression.py): gzip level (0 = off), brotli quality when the optional
+# brotli package is installed, and the smallest buffered body worth compressing, in bytes
+COMPRESSION_LEVEL = int(os.getenv('COMPRESSION_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '4'))
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+# Content-hashed, precompressed copies of static/ (see utils/static_assets.py)
+STATIC_DIST_DIR = os.getenv('STATIC_DIST_DIR', os.path.join(BASE_DIR, 'static', 'dist'))
 
 # API Keys (load from environment variables in production)
 SERPER_API_KEY = os.getenv('SERPER_API_KEY', '')
 SEMRUSH_API_KEY = os.getenv('SEMRUSH_API_KEY', '')
 
+# Upstream API endpoints (override to point at local stand-ins for load testing)
+SERPER_BASE_URL = os.getenv('SERPER_BASE_URL', 'https://google.serper.dev')
+SEMRUSH_BASE_URL = os.getenv('SEMRUSH_BASE_URL', 'https://api.semrush.com')
+# Search queries sent to Serper per request as one JSON array (Serper takes up to 100; 0 or 1 = one query per
+# request, spaced a second apart)
+SERPER_BATCH_SIZE = int(os.getenv('SERPER_BATCH_SIZE', '100'))
+
+# Upstream quota accounting (Serper bills credits per query; SEMrush bills API units per returned line)
+SERPER_CREDITS_PER_QUERY = float(os.getenv('SERPER_CREDITS_PER_QUERY', '1'))
+SEMRUSH_UNITS_PER_REQUEST = float(os.getenv('SEMRUSH_UNITS_PER_REQUEST', '40'))
+
+# SERP snapshot store (set SERP_SNAPSHOT_DB_PATH to an empty string to disable)
+SERP_SNAPSHOT_DB_PATH = os.getenv('SERP_SNAPSHOT_DB_PATH', os.path.join(BASE_DIR, 'data', 'serp_snapshots.sqlite3'))
+# Reuse a stored snapshot instead of calling Serper when it is younger than this (0 = always fetch)
+SERP_SNAPSHOT_MAX_AGE_HOURS = float(os.getenv('SERP_SNAPSHOT_MAX_AGE_HOURS', '0'))
+
+# Admission control for /analyze and /results, per worker (see utils/admission.py): analyses run at once
+# (0 = no limit), analyses that may wait for a slot, and the longest wait before a request gets a 429
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', '8'))
+ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', '16'))
+ADMISSION_MAX_WAIT = float(os.getenv('ADMISSION_MAX_WAIT', '10'))
+# Load (in flight + queued over slots + queue) at which each degradation tier starts: the first skips
+# competitor SEO, the second also the map, the third also serves SERP results from snapshots only
+ADMISSION_DEGRADE_AT = [float(x) for x in os.getenv('ADMISSION_DEGRADE_AT', '0.5,0.75,0.9').split(',') if x.strip()]
+
+# Time budget for the outbound calls of one /analyze or /results request, in seconds, counted from the
+# start of the request; keep it under the 30 second request timeout (0 = no deadline)
+REQUEST_DEADLINE_SECONDS = float(os.getenv('REQUEST_DEADLINE_SECONDS', '25'))
+# Per-upstream circuit breakers (see utils/resilience.py): consecutive failures that open the circuit
+# (0 = never), and seconds it stays open before a trial call
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+CIRCUIT_RESET_SECONDS = float(os.getenv('CIRCUIT_RESET_SECONDS', '30'))
+
+# Request threads per ASGI worker (see asgi.py and hypercorn.conf.py)
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', '32'))
+
+# Request profiling (see utils/profiling.py); both triggers are off by default
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(BASE_DIR, 'data', 'profiles'))
+# Secret for signed X-Profile request headers
+PROFILE_SECRET = os.getenv('PROFILE_SECRET', '')
+# Admin switch: profile this share of /analyze and /results requests
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+
 # Logging configuration
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+# 'standard' for human-readable lines, 'json' for one JSON object per line
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'standard')
+# Share of DEBUG/INFO records kept per logger prefix, e.g. "engine=0.1,services=0.5" (WARNING+ is never sampled)
+LOG_SAMPLE_RATES = {
+    name.strip(): float(rate)
+    for name, _, rate in (item.partition('=') for item in os.getenv('LOG_SAMPLE_RATES', '').split(',') if item.strip())
+}
+
+# Records are sampled on the calling thread, then formatted and written by a
+# background listener; the queue handler must sort after the handlers it feeds.
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -20,15 +111,35 @@ LOGGING = {
         'standard': {
             'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
         },
+        'json': {
+            '()': 'utils.logging_utils.JsonFormatter'
+        },
+    },
+    'filters': {
+        'sampling': {
+            '()': 'utils.logging_utils.SamplingFilter',
+            'rates': LOG_SAMPLE_RATES
+        },
     },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
-            'formatter': 'standard',
+            'formatter': LOG_FORMAT,
+        },
+        'queue': {
+            '()': 'utils.logging_utils.AsyncQueueHandler',
+            'handlers': ['console'],
+            'filters': ['sampling'],
+        },
+    },
+    'loggers': {
+        # Flask sets its app logger to DEBUG in debug mode unless a level is configured
+        'app': {
+            'level': LOG_LEVEL,
         },
     },
     'root': {
-        'handlers': ['console'],
-        'level': 'INFO',
+        'handlers': ['queue'],
+        'level': LOG_LEVEL,
     },
-}
\ No newline at end of file
+}
@@ -1,4 +1,5 @@
 from .market_engine import MarketAnalysisEngine
 from .opportunity_engine import OpportunityEngine
+from .competitor_engine import CompetitorPresenceEngine
 
-__all__ = ['MarketAnalysisEngine', 'OpportunityEngine']
\ No newline at end of file
+__all__ = ['MarketAnalysisEngine', 'OpportunityEngine', 'CompetitorPresenceEngine']
\ No newline at end of file
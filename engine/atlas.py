@@ -0,0 +1,266 @@
+"""
+National opportunity atlas: every market scored against its own neighborhood.
+
+This is MarketAnalysisEngine.iter_market_scores run for every city, split
+into partitions and spread over a ProcessPoolExecutor. The read-only numeric
+data (city and GA4 columns, feature-preset matrices) is published once in a
+shared memory block; workers are spawned fresh and attach to it instead of
+receiving pickled frames, so only the small text columns are pickled, once
+per worker. Finished partitions go into an AtlasStore (SQLite) in their own
+transaction, which is also the checkpoint: rerunning with the same
+parameters and data version resumes where the last run stopped.
+
+benchmarks/bench_atlas.py reports throughput from 1 to N workers.
+
+Usage:
+    python -m engine.atlas [--workers 8] [--radius 100 | --national] [--preset balanced]
+                           [--db data/atlas.sqlite3] [--partition-size 256] [--limit 1000] [--restart]
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.constants import FEATURE_WEIGHT_PRESETS
+from config.settings import ATLAS_DB_PATH, ATLAS_WORKERS, NATIONAL_INDEX_COMPONENTS, NATIONAL_INDEX_OVERSAMPLE
+from services.atlas_service import AtlasStore
+from .data_version import DataVersion
+from .export import EXPORT_COLUMNS, export_rows
+from .feature_presets import PresetMatrices
+from .national_index import NationalIndex
+
+logger = logging.getLogger(__name__)
+
+# Offsets of arrays in the shared block are aligned to cache lines
+_ALIGN = 64
+
+@dataclass(frozen=True)
+class SharedLayout:
+    """Where each array lives in a shared memory block: name -> (offset, dtype, shape)."""
+    name: str
+    arrays: Dict[str, Tuple[int, str, Tuple[int, ...]]]
+
+class SharedArrays:
+    """NumPy arrays published in one shared memory block; attached views are read-only."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, layout: SharedLayout, owner: bool):
+        self._shm = shm
+        self.layout = layout
+        self._owner = owner
+
+    @classmethod
+    def publish(cls, arrays: Mapping[str, np.ndarray]) -> 'SharedArrays':
+        """Copy arrays into a new shared memory block."""
+        offsets, size = {}, 0
+        for key, array in arrays.items():
+            offsets[key] = size
+            size += -(-array.nbytes // _ALIGN) * _ALIGN
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        layout = SharedLayout(shm.name, {
+            key: (offsets[key], np.asarray(array).dtype.str, np.shape(array)) for key, array in arrays.items()
+        })
+        for key, array in arrays.items():
+            offset, dtype, shape = layout.arrays[key]
+            target = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+            target[...] = array
+            del target
+        return cls(shm, layout, owner=True)
+
+    @classmethod
+    def attach(cls, layout: SharedLayout) -> 'SharedArrays':
+        """Attach to a block published by another process."""
+        # Spawned workers share the publisher's resource tracker, so the
+        # block stays registered once and is unlinked by the publisher only
+        shm = shared_memory.SharedMemory(name=layout.name)
+        return cls(shm, layout, owner=False)
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        offset, dtype, shape = self.layout.arrays[key]
+        view = np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, offset=offset)
+        view.setflags(write=False)
+        return view
+
+    @property
+    def nbytes(self) -> int:
+        return self._shm.size
+
+    def close(self):
+        """Detach; the publisher also frees the block."""
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+def _split_frame(df: pd.DataFrame, prefix: str) -> Tuple[Dict[str, np.ndarray], Dict]:
+    """Numeric columns for the shared block, and the rest (index, text columns) to pickle."""
+    numeric = [col for col in df.columns
+               if isinstance(df[col].dtype, np.dtype) and np.issubdtype(df[col].dtype, np.number)]
+    arrays = {f"{prefix}{col}": df[col].to_numpy() for col in numeric}
+    rest = {'columns': list(df.columns), 'numeric': numeric, 'index': df.index,
+            'objects': df.drop(columns=numeric)}
+    return arrays, rest
+
+def _join_frame(shared: SharedArrays, prefix: str, rest: Dict) -> pd.DataFrame:
+    """Rebuild a frame whose numeric columns are views of the shared block."""
+    columns = {col: shared[f"{prefix}{col}"] for col in rest['numeric']}
+    columns.update({col: rest['objects'][col].array for col in rest['objects'].columns})
+    return pd.DataFrame({col: columns[col] for col in rest['columns']}, index=rest['index'], copy=False)
+
+def share_version(data: DataVersion, index_preset: Optional[str] = None) -> Tuple[SharedArrays, Dict]:
+    """
+    Publish a data version for atlas workers.
+
+    Returns:
+        The shared block (close it when the workers are done) and the
+        picklable rest of the version, to pass to the worker initializer
+    """
+    city_arrays, city_rest = _split_frame(data.city_data, 'city.')
+    ga4_arrays, ga4_rest = _split_frame(data.ga4_data, 'ga4.')
+    matrices = data.presets.matrices if data.presets else {}
+    shared = SharedArrays.publish({
+        **city_arrays, **ga4_arrays, **{f"preset.{name}": matrix for name, matrix in matrices.items()}
+    })
+    state = {
+        'version': data.version,
+        'city': city_rest,
+        'ga4': ga4_rest,
+        'medians': data.presets.medians if data.presets else None,
+        'presets': list(matrices),
+        'index_preset': index_preset,
+    }
+    return shared, state
+
+# Per-worker engine, set up once by _init_worker
+_worker_engine = None
+_worker_shared = None
+
+def _init_worker(layout: SharedLayout, state: Dict, index_components: int, index_oversample: int):
+    global _worker_engine, _worker_shared
+    from .market_engine import MarketAnalysisEngine
+
+    _worker_shared = SharedArrays.attach(layout)
+    city_data = _join_frame(_worker_shared, 'city.', state['city'])
+    ga4_data = _join_frame(_worker_shared, 'ga4.', state['ga4'])
+    presets = None
+    if state['presets']:
+        matrices = {name: _worker_shared[f"preset.{name}"] for name in state['presets']}
+        # Only a nationwide run needs an index, and only for its own preset
+        indexes = {}
+        if state['index_preset']:
+            indexes[state['index_preset']] = NationalIndex(matrices[state['index_preset']], index_components,
+                                                           index_oversample)
+        presets = PresetMatrices(state['medians'], matrices, indexes)
+    data = DataVersion(state['version'], city_data, ga4_data, sources={}, presets=presets)
+    _worker_engine = MarketAnalysisEngine(ga4_delta_dir=None, result_cache_size=0, data=data)
+
+def _score_partition(keys: List[str], radius_miles: Optional[int], n_similar: int, preset: Optional[str],
+                     batch_size: int) -> Tuple[pd.DataFrame, float]:
+    start = time.perf_counter()
+    chunks = _worker_engine.iter_market_scores(radius_miles=radius_miles, n_similar=n_similar, preset=preset,
+                                               batch_size=batch_size, targets=keys)
+    frames = list(export_rows(chunks))
+    rows = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=list(EXPORT_COLUMNS))
+    return rows, time.perf_counter() - start
+
+def run_atlas(data: DataVersion, store: AtlasStore, workers: int = ATLAS_WORKERS, radius_miles: Optional[int] = 100,
+              preset: Optional[str] = None, n_similar: int = 15, partition_size: int = 256, batch_size: int = 64,
+              targets: Optional[Iterable[str]] = None, restart: bool = False,
+              index_components: int = NATIONAL_INDEX_COMPONENTS,
+              index_oversample: int = NATIONAL_INDEX_OVERSAMPLE) -> Dict:
+    """
+    Score every market (or the given targets) and store the rows.
+
+    Args:
+        data: Data version to score
+        store: Destination table; also the checkpoint
+        workers: Worker processes (0 = one per CPU)
+        radius_miles: Neighborhood radius; None for nationwide neighborhoods
+        preset: Feature preset (see MarketAnalysisEngine.find_similar_cities)
+        n_similar: Markets per neighborhood
+        partition_size: Markets per worker task (and per checkpoint)
+        batch_size: Targets per scoring kernel call within a task
+        targets: city_state keys to score (default: every city)
+        restart: Discard stored rows even if the parameters match
+
+    Returns:
+        Run statistics: markets scored, skipped, wall time and throughput
+    """
+    from .market_engine import MarketAnalysisEngine
+
+    workers = workers or os.cpu_count() or 1
+    preset = MarketAnalysisEngine._resolve_preset(data, radius_miles, None, preset)
+    keys = data.city_data.index.unique() if targets is None else pd.Index(list(targets))
+    params = {'data_version': data.version, 'radius_miles': radius_miles, 'preset': preset, 'n_similar': n_similar}
+    done = store.start(params, len(keys), reset=restart)
+    pending = [key for key in keys if key not in done]
+    partitions = [pending[i:i + partition_size] for i in range(0, len(pending), partition_size)]
+    logger.info("Atlas: %d markets to score in %d partitions on %d workers (%d already stored)",
+                len(pending), len(partitions), workers, len(keys) - len(pending))
+
+    stats = {'workers': workers, 'markets': 0, 'skipped': 0, 'resumed': len(keys) - len(pending),
+             'worker_seconds': 0.0}
+    start = time.perf_counter()
+    if partitions:
+        shared, state = share_version(data, preset if radius_miles is None else None)
+        try:
+            # spawn: workers inherit nothing but what the initializer hands them
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_init_worker,
+                                     initargs=(shared.layout, state, index_components, index_oversample)) as pool:
+                futures = {pool.submit(_score_partition, partition, radius_miles, n_similar, preset, batch_size):
+                           len(partition) for partition in partitions}
+                for future in as_completed(futures):
+                    rows, seconds = future.result()
+                    store.write(rows)
+                    stats['markets'] += len(rows)
+                    stats['skipped'] += futures[future] - len(rows)
+                    stats['worker_seconds'] += seconds
+                    logger.info("Atlas: %d/%d markets (%.1f/s)", stats['markets'] + stats['skipped'],
+                                len(pending), stats['markets'] / (time.perf_counter() - start))
+        finally:
+            shared.close()
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['markets_per_second'] = stats['markets'] / stats['seconds'] if stats['markets'] else 0.0
+    store.finish(stats)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=ATLAS_DB_PATH, help='SQLite file for the atlas table')
+    parser.add_argument('--workers', type=int, default=ATLAS_WORKERS, help='Worker processes (0 = one per CPU)')
+    scope = parser.add_mutually_exclusive_group()
+    scope.add_argument('--radius', type=int, default=100, help='Neighborhood radius in miles')
+    scope.add_argument('--national', action='store_true', help='Nationwide neighborhoods')
+    parser.add_argument('--preset', choices=sorted(FEATURE_WEIGHT_PRESETS), help='Feature preset')
+    parser.add_argument('--n-similar', type=int, default=15, help='Markets per neighborhood')
+    parser.add_argument('--partition-size', type=int, default=256, help='Markets per task and checkpoint')
+    parser.add_argument('--batch-size', type=int, default=64, help='Targets per scoring kernel call')
+    parser.add_argument('--limit', type=int, help='Score only the first N markets')
+    parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start over')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not args.db:
+        parser.error('no atlas database configured (ATLAS_DB_PATH is empty); pass --db')
+
+    from .market_engine import MarketAnalysisEngine
+    engine = MarketAnalysisEngine(result_cache_size=0)
+    data = engine.data
+    targets = data.city_data.index.unique()[:args.limit] if args.limit else None
+    stats = run_atlas(data, AtlasStore(args.db, EXPORT_COLUMNS), args.workers,
+                      None if args.national else args.radius, args.preset, args.n_similar,
+                      args.partition_size, args.batch_size, targets, args.restart)
+    print(f"Scored {stats['markets']:,} markets in {stats['seconds']:.1f}s on {stats['workers']} workers "
+          f"({stats['markets_per_second']:.1f}/s; {stats['resumed']:,} resumed, {stats['skipped']:,} skipped)",
+          file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""
+In-memory search index over the city_state keys, for typeahead and "did you mean".
+
+Built once per data version from the city frame:
+
+- Completion: the normalized "city, st" keys are kept in one sorted list, so
+  the keys starting with a prefix are a contiguous slice found by binary
+  search. The slice's most populous cities are returned.
+- Suggestions: a trigram index over the normalized city names. The names
+  sharing the most trigrams with a misspelled query are re-ranked by edit
+  distance, matching state and population, so "Pittsburg, PA" or
+  "Chicago, IN" still finds the city meant.
+
+Names are normalized the same way on both sides (case, accents, punctuation
+and spacing), so "st louis" completes to "St. Louis, MO".
+"""
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Candidates (by shared trigrams) re-ranked by edit distance per suggestion query
+SUGGESTION_CANDIDATES = 24
+# Least trigram similarity (Jaccard) for a name to be suggested at all
+MIN_SIMILARITY = 0.2
+# Edit-distance penalty for a suggestion in another state than the one asked for
+STATE_MISMATCH_PENALTY = 1
+
+_PUNCTUATION = re.compile(r"[^a-z0-9,]+")
+_COMMA = re.compile(r"\s*,\s*")
+
+def normalize(text: str) -> str:
+    """Search form of a city name or "city, st" query: lowercase ASCII words, one ", " before the state."""
+    text = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode('ascii').lower()
+    return _COMMA.sub(', ', _PUNCTUATION.sub(' ', text)).strip()
+
+def split_query(query: str) -> Tuple[str, Optional[str]]:
+    """Normalized (city name, state or None) from "city" or "city, st"."""
+    name, _, state = normalize(query).rpartition(', ')
+    if not name:
+        return state, None
+    return name, state or None
+
+def trigrams(name: str) -> set:
+    """Trigrams of a normalized name, padded so the first letters weigh more than the rest."""
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def edit_distance(a: str, b: str, limit: Optional[int] = None) -> int:
+    """Levenshtein distance between two strings; with a limit, any distance above it is reported as limit + 1."""
+    # Near-misses mostly share a prefix and suffix, which cost nothing; drop them before the quadratic part
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+class CityNotFound(ValueError):
+    """A target city that is not in the dataset; `suggestions` holds the closest matches."""
+
+    def __init__(self, city_state: str, suggestions: Optional[List[Dict]] = None):
+        super().__init__(f"Target city '{city_state}' not found in the dataset")
+        self.city_state = city_state
+        self.suggestions = suggestions or []
+
+class CityIndex:
+    """Prefix and trigram index over a city frame's rows; read-only once built."""
+
+    def __init__(self, city_data: pd.DataFrame):
+        """
+        Args:
+            city_data: City frame indexed by city_state, with city, state_id and population columns
+        """
+        names = [normalize(city) for city in city_data['city'].astype(str)]
+        states = city_data['state_id'].astype(str).str.lower().tolist()
+        search_keys = [f"{name}, {state}" for name, state in zip(names, states)]
+        order = sorted(range(len(search_keys)), key=search_keys.__getitem__)
+
+        # Everything below is in search-key order
+        self._search_keys = [search_keys[i] for i in order]
+        self._names = [names[i] for i in order]
+        self._states = [states[i] for i in order]
+        self._keys = city_data.index.to_numpy()[order]
+        self._cities = city_data['city'].astype(str).to_numpy()[order]
+        self._state_ids = city_data['state_id'].astype(str).to_numpy()[order]
+        self._population = city_data['population'].fillna(0).to_numpy(np.float64)[order]
+
+        postings, by_state = defaultdict(list), defaultdict(list)
+        gram_counts = np.empty(len(order), dtype=np.int32)
+        for position, (name, state) in enumerate(zip(self._names, self._states)):
+            grams = trigrams(name)
+            gram_counts[position] = len(grams)
+            for gram in grams:
+                postings[gram].append(position)
+            by_state[state].append(position)
+        self._postings = {gram: np.array(positions, dtype=np.int32) for gram, positions in postings.items()}
+        self._by_state = {state: np.array(positions, dtype=np.int32) for state, positions in by_state.items()}
+        self._gram_counts = gram_counts
+
+    def __len__(self) -> int:
+        return len(self._search_keys)
+
+    def _match(self, position: int) -> Dict:
+        return {'city': self._cities[position], 'state': self._state_ids[position], 'key': self._keys[position]}
+
+    def complete(self, prefix: str, limit: int = 8) -> List[Dict]:
+        """
+        Cities whose "city, st" starts with the prefix, most populous first.
+
+        Args:
+            prefix: What has been typed so far ("san", "austin, t")
+            limit: Most matches to return
+
+        Returns:
+            Matches as {'city', 'state', 'key'}
+        """
+        prefix = normalize(prefix)
+        if not prefix or limit <= 0:
+            return []
+        lo = bisect_left(self._search_keys, prefix)
+        # Keys starting with the prefix sort before the prefix with its last character incremented
+        hi = bisect_left(self._search_keys, prefix[:-1] + chr(ord(prefix[-1]) + 1), lo)
+        population = self._population[lo:hi]
+        if hi - lo > limit:
+            top = np.argpartition(-population, limit - 1)[:limit]
+        else:
+            top = np.arange(hi - lo)
+        top = top[np.argsort(-population[top], kind='stable')]
+        return [self._match(lo + position) for position in top]
+
+    def suggest(self, query: str, limit: int = 5) -> List[Dict]:
+        """
+        Closest cities to a misspelled "city" or "city, st".
+
+        Candidates sharing the most trigrams with the name (names in the
+        requested state first) are ranked by edit distance, plus a penalty for
+        another state, then by trigram similarity and population.
+
+        Args:
+            query: The city, optionally followed by ", " and the state
+            limit: Most suggestions to return
+
+        Returns:
+            Suggestions as {'city', 'state', 'key'}, best first
+        """
+        name, state = split_query(query)
+        grams = trigrams(name) if name else set()
+        postings = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not postings or limit <= 0:
+            return []
+        shared = np.bincount(np.concatenate(postings), minlength=len(self))
+        similarity = shared / (len(grams) + self._gram_counts - shared)
+        ranking = similarity.copy()
+        if state in self._by_state:
+            ranking[self._by_state[state]] += 1
+        candidates = np.argpartition(-ranking, min(SUGGESTION_CANDIDATES, len(self)) - 1)[:SUGGESTION_CANDIDATES]
+        candidates = candidates[similarity[candidates] >= MIN_SIMILARITY]
+
+        # Most similar first, so the edit distances of later candidates can stop at the best found so far
+        scored = []
+        for position in candidates[np.argsort(-similarity[candidates], kind='stable')]:
+            penalty = STATE_MISMATCH_PENALTY if state and self._states[position] != state else 0
+            bound = scored[limit - 1][0] - penalty if len(scored) >= limit else None
+            distance = edit_distance(name, self._names[position], bound)
+            insort(scored, (distance + penalty, -similarity[position], -self._population[position], int(position)))
+        return [self._match(position) for *_, position in scored[:limit]]
+
+    def search(self, query: str, limit: int = 8) -> Tuple[str, List[Dict]]:
+        """
+        Typeahead lookup: prefix completions, or suggestions when nothing starts with the query.
+
+        Returns:
+            ('prefix' or 'fuzzy', matches)
+        """
+        matches = self.complete(query, limit)
+        if matches or len(normalize(query)) < 3:
+            return 'prefix', matches
+        return 'fuzzy', self.suggest(query, limit)
@@ -0,0 +1,126 @@
+import logging
+import numpy as np
+from scipy import sparse
+from typing import Dict, List, Optional
+
+from models import SearchResult
+from utils.domain_utils import is_ibuyer
+
+class CompetitorPresenceEngine:
+    """Builds cross-market competitor presence matrices from SERP results."""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+    def build_rank_matrix(self, market_results: Dict[str, Dict[str, List[SearchResult]]]):
+        """
+        Build a sparse domain x market matrix holding each domain's best rank.
+
+        Args:
+            market_results: Mapping of market name to its per-term search results
+
+        Returns:
+            Tuple of (csr rank matrix, domain list, market list). Absent
+            domains are implicit zeros, so every stored value is a rank >= 1.
+        """
+        markets = list(market_results.keys())
+        domain_ids: Dict[str, int] = {}
+        best_ranks: Dict[tuple, int] = {}
+
+        for col, market in enumerate(markets):
+            for results in market_results[market].values():
+                for result in results:
+                    row = domain_ids.setdefault(result.domain, len(domain_ids))
+                    key = (row, col)
+                    if key not in best_ranks or result.rank < best_ranks[key]:
+                        best_ranks[key] = result.rank
+
+        if best_ranks:
+            rows, cols = zip(*best_ranks.keys())
+            values = list(best_ranks.values())
+        else:
+            rows, cols, values = [], [], []
+
+        matrix = sparse.csr_matrix(
+            (np.asarray(values, dtype=np.float64), (np.asarray(rows, dtype=np.int32), np.asarray(cols, dtype=np.int32))),
+            shape=(len(domain_ids), len(markets))
+        )
+        return matrix, list(domain_ids.keys()), markets
+
+    def analyze(self, market_results: Dict[str, Dict[str, List[SearchResult]]],
+                target_market: Optional[str] = None, top_n: int = 25) -> Dict:
+        """
+        Compute domain dominance and market overlap scores.
+
+        Args:
+            market_results: Mapping of market name to its per-term search results
+            target_market: Market the overlap scores are reported against
+            top_n: Number of dominant domains to return
+
+        Returns:
+            Dictionary with the rank matrix, per-domain scores and per-market overlap
+        """
+        matrix, domains, markets = self.build_rank_matrix(market_results)
+        n_markets = len(markets)
+        self.logger.info(f"Built presence matrix: {len(domains)} domains x {n_markets} markets, "
+                         f"{matrix.nnz} non-zero entries")
+
+        if not domains:
+            return {
+                'markets': markets,
+                'domains': [],
+                'matrix': matrix,
+                'domain_scores': [],
+                'market_overlap': []
+            }
+
+        # Binary presence and rank points (best rank earns the most points)
+        max_rank = max(10, int(matrix.data.max()))
+        presence = matrix.copy()
+        presence.data = np.ones_like(presence.data)
+        rank_points = matrix.copy()
+        rank_points.data = (max_rank + 1) - rank_points.data
+
+        market_count = np.asarray(presence.sum(axis=1)).ravel()
+        rank_sum = np.asarray(matrix.sum(axis=1)).ravel()
+        dominance = np.asarray(rank_points.sum(axis=1)).ravel() / (max_rank * n_markets)
+
+        order = np.argsort(-dominance, kind='stable')[:top_n]
+        domain_scores = [
+            {
+                'domain': domains[i],
+                'market_count': int(market_count[i]),
+                'coverage': float(market_count[i] / n_markets),
+                'average_rank': float(rank_sum[i] / market_count[i]),
+                'dominance': float(dominance[i]),
+                'is_ibuyer': is_ibuyer(domains[i])
+            }
+            for i in order
+        ]
+
+        # Market x market shared-domain counts and Jaccard overlap
+        shared = (presence.T @ presence).toarray()
+        sizes = np.diag(shared)
+        union = sizes[:, None] + sizes[None, :] - shared
+        with np.errstate(divide='ignore', invalid='ignore'):
+            jaccard = np.where(union > 0, shared / union, 0.0)
+
+        target_col = markets.index(target_market) if target_market in markets else None
+        market_overlap = []
+        for col, market in enumerate(markets):
+            others = np.delete(jaccard[col], col)
+            market_overlap.append({
+                'market': market,
+                'domain_count': int(sizes[col]),
+                'shared_with_target': int(shared[col, target_col]) if target_col is not None else None,
+                'overlap_with_target': float(jaccard[col, target_col]) if target_col is not None else None,
+                'mean_overlap': float(others.mean()) if others.size else 0.0
+            })
+
+        return {
+            'markets': markets,
+            'domains': domains,
+            'matrix': matrix,
+            'domain_scores': domain_scores,
+            'market_overlap': market_overlap
+        }
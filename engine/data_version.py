@@ -0,0 +1,242 @@
+"""
+Versioned market data with background reloads.
+
+A DataVersion is an immutable snapshot of the city and GA4 frames plus the
+structures derived from them (feature-preset matrices, national indexes and
+the city search index). DataSource builds versions from the files on
+disk: a full load when cities.csv or ga4data.csv change, or an incremental
+one when new daily GA4 delta files appear in GA4_DELTA_DIR. DataReloader
+polls the files from a background thread and hands finished versions to the
+engine, which swaps them in with a single reference assignment, so requests
+keep using the old version until the new one is complete.
+
+Under gunicorn's gevent workers threading is monkey-patched, so the reloader
+is a greenlet; the rebuild itself then runs on the hub's threadpool (a real
+OS thread) so it does not stall every request in the worker while it runs.
+"""
+import hashlib
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Mapping, Optional, Set, Tuple
+
+import pandas as pd
+
+try:
+    from gevent import get_hub
+    from gevent.monkey import is_module_patched
+except ImportError:  # gevent is only needed for gunicorn's gevent workers
+    get_hub = is_module_patched = None
+
+from utils.data_utils import load_city_data, load_ga4_data
+from .city_index import CityIndex
+from .feature_presets import PresetMatrices, build_preset_matrices
+
+logger = logging.getLogger(__name__)
+
+# path -> (mtime_ns, size)
+Fingerprints = Dict[str, Tuple[int, int]]
+
+def _fingerprint(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+@dataclass(frozen=True)
+class DataVersion:
+    """An immutable snapshot of the market data."""
+    version: str
+    city_data: pd.DataFrame
+    ga4_data: pd.DataFrame
+    sources: Fingerprints
+    deltas: Fingerprints = field(default_factory=dict)
+    presets: Optional[PresetMatrices] = None
+    city_index: Optional[CityIndex] = None
+    loaded_at: datetime = field(default_factory=datetime.now)
+
+    def describe(self) -> Dict:
+        """Summary of the version for status endpoints and logs."""
+        return {
+            'version': self.version,
+            'loaded_at': self.loaded_at.isoformat(),
+            'cities': len(self.city_data),
+            'ga4_rows': len(self.ga4_data),
+            'sources': {os.path.basename(path): mtime for path, (mtime, _) in self.sources.items()},
+            'deltas': sorted(os.path.basename(path) for path in self.deltas),
+            'feature_presets': sorted(self.presets.matrices) if self.presets else [],
+        }
+
+def _off_hub(func, *args):
+    """Call func, in a real OS thread when gevent has patched threading into greenlets."""
+    if is_module_patched is not None and is_module_patched('threading'):
+        return get_hub().threadpool.apply(func, args)
+    return func(*args)
+
+def _version_id(sources: Fingerprints, deltas: Fingerprints) -> str:
+    digest = hashlib.sha1(repr(sorted({**sources, **deltas}.items())).encode()).hexdigest()
+    return digest[:12]
+
+def _changed_rows(old: pd.DataFrame, new: pd.DataFrame) -> Set[str]:
+    """Index keys that were added, removed or whose values differ between two frames."""
+    old = old[~old.index.duplicated(keep='last')]
+    new = new[~new.index.duplicated(keep='last')]
+    changed = set(old.index.symmetric_difference(new.index))
+    common = old.index.intersection(new.index)
+    columns = old.columns.intersection(new.columns)
+    a, b = old.loc[common, columns], new.loc[common, columns]
+    differs = ~((a == b) | (a.isna() & b.isna()))
+    changed.update(common[differs.any(axis=1).to_numpy()])
+    return changed
+
+def upsert_rows(base: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    """Replace base rows that share a key with delta rows and append the new ones."""
+    delta = delta[~delta.index.duplicated(keep='last')]
+    merged = pd.concat([base[~base.index.isin(delta.index)], delta])
+    return merged.astype(base.dtypes.to_dict())
+
+class DataSource:
+    """
+    Builds DataVersions from cities.csv, ga4data.csv and a directory of GA4 deltas.
+
+    Delta files are CSVs with the ga4data.csv columns, applied in file name
+    order (e.g. ga4_2024-05-01.csv); their rows replace the GA4 rows for the
+    same city_state.
+    """
+
+    def __init__(self, city_data_path: str, ga4_data_path: str, ga4_delta_dir: Optional[str] = None,
+                 feature_presets: Optional[Mapping[str, Dict]] = None, index_components: int = 0,
+                 index_oversample: int = 16):
+        self.city_data_path = city_data_path
+        self.ga4_data_path = ga4_data_path
+        self.ga4_delta_dir = ga4_delta_dir
+        self.feature_presets = feature_presets or {}
+        self.index_components = index_components
+        self.index_oversample = index_oversample
+
+    def _source_fingerprints(self) -> Fingerprints:
+        return {path: _fingerprint(path) for path in (self.city_data_path, self.ga4_data_path)}
+
+    def _delta_fingerprints(self) -> Fingerprints:
+        if not self.ga4_delta_dir or not os.path.isdir(self.ga4_delta_dir):
+            return {}
+        return {
+            path: _fingerprint(path)
+            for path in sorted(os.path.join(self.ga4_delta_dir, name) for name in os.listdir(self.ga4_delta_dir))
+            if path.endswith('.csv')
+        }
+
+    @staticmethod
+    def _load_ga4(path: str) -> pd.DataFrame:
+        return load_ga4_data(path).set_index('city_state')
+
+    def load(self) -> DataVersion:
+        """Build a version from scratch."""
+        sources = self._source_fingerprints()
+        deltas = self._delta_fingerprints()
+
+        city_data = load_city_data(self.city_data_path).set_index('city_state')
+        ga4_data = self._load_ga4(self.ga4_data_path)
+        for path in deltas:
+            ga4_data = upsert_rows(ga4_data, self._load_ga4(path))
+        presets = None
+        if self.feature_presets:
+            presets = build_preset_matrices(city_data, self.feature_presets,
+                                            self.index_components, self.index_oversample)
+
+        return DataVersion(_version_id(sources, deltas), city_data, ga4_data, sources, deltas, presets,
+                           CityIndex(city_data))
+
+    def refresh(self, current: DataVersion) -> Optional[Tuple[DataVersion, Optional[Set[str]]]]:
+        """
+        Build a newer version if any file changed.
+
+        Returns:
+            None if nothing changed, else (new version, changed city_state keys).
+            The key set is None when every cached result is affected.
+        """
+        sources = self._source_fingerprints()
+        deltas = self._delta_fingerprints()
+        if sources == current.sources and deltas == current.deltas:
+            return None
+
+        if sources[self.city_data_path] != current.sources[self.city_data_path]:
+            # City rows feed the similarity search for every target within range
+            logger.info("City data changed; reloading all data")
+            return self.load(), None
+
+        new_deltas = {path: fp for path, fp in deltas.items() if path not in current.deltas}
+        only_appended = (sources == current.sources
+                         and all(current.deltas[path] == deltas.get(path) for path in current.deltas))
+        if only_appended:
+            logger.info("Applying %d new GA4 delta file(s)", len(new_deltas))
+            ga4_data, changed = current.ga4_data, set()
+            for path in new_deltas:
+                delta = self._load_ga4(path)
+                ga4_data = upsert_rows(ga4_data, delta)
+                changed.update(delta.index)
+        else:
+            logger.info("GA4 data changed; rebuilding GA4 frame")
+            ga4_data = self._load_ga4(self.ga4_data_path)
+            for path in deltas:
+                ga4_data = upsert_rows(ga4_data, self._load_ga4(path))
+            changed = _changed_rows(current.ga4_data, ga4_data)
+
+        # GA4 changes leave the city rows, and so the preset matrices and city index, as they were
+        version = DataVersion(_version_id(sources, deltas), current.city_data, ga4_data, sources, deltas,
+                              current.presets, current.city_index)
+        return version, changed
+
+class DataReloader(threading.Thread):
+    """
+    Polls a DataSource and swaps new versions into the engine.
+
+    Threads do not survive fork, so call ensure_reloader() from each worker
+    process (it is cheap and idempotent).
+    """
+
+    def __init__(self, engine, source: DataSource, interval: float):
+        super().__init__(daemon=True, name='data-reloader')
+        self.engine = engine
+        self.source = source
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.check_now()
+
+    def check_now(self) -> bool:
+        """Reload if the files changed; returns whether a new version was swapped in."""
+        try:
+            # CPU-bound: parsing, scaling and index builds would block the gevent hub
+            result = _off_hub(self.source.refresh, self.engine.data)
+        except Exception as e:
+            logger.error("Error reloading market data, keeping version %s: %s", self.engine.data.version, e)
+            return False
+        if result is None:
+            return False
+        version, changed_keys = result
+        self.engine.swap_data(version, changed_keys)
+        return True
+
+    def stop(self):
+        self._stop_event.set()
+
+_reloaders: Dict[Tuple[int, int], DataReloader] = {}
+_reloaders_lock = threading.Lock()
+
+def ensure_reloader(engine, source: DataSource, interval: float) -> Optional[DataReloader]:
+    """Start the engine's reloader in this process if it is not running yet."""
+    if interval <= 0:
+        return None
+    key = (id(engine), os.getpid())
+    reloader = _reloaders.get(key)
+    if reloader is None:
+        with _reloaders_lock:
+            reloader = _reloaders.get(key)
+            if reloader is None:
+                reloader = _reloaders[key] = DataReloader(engine, source, interval)
+                reloader.start()
+                logger.info("Started market data reloader (every %.0fs)", interval)
+    return reloader
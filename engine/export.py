@@ -0,0 +1,248 @@
+"""
+Streaming bulk export of opportunity scores.
+
+MarketAnalysisEngine.iter_market_scores scores every market within its own
+neighborhood a batch at a time; the functions here turn those batches into
+rows with a fixed schema and encode them incrementally, as CSV chunks or
+Parquet row groups. Only one batch (plus, for Parquet, one row group) is in
+memory at any time. The nightly CLI below and the atlas job (engine/atlas.py)
+score through this pipeline.
+
+Scoring every market takes minutes of CPU, so the /export endpoint never
+does it in a web worker: it streams the rows the atlas job stored
+(iter_atlas_export), encoded the same way.
+
+Parquet output needs pyarrow, which is optional.
+
+Usage:
+    python -m engine.export scores.csv [--radius 100 | --national] [--preset balanced]
+    python -m engine.export scores.parquet [--row-group-size 5000] [--batch-size 64] [--limit 1000]
+"""
+import argparse
+import io
+import logging
+import os
+import sys
+import time
+from typing import Iterable, Iterator, Optional
+
+import pandas as pd
+
+from config.constants import FEATURE_WEIGHT_PRESETS
+from config.schema import GA4_COLUMNS
+from .scoring_kernel import MARKET_METRIC_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Exported columns and their types ('str' or 'float'), in output order
+EXPORT_COLUMNS = {
+    'city_state': 'str',
+    'city': 'str',
+    'state_id': 'str',
+    'lat': 'float',
+    'lng': 'float',
+    'population_proper': 'float',
+    'housing_units': 'float',
+    'unique_sites': 'float',
+    **{col: 'float' for col in GA4_COLUMNS},
+    'performance_diff': 'float',
+    **{col: 'float' for col in MARKET_METRIC_COLUMNS},
+    'norm_similarity': 'float',
+    'raw_opportunity_score': 'float',
+    'normalized_log_housing': 'float',
+    'opportunity_score': 'float',
+    'opportunity_category': 'str',
+    'tags': 'str',
+    'neighborhood_size': 'float',
+    'data_version': 'str',
+}
+
+def export_rows(chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """Conform iter_market_scores batches to EXPORT_COLUMNS (tags joined with ';')."""
+    for chunk in chunks:
+        yield conform_rows(chunk.assign(
+            city_state=chunk.index,
+            tags=[';'.join(tags) if isinstance(tags, list) else None for tags in chunk['tags']],
+        ))
+
+def conform_rows(frame: pd.DataFrame) -> pd.DataFrame:
+    """Reorder and type a frame's columns as EXPORT_COLUMNS: float64, or objects with None for missing."""
+    frame = frame.reindex(columns=list(EXPORT_COLUMNS))
+    for column, kind in EXPORT_COLUMNS.items():
+        if kind == 'float':
+            frame[column] = pd.to_numeric(frame[column], errors='coerce').astype('float64')
+        else:
+            frame[column] = frame[column].astype(object).where(frame[column].notna(), None)
+    return frame.reset_index(drop=True)
+
+def iter_csv(rows: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """Encode row batches as CSV, one chunk of bytes per batch; the header comes with the first."""
+    header = True
+    for frame in rows:
+        yield frame.to_csv(index=False, header=header).encode('utf-8')
+        header = False
+    if header:
+        yield pd.DataFrame(columns=list(EXPORT_COLUMNS)).to_csv(index=False).encode('utf-8')
+
+class _ByteSink(io.RawIOBase):
+    """Write-only file object whose contents are drained as they are produced."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._parts = b''.join(self._parts), []
+        return data
+
+def require_pyarrow():
+    """
+    Import pyarrow for Parquet output.
+
+    Raises:
+        RuntimeError: If pyarrow is not installed
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+    return pyarrow, pyarrow.parquet
+
+def iter_parquet(rows: Iterable[pd.DataFrame], row_group_size: int = 5000) -> Iterator[bytes]:
+    """Encode row batches as a Parquet file, yielding its bytes one row group at a time."""
+    pa, pq = require_pyarrow()
+    schema = pa.schema([(column, pa.float64() if kind == 'float' else pa.string())
+                        for column, kind in EXPORT_COLUMNS.items()])
+    sink = _ByteSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    pending, pending_rows = [], 0
+
+    def flush() -> bytes:
+        table = pa.Table.from_pandas(pd.concat(pending, ignore_index=True), schema=schema, preserve_index=False)
+        # One row group per flush: row_group_size rows plus at most one batch
+        writer.write_table(table, row_group_size=len(table))
+        pending.clear()
+        return sink.drain()
+
+    try:
+        for frame in rows:
+            pending.append(frame)
+            pending_rows += len(frame)
+            if pending_rows >= row_group_size:
+                yield flush()
+                pending_rows = 0
+        if pending:
+            yield flush()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def iter_export(engine, fmt: str = 'csv', radius_miles: Optional[int] = 100, n_similar: int = 15,
+                preset: Optional[str] = None, batch_size: int = 64, row_group_size: int = 5000,
+                targets: Optional[Iterable[str]] = None) -> Iterator[bytes]:
+    """
+    The full export, scored now, as a stream of bytes.
+
+    Args:
+        engine: MarketAnalysisEngine to score with
+        fmt: 'csv' or 'parquet'
+        radius_miles, n_similar, preset, batch_size, targets: See MarketAnalysisEngine.iter_market_scores
+        row_group_size: Rows per Parquet row group
+
+    Raises:
+        ValueError: For an unknown format
+        RuntimeError: For Parquet without pyarrow
+    """
+    _check_format(fmt)
+    chunks = engine.iter_market_scores(radius_miles=radius_miles, n_similar=n_similar, preset=preset,
+                                       batch_size=batch_size, targets=targets)
+    return _encode(export_rows(chunks), fmt, row_group_size)
+
+def iter_atlas_export(store, fmt: str = 'csv', limit: Optional[int] = None, batch_size: int = 1000,
+                      row_group_size: int = 5000) -> Iterator[bytes]:
+    """
+    The rows stored by the atlas job as a stream of bytes, in city_state order.
+
+    Nothing is scored: this only reads and encodes, so it is cheap enough for a web worker.
+
+    Args:
+        store: AtlasStore holding the rows
+        fmt: 'csv' or 'parquet'
+        limit: Export only the first N rows
+        batch_size: Rows read per query batch (and CSV chunk)
+        row_group_size: Rows per Parquet row group
+
+    Raises:
+        ValueError: For an unknown format
+        RuntimeError: For Parquet without pyarrow
+    """
+    _check_format(fmt)
+    rows = (conform_rows(frame) for frame in store.iter_rows(batch_size, limit))
+    return _encode(rows, fmt, row_group_size)
+
+def _check_format(fmt: str):
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}' (expected one of {', '.join(EXPORT_FORMATS)})")
+    if fmt == 'parquet':
+        # Fail before the first byte is sent rather than mid-stream
+        require_pyarrow()
+
+def _encode(rows: Iterable[pd.DataFrame], fmt: str, row_group_size: int) -> Iterator[bytes]:
+    return iter_csv(rows) if fmt == 'csv' else iter_parquet(rows, row_group_size)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output', help='Output file (.csv or .parquet)')
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), help='Default: from the output extension')
+    scope = parser.add_mutually_exclusive_group()
+    scope.add_argument('--radius', type=int, default=100, help='Neighborhood radius in miles')
+    scope.add_argument('--national', action='store_true', help='Nationwide neighborhoods')
+    parser.add_argument('--preset', choices=sorted(FEATURE_WEIGHT_PRESETS), help='Feature preset')
+    parser.add_argument('--n-similar', type=int, default=15, help='Markets per neighborhood')
+    parser.add_argument('--batch-size', type=int, default=64, help='Targets scored per kernel call')
+    parser.add_argument('--row-group-size', type=int, default=5000, help='Rows per Parquet row group')
+    parser.add_argument('--limit', type=int, help='Export only the first N markets')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    fmt = args.format or os.path.splitext(args.output)[1].lstrip('.').lower()
+    if fmt not in EXPORT_FORMATS:
+        parser.error(f"cannot infer the format from '{args.output}'; pass --format")
+
+    from .market_engine import MarketAnalysisEngine
+    engine = MarketAnalysisEngine(result_cache_size=0)
+    targets = engine.city_data.index.unique()[:args.limit] if args.limit else None
+
+    # Write to a temporary file and rename, so readers never see a partial export
+    partial = f"{args.output}.partial"
+    start, written = time.perf_counter(), 0
+    with open(partial, 'wb') as f:
+        for piece in iter_export(engine, fmt, None if args.national else args.radius, args.n_similar, args.preset,
+                                 args.batch_size, args.row_group_size, targets):
+            f.write(piece)
+            written += len(piece)
+    os.replace(partial, args.output)
+    print(f"Wrote {written / 2**20:.1f} MiB to {args.output} in {time.perf_counter() - start:.1f}s "
+          f"(data version {engine.data.version})", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
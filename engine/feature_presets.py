@@ -0,0 +1,62 @@
+"""
+Scaled feature matrices for the named feature-weight presets.
+
+Custom feature weights are applied per request: the cities within the radius
+are imputed, standardized and weighted on every call. For the presets in
+config.constants.FEATURE_WEIGHT_PRESETS that work is done once per data
+version instead, over all cities, so a preset request only slices the rows
+inside the radius out of a ready matrix. Each matrix also gets a
+NationalIndex for nationwide searches.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Mapping
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from config.schema import FEATURE_COLUMNS
+from .national_index import NationalIndex
+
+@dataclass(frozen=True)
+class PresetMatrices:
+    """Per-preset weighted, standardized feature matrices in city_data row order."""
+    medians: pd.Series
+    matrices: Dict[str, np.ndarray]
+    indexes: Dict[str, NationalIndex] = field(default_factory=dict)
+
+    def __contains__(self, preset: str) -> bool:
+        return preset in self.matrices
+
+    @property
+    def nbytes(self) -> int:
+        return sum(matrix.nbytes for matrix in self.matrices.values())
+
+def preset_weight_vector(weights: Mapping[str, float]) -> np.ndarray:
+    """Weights in FEATURE_COLUMNS order; unlisted features get 1."""
+    return np.array([weights.get(feature, 1) for feature in FEATURE_COLUMNS], dtype=np.float32)
+
+def build_preset_matrices(city_data: pd.DataFrame, presets: Mapping[str, Dict],
+                          index_components: int = 0, index_oversample: int = 16) -> PresetMatrices:
+    """
+    Impute, standardize and weight the city features once per preset.
+
+    Args:
+        city_data: City frame indexed by city_state
+        presets: Preset name -> {'weights': {feature: weight}, ...}
+        index_components: PCA dimensions for the national indexes (0 = exact)
+        index_oversample: Candidates per neighbor re-ranked when using PCA
+
+    Returns:
+        PresetMatrices with the national feature medians used for imputation
+    """
+    features = city_data[FEATURE_COLUMNS]
+    medians = features.median().fillna(0)
+    scaled = StandardScaler().fit_transform(features.fillna(medians)).astype(np.float32)
+    matrices, indexes = {}, {}
+    for name, preset in presets.items():
+        matrix = scaled * preset_weight_vector(preset.get('weights', {}))
+        matrix.setflags(write=False)
+        matrices[name] = matrix
+        indexes[name] = NationalIndex(matrix, index_components, index_oversample)
+    return PresetMatrices(medians, matrices, indexes)
@@ -1,186 +1,501 @@
-from typing import Tuple, List
+from typing import Iterable, Iterator, Tuple, List, Optional, Set
 import logging
+import threading
 import numpy as np
 import pandas as pd
 from sklearn.preprocessing import StandardScaler
 from sklearn.impute import SimpleImputer
 from sklearn.neighbors import NearestNeighbors
 from .opportunity_engine import OpportunityEngine
+from .city_index import CityIndex, CityNotFound
 
-from config.constants import MARKET_TAGS
-from config.settings import CITY_DATA_PATH, GA4_DATA_PATH
+from config.constants import MARKET_TAGS, FEATURE_WEIGHT_PRESETS
+from config.schema import FEATURE_COLUMNS, GA4_COLUMNS
+from config.settings import (
+    CITY_DATA_PATH, GA4_DATA_PATH, GA4_DELTA_DIR, DATA_RELOAD_INTERVAL, RESULT_CACHE_SIZE, RESULT_CACHE_TTL,
+    NATIONAL_INDEX_COMPONENTS, NATIONAL_INDEX_OVERSAMPLE, NATIONAL_DEFAULT_PRESET
+)
+from services.cache_service import CacheService
+from utils.metrics import span
+from utils.logging_utils import Lazy, frame_preview
+from utils.data_utils import frame_memory
+from .data_version import DataSource, DataVersion, ensure_reloader
 
 class MarketAnalysisEngine:
-    def __init__(self, city_data_path=CITY_DATA_PATH, ga4_data_path=GA4_DATA_PATH):
+    def __init__(self, city_data_path=CITY_DATA_PATH, ga4_data_path=GA4_DATA_PATH,
+                 ga4_delta_dir=GA4_DELTA_DIR, result_cache_size=RESULT_CACHE_SIZE,
+                 feature_presets=FEATURE_WEIGHT_PRESETS, index_components=NATIONAL_INDEX_COMPONENTS,
+                 data: Optional[DataVersion] = None):
 
         self.opportunity_engine = OpportunityEngine()
-        # Setting up logging
+        # Handlers and levels come from config.settings.LOGGING
         self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(logging.INFO)
-        if not self.logger.handlers:
-            handler = logging.StreamHandler()
-            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-            handler.setFormatter(formatter)
-            self.logger.addHandler(handler)
 
         self.logger.info("Initializing MarketAnalysisEngine")
         
-        # Loading and standardizing city data
-        self.city_data = pd.read_csv(city_data_path, low_memory=False)
-        self.standardize_city_names(self.city_data)
-        self.logger.info(f"Loaded city data. Shape: {self.city_data.shape}")
-        
-        # Loading and standardizing GA4 data
-        self.ga4_data = pd.read_csv(ga4_data_path, low_memory=False)
-        self.logger.info(f"GA4 data columns after loading: {self.ga4_data.columns.tolist()}")
-        self.logger.info(f"GA4 data sample:\n{self.ga4_data.head().to_string()}")
-        
-        self.standardize_city_names(self.ga4_data)
-        
-        # Investigate and handle the unique_sites column
-        if 'unique_sites' in self.ga4_data.columns:
-            self.logger.info(f"unique_sites column data types: {self.ga4_data['unique_sites'].dtype}")
-            self.logger.info(f"unique_sites sample values: {self.ga4_data['unique_sites'].head().tolist()}")
-            
-            # Try to convert to numeric first
-            self.ga4_data['unique_sites'] = pd.to_numeric(self.ga4_data['unique_sites'], errors='coerce')
-            
-            # Check for any non-numeric values
-            non_numeric = self.ga4_data['unique_sites'].isna().sum()
-            if non_numeric > 0:
-                self.logger.warning(f"Found {non_numeric} non-numeric values in unique_sites")
-            
-            # Fill NaN values with 0 and convert to int
-            self.ga4_data['unique_sites'] = self.ga4_data['unique_sites'].fillna(0).astype(int)
-            
-            self.logger.info(f"unique_sites value counts: {self.ga4_data['unique_sites'].value_counts().to_dict()}")
-        else:
-            self.logger.error("'unique_sites' column not found in GA4 data")
-            raise ValueError("'unique_sites' column is missing from GA4 data")
-        
-        self.logger.info(f"Loaded GA4 data. Shape: {self.ga4_data.shape}")
-        self.logger.info(f"GA4 data columns after processing: {self.ga4_data.columns.tolist()}")
-        
-        self.prepare_data()
+        # Loading city and GA4 data; columns, dtypes and city_state keys come from config/schema.py
+        self.data_source = DataSource(city_data_path, ga4_data_path, ga4_delta_dir, feature_presets,
+                                      index_components, NATIONAL_INDEX_OVERSAMPLE)
+        # A ready version (e.g. attached from shared memory by an atlas worker) skips loading
+        self._data = data if data is not None else self.data_source.load()
+        self.logger.info("Loaded city data. Shape: %s, memory: %.1f MiB",
+                         self.city_data.shape, frame_memory(self.city_data) / 2**20)
+        self.logger.info("Loaded GA4 data. Shape: %s, memory: %.1f MiB",
+                         self.ga4_data.shape, frame_memory(self.ga4_data) / 2**20)
+        self.logger.debug("GA4 data sample:\n%s", Lazy(frame_preview, self.ga4_data))
+        self.logger.info("Total cities in dataset: %d (data version %s)", len(self.city_data), self._data.version)
+        if self._data.presets:
+            self.logger.info("Built %d feature preset matrices: %.1f MiB",
+                             len(self._data.presets.matrices), self._data.presets.nbytes / 2**20)
 
-    def standardize_city_names(self, df):
-        if 'city' in df.columns and 'state_id' in df.columns:
-            df['city_state'] = df['city'] + ', ' + df['state_id']
-        elif 'city_state' in df.columns:
-            pass  # city_state column already exists
-        else:
-            self.logger.error("Required columns for city_state not found in dataframe")
-            raise ValueError("DataFrame must have 'city' and 'state_id' columns or a 'city_state' column")
-        
-        df['city_state'] = df['city_state'].str.lower().str.strip()
-        self.logger.info(f"Standardized city names. Sample: {df['city_state'].head().tolist()}")
+        # find_similar_cities results, tagged with the city_state keys they contain
+        self.result_cache = CacheService(max_size=result_cache_size, ttl=RESULT_CACHE_TTL)
+        self._swap_lock = threading.Lock()
 
-    def prepare_data(self):
-        # Set the standardized city_state as index for city_data
-        self.city_data.set_index('city_state', inplace=True)
-        self.logger.info(f"Total cities in dataset: {len(self.city_data)}")
-        
-        # Ensure GA4 data has a standardized city_state column
-        if 'city_state' not in self.ga4_data.columns:
-            self.logger.error("GA4 data does not have a city_state column")
-            raise ValueError("GA4 data must have a city_state column")
-        
-        self.logger.info(f"GA4 data columns before setting index: {self.ga4_data.columns.tolist()}")
-        self.ga4_data.set_index('city_state', inplace=True)
-        self.logger.info(f"GA4 data columns after setting index: {self.ga4_data.columns.tolist()}")
+    @property
+    def data(self) -> DataVersion:
+        """The data version currently served."""
+        return self._data
+
+    @property
+    def city_data(self) -> pd.DataFrame:
+        return self._data.city_data
+
+    @property
+    def ga4_data(self) -> pd.DataFrame:
+        return self._data.ga4_data
+
+    @property
+    def city_index(self) -> Optional[CityIndex]:
+        """Typeahead and "did you mean" index over the served version's cities."""
+        return self._data.city_index
+
+    def swap_data(self, version: DataVersion, changed_keys: Optional[Set[str]] = None):
+        """
+        Atomically serve a new data version and drop the cached results it affects.
+
+        Args:
+            version: The new data version
+            changed_keys: city_state keys whose data changed (None = all)
+        """
+        with self._swap_lock:
+            previous = self._data
+            self._data = version
+            if changed_keys is None:
+                self.result_cache.clear()
+                invalidated = 'all'
+            else:
+                invalidated = self.result_cache.invalidate_tags(changed_keys)
+        self.logger.info("Swapped data version %s -> %s (%s changed keys, %s cached results invalidated)",
+                         previous.version, version.version,
+                         'all' if changed_keys is None else len(changed_keys), invalidated)
+
+    def start_reloader(self, interval: float = DATA_RELOAD_INTERVAL):
+        """Start polling the data files in this process (no-op if already running or interval <= 0)."""
+        return ensure_reloader(self, self.data_source, interval)
+
+    def find_similar_cities(self, target_city, target_state, radius_miles=100, n_similar=15, feature_weights=None,
+                            preset=None):
+        """
+        Find the cities within radius_miles (or nationwide) most similar to the target.
+
+        Args:
+            target_city: Target city name
+            target_state: Target state abbreviation
+            radius_miles: Search radius around the target; None searches all cities
+                through the preset's national index
+            n_similar: Number of cities to return (including the target)
+            feature_weights: Custom per-feature weights; the cities in range are
+                standardized and weighted on every call
+            preset: Name of a FEATURE_WEIGHT_PRESETS entry, standardized over all
+                cities when the data loads. Ignored if feature_weights is given.
+                With neither, features are standardized within the radius.
+
+        Returns:
+            DataFrame of similar cities with GA4 metrics and opportunity scores
+
+        Raises:
+            CityNotFound: The target is not in the dataset (a ValueError, with suggestions)
+        """
+        target_city_state = f"{target_city}, {target_state}".lower().strip()
+        self.logger.info("Finding similar cities for %s", target_city_state)
+
+        # Use one data version for the whole request, even if a reload swaps in a new one meanwhile
+        data = self._data
+        preset = self._resolve_preset(data, radius_miles, feature_weights, preset)
+        cache_key = self._cache_key(target_city_state, radius_miles, n_similar, feature_weights, preset)
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            self.logger.info("Using cached similar cities for %s", target_city_state)
+            return cached.copy()
+
+        similar_cities = self._find_similar_cities(data, target_city_state, radius_miles, n_similar,
+                                                   feature_weights, preset)
+        self._cache_result(data, cache_key, similar_cities)
+        return similar_cities
+
+    def sweep_similar_cities(self, target_city, target_state, radii, n_similar=15, feature_weights=None,
+                             preset=None):
+        """
+        Similar cities for several radii around the same target in one call.
 
-    def find_similar_cities(self, target_city, target_state, radius_miles=100, n_similar=15, feature_weights=None):
+        Distances to every city are computed once, for the largest radius, and
+        the candidates sorted by distance so each radius is a prefix of that
+        list. With a preset, feature distances to the target are also computed
+        once; without one, each radius still standardizes its own neighborhood,
+        exactly like find_similar_cities. Results share find_similar_cities'
+        cache, so radii already served are reused and the rest are cached.
+        A radius whose neighborhood cannot be built (a ValueError, e.g. a
+        feature no city within it has) fails on its own; the other radii are
+        still returned.
+
+        Args:
+            target_city: Target city name
+            target_state: Target state abbreviation
+            radii: Radii in miles
+            n_similar: Number of cities per radius (including the target)
+            feature_weights: Custom per-feature weights (see find_similar_cities)
+            preset: Feature preset name (see find_similar_cities)
+
+        Returns:
+            Dictionary of radius -> similar cities DataFrame, or the ValueError that failed
+            that radius, in ascending radius order
+        """
         target_city_state = f"{target_city}, {target_state}".lower().strip()
-        self.logger.info(f"Finding similar cities for {target_city_state}")
+        radii = sorted({int(radius) for radius in radii})
+        if not radii:
+            raise ValueError("At least one radius is required")
+        self.logger.info("Sweeping radii %s for %s", radii, target_city_state)
 
-        if target_city_state not in self.city_data.index:
-            self.logger.error(f"Target city '{target_city_state}' not found in the dataset")
-            raise ValueError(f"Target city '{target_city_state}' not found in the dataset")
+        data = self._data
+        preset = self._resolve_preset(data, radii[-1], feature_weights, preset)
+        results, missing = {}, []
+        for radius in radii:
+            cached = self.result_cache.get(self._cache_key(target_city_state, radius, n_similar, feature_weights, preset))
+            if cached is not None:
+                results[radius] = cached.copy()
+            else:
+                missing.append(radius)
 
-        nearby_cities = self.filter_cities_by_distance(target_city_state, radius_miles)
-        self.logger.info(f"Cities within {radius_miles} miles: {len(nearby_cities)}")
+        if missing:
+            if target_city_state not in data.city_data.index:
+                raise self._city_not_found(data, target_city_state)
 
-        features = [
-            'population', 'population_proper', 'density', 'incorporated', 'age_median',
-            'age_over_65', 'family_dual_income', 'income_household_median', 'income_household_six_figure',
-            'home_ownership', 'housing_units', 'home_value', 'rent_median', 'education_college_or_above',
-            'race_white', 'race_black', 'hispanic', 'income_individual_median', 'rent_burden', 'poverty'
-        ]
+            with span('sweep_distances'):
+                target_position = data.city_data.index.get_loc(target_city_state)
+                coords = data.city_data[['lat', 'lng']].values
+                geo_distances = self.haversine_distances(coords, coords[target_position])
+                within = np.flatnonzero(geo_distances <= missing[-1])
+                order = within[np.argsort(geo_distances[within], kind='stable')]
+                sorted_distances = geo_distances[order]
+                if preset:
+                    matrix = data.presets.matrices[preset]
+                    # float64 like the kNN distances find_similar_cities reports
+                    feature_distances = np.linalg.norm(matrix[order] - matrix[target_position], axis=1).astype(np.float64)
 
-        nearby_cities = self.clean_data(nearby_cities, features)
-        self.logger.info(f"Shape of nearby_cities after cleaning: {nearby_cities.shape}")
+            neighborhoods, built = [], []
+            for radius in missing:
+                count = int(np.searchsorted(sorted_distances, radius, side='right'))
+                candidates = order[:count]
+                try:
+                    if preset:
+                        distances = feature_distances[:count]
+                    else:
+                        nearby_cities = self.clean_data(data.city_data.iloc[candidates].copy(), FEATURE_COLUMNS)
+                        weighted_data = self._weighted_features(nearby_cities, feature_weights)
+                        target_row = weighted_data[nearby_cities.index.get_loc(target_city_state)]
+                        distances = np.linalg.norm(weighted_data - target_row, axis=1)
 
-        scaler = StandardScaler()
-        normalized_data = scaler.fit_transform(nearby_cities[features])
+                    with span('knn'):
+                        nearest = np.argsort(distances, kind='stable')[:min(n_similar, count)]
+                    if preset:
+                        neighbors = self._preset_rows(data, candidates[nearest])
+                    else:
+                        neighbors = nearby_cities.iloc[nearest].copy()
+                    neighbors['distance_to_target'] = sorted_distances[:count][nearest]
+                    neighborhoods.append(self._merge_neighbors(data, target_city_state, neighbors, distances[nearest]))
+                except ValueError as e:
+                    self.logger.warning("Sweep of %s failed at %d miles: %s", target_city_state, radius, e)
+                    results[radius] = e
+                    continue
+                built.append(radius)
 
-        # Use the provided feature weights or default to equal weights
-        if feature_weights is None:
-            feature_weights = {feature: 1 for feature in features}
-        
-        # Ensure all features have a weight (use 1 as default if not specified)
-        weights = np.array([feature_weights.get(feature, 1) for feature in features])
-        
-        self.logger.info(f"Using feature weights: {feature_weights}")
-        
-        weighted_data = normalized_data * weights.reshape(1, -1)  # Reshape weights to match normalized_data shape
-        
-        self.logger.info(f"Shape of weighted data: {weighted_data.shape}")
+            # Every radius goes through the scoring kernel in a single batch
+            with span('opportunity_score'):
+                scored = self.opportunity_engine.calculate_opportunity_scores(
+                    neighborhoods, [target_city_state] * len(neighborhoods)
+                ) if neighborhoods else []
+            for radius, similar_cities in zip(built, scored):
+                similar_cities = self._sort_scored(target_city_state, similar_cities)
+                self._cache_result(data, self._cache_key(target_city_state, radius, n_similar, feature_weights, preset),
+                                   similar_cities)
+                results[radius] = similar_cities
+
+        return {radius: results[radius] for radius in radii}
+
+    def rescore_similar_cities(self, target_city, target_state, weights, radius_miles=100, n_similar=15,
+                               feature_weights=None, preset=None):
+        """
+        find_similar_cities' result with the opportunity score re-weighted.
+
+        The score components are kept in every result set (and its cache
+        entry), so only the weighted sum, normalization and categories are
+        recomputed; the similarity search runs only on a cache miss.
+
+        Args:
+            weights: Opportunity score component weights overriding the defaults
+                (see OpportunityEngine.resolve_weights)
+            Other arguments as for find_similar_cities
 
-        nn = NearestNeighbors(n_neighbors=min(n_similar, len(nearby_cities)), metric='euclidean')
-        nn.fit(weighted_data)
+        Returns:
+            Similar cities sorted by the re-weighted opportunity score
+        """
+        similar_cities = self.find_similar_cities(target_city, target_state, radius_miles=radius_miles,
+                                                  n_similar=n_similar, feature_weights=feature_weights, preset=preset)
+        with span('rescore'):
+            similar_cities = self.opportunity_engine.rescore(similar_cities, weights)
+        return similar_cities.sort_values('opportunity_score', ascending=False)
 
-        target_index = nearby_cities.index.get_loc(target_city_state)
-        distances, indices = nn.kneighbors(weighted_data[target_index].reshape(1, -1))
+    def iter_market_scores(self, radius_miles=100, n_similar=15, preset=None, batch_size=64,
+                           targets: Optional[Iterable[str]] = None) -> Iterator[pd.DataFrame]:
+        """
+        Score every market within its own neighborhood, a batch at a time.
 
-        similar_cities = nearby_cities.iloc[indices[0]].copy()
+        Each market is the target of a similarity search with the given
+        radius/preset, and its row from that scored neighborhood is kept, so
+        its scores match what the results page shows for it. Neighborhoods are
+        scored batch_size at a time with one kernel call and dropped once their
+        rows are yielded, so memory stays bounded by the batch. The whole run
+        uses the data version current when it starts and bypasses the result
+        cache.
 
-        self.logger.info(f"Similar cities before ensuring target city: {similar_cities.index.tolist()}")
+        Args:
+            radius_miles: Search radius; None for nationwide neighborhoods
+            n_similar: Markets per neighborhood (including the target)
+            preset: Feature preset name (see find_similar_cities)
+            batch_size: Targets scored per kernel call
+            targets: city_state keys to score (default: every city)
+
+        Returns:
+            Iterator of DataFrames with up to batch_size rows indexed by
+            city_state, with the similar-cities columns plus neighborhood_size
+            and data_version
+
+        Raises:
+            ValueError: For an unknown preset
+        """
+        data = self._data
+        # Resolved here rather than in the generator, so a bad preset fails before the first batch
+        preset = self._resolve_preset(data, radius_miles, None, preset)
+        keys = data.city_data.index.unique() if targets is None else pd.Index(list(targets))
+        self.logger.info("Scoring %d markets (data version %s, radius %s, preset %s)",
+                         len(keys), data.version, radius_miles, preset)
+        return self._iter_market_scores(data, keys, radius_miles, n_similar, preset, batch_size)
+
+    def _iter_market_scores(self, data, keys, radius_miles, n_similar, preset, batch_size):
+        for start in range(0, len(keys), batch_size):
+            batch, neighborhoods = [], []
+            for key in keys[start:start + batch_size]:
+                if key not in data.city_data.index:
+                    self.logger.warning("Skipping unknown market '%s'", key)
+                    continue
+                try:
+                    neighborhoods.append(self._neighborhood(data, key, radius_miles, n_similar, None, preset))
+                except ValueError as e:
+                    self.logger.warning("Skipping market '%s': %s", key, e)
+                    continue
+                batch.append(key)
+            if not batch:
+                continue
+
+            with span('opportunity_score'):
+                scored = self.opportunity_engine.calculate_opportunity_scores(neighborhoods, batch)
+            rows = []
+            for key, similar_cities in zip(batch, scored):
+                row = similar_cities[similar_cities.index == key].iloc[:1]
+                rows.append(row.assign(neighborhood_size=len(similar_cities), data_version=data.version))
+            yield pd.concat(rows)
+
+    @staticmethod
+    def _resolve_preset(data, radius_miles, feature_weights, preset):
+        if radius_miles is None:
+            if feature_weights:
+                raise ValueError("Nationwide search supports feature presets only, not custom weights")
+            preset = preset or NATIONAL_DEFAULT_PRESET
+        if feature_weights:
+            return None
+        if preset and (data.presets is None or preset not in data.presets):
+            raise ValueError(f"Unknown feature preset '{preset}'")
+        return preset
+
+    @staticmethod
+    def _cache_key(target_city_state, radius_miles, n_similar, feature_weights, preset):
+        return (target_city_state, radius_miles, n_similar,
+                tuple(sorted(feature_weights.items())) if feature_weights else preset)
+
+    def _cache_result(self, data, cache_key, similar_cities):
+        # Only cache results computed from the version still being served
+        with self._swap_lock:
+            if self._data is data:
+                self.result_cache.set(cache_key, similar_cities.copy(), tags=similar_cities.index)
+
+    def _city_not_found(self, data, target_city_state) -> CityNotFound:
+        suggestions = data.city_index.suggest(target_city_state) if data.city_index is not None else []
+        self.logger.error("Target city '%s' not found in the dataset; closest: %s", target_city_state,
+                          [suggestion['key'] for suggestion in suggestions])
+        return CityNotFound(target_city_state, suggestions)
+
+    def _find_similar_cities(self, data, target_city_state, radius_miles, n_similar, feature_weights, preset):
+        if target_city_state not in data.city_data.index:
+            raise self._city_not_found(data, target_city_state)
+
+        similar_cities = self._neighborhood(data, target_city_state, radius_miles, n_similar, feature_weights, preset)
+        with span('opportunity_score'):
+            similar_cities, std_ga4_columns = self.opportunity_engine.calculate_opportunity_score(
+                similar_cities, target_city_state
+            )
+        return self._sort_scored(target_city_state, similar_cities)
+
+    def _neighborhood(self, data, target_city_state, radius_miles, n_similar, feature_weights, preset):
+        """The nearest cities with their distances and GA4 metrics, ready to be scored."""
+        if radius_miles is None:
+            similar_cities, distances = self._nearest_nationwide(data, target_city_state, n_similar, preset)
+        else:
+            similar_cities, distances = self._nearest_in_radius(data, target_city_state, radius_miles, n_similar,
+                                                                feature_weights, preset)
+
+        self.logger.debug("Similar cities before ensuring target city: %s", Lazy(similar_cities.index.tolist))
 
         similar_cities['distance_to_target'] = self.haversine_distances(
             similar_cities[['lat', 'lng']].values,
-            self.city_data.loc[target_city_state, ['lat', 'lng']].values.flatten()
+            data.city_data.loc[target_city_state, ['lat', 'lng']].values.flatten()
         )
-        similar_cities['similarity_score'] = np.where(similar_cities.index == target_city_state, 0, distances[0])
+        return self._merge_neighbors(data, target_city_state, similar_cities, distances)
 
-        ga4_columns = ['users_org', 'cvr_org', 'leads_org', 'users_paid', 'cvr_paid', 'leads_paid', 'unique_sites']
-        self.logger.info(f"GA4 data shape before merge: {self.ga4_data.shape}")
-        self.logger.info(f"Similar cities shape before merge: {similar_cities.shape}")
+    def _merge_neighbors(self, data, target_city_state, similar_cities, distances):
+        """Add the similarity score and the GA4 metrics to the nearest cities."""
+        similar_cities['similarity_score'] = np.where(similar_cities.index == target_city_state, 0, distances)
+
+        ga4_columns = GA4_COLUMNS
+        self.logger.debug("GA4 data shape before merge: %s", data.ga4_data.shape)
+        self.logger.debug("Similar cities shape before merge: %s", similar_cities.shape)
         
-        self.logger.info(f"Sample of GA4 data:\n{self.ga4_data.head().to_string()}")
-        self.logger.info(f"Sample of similar cities before merge:\n{similar_cities.head().to_string()}")
+        self.logger.debug("Sample of GA4 data:\n%s", Lazy(frame_preview, data.ga4_data))
+        self.logger.debug("Sample of similar cities before merge:\n%s", Lazy(frame_preview, similar_cities))
         
-        similar_cities = similar_cities.merge(self.ga4_data[ga4_columns], left_index=True, right_index=True, how='left')
-        self.logger.info(f"Similar cities shape after merge: {similar_cities.shape}")
+        with span('ga4_merge'):
+            similar_cities = similar_cities.merge(data.ga4_data[ga4_columns], left_index=True, right_index=True, how='left')
+        self.logger.debug("Similar cities shape after merge: %s", similar_cities.shape)
         
-        for col in ga4_columns:
-            nan_count = similar_cities[col].isna().sum()
-            self.logger.info(f"NaN count in {col} after merge: {nan_count}")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            for col in ga4_columns:
+                nan_count = similar_cities[col].isna().sum()
+                self.logger.debug("NaN count in %s after merge: %d", col, nan_count)
         
-        self.logger.info(f"Columns in similar_cities after merge: {similar_cities.columns.tolist()}")
+        self.logger.debug("Columns in similar_cities after merge: %s", Lazy(similar_cities.columns.tolist))
         
-        self.logger.info(f"Sample of similar cities after merge:\n{similar_cities.head().to_string()}")
+        self.logger.debug("Sample of similar cities after merge:\n%s", Lazy(frame_preview, similar_cities))
+        return similar_cities
 
-        similar_cities, std_ga4_columns = self.opportunity_engine.calculate_opportunity_score(
-            similar_cities, target_city_state
-        )
+    def _sort_scored(self, target_city_state, similar_cities):
         similar_cities = similar_cities.sort_values('opportunity_score', ascending=False)
 
-        self.logger.info(f"Final similar cities: {similar_cities.index.tolist()}")
-        self.logger.info(f"Is target city in results: {target_city_state in similar_cities.index}")
+        self.logger.info("Found %d similar cities for %s", len(similar_cities), target_city_state)
+        self.logger.debug("Final similar cities: %s", Lazy(similar_cities.index.tolist))
+        self.logger.debug("Is target city in results: %s", target_city_state in similar_cities.index)
         return similar_cities
 
+    def _nearest_in_radius(self, data, target_city_state, radius_miles, n_similar, feature_weights, preset):
+        """kNN among the cities within radius_miles; returns (neighbors, feature-space distances)."""
+        features = FEATURE_COLUMNS
+
+        if preset:
+            # Rows of the preset matrix line up with city_data, so the radius filter is all that's left
+            with span('filter_cities_by_distance'):
+                positions = np.flatnonzero(self.nearby_mask(target_city_state, radius_miles, data.city_data))
+            self.logger.info("Cities within %s miles: %d", radius_miles, len(positions))
+            weighted_data = data.presets.matrices[preset][positions]
+            target_index = int(np.searchsorted(positions, data.city_data.index.get_loc(target_city_state)))
+            self.logger.debug("Using feature preset: %s", preset)
+        else:
+            with span('filter_cities_by_distance'):
+                nearby_cities = self.filter_cities_by_distance(target_city_state, radius_miles, data.city_data)
+            self.logger.info("Cities within %s miles: %d", radius_miles, len(nearby_cities))
+
+            with span('clean_data'):
+                nearby_cities = self.clean_data(nearby_cities, features)
+            self.logger.debug("Shape of nearby_cities after cleaning: %s", nearby_cities.shape)
+
+            weighted_data = self._weighted_features(nearby_cities, feature_weights)
+            target_index = nearby_cities.index.get_loc(target_city_state)
+
+        self.logger.debug("Shape of weighted data: %s", weighted_data.shape)
+
+        with span('knn'):
+            nn = NearestNeighbors(n_neighbors=min(n_similar, len(weighted_data)), metric='euclidean')
+            nn.fit(weighted_data)
+            distances, indices = nn.kneighbors(weighted_data[target_index].reshape(1, -1))
+
+        if preset:
+            # Only the selected rows need their missing features imputed
+            return self._preset_rows(data, positions[indices[0]]), distances[0]
+        return nearby_cities.iloc[indices[0]].copy(), distances[0]
+
+    def _nearest_nationwide(self, data, target_city_state, n_similar, preset):
+        """kNN over all cities from the preset's national index; returns (neighbors, feature-space distances)."""
+        index = data.presets.indexes[preset]
+        target_position = data.city_data.index.get_loc(target_city_state)
+        with span('national_index'):
+            distances, positions = index.query(target_position, n_similar)
+        neighbors = self._preset_rows(data, positions)
+        self.logger.debug("Nationwide neighbors from %s index (preset %s)",
+                          'exact' if index.exact else 'PCA', preset)
+        return neighbors, distances
+
+    @staticmethod
+    def _preset_rows(data, positions):
+        """City rows at the given positions with missing features imputed as in the preset matrices."""
+        rows = data.city_data.iloc[positions].copy()
+        # Only touch the columns that have gaps; filling all of them costs more than the search
+        gaps = np.isnan(rows[FEATURE_COLUMNS].to_numpy(dtype=np.float64)).any(axis=0)
+        columns = [column for column, gap in zip(FEATURE_COLUMNS, gaps) if gap]
+        if len(columns):
+            rows[columns] = rows[columns].fillna(data.presets.medians[columns])
+        return rows
+
+    def _weighted_features(self, nearby_cities, feature_weights):
+        """Standardize the features within the neighborhood and apply the weights."""
+        features = FEATURE_COLUMNS
+        with span('scale_features'):
+            scaler = StandardScaler()
+            normalized_data = scaler.fit_transform(nearby_cities[features])
+
+        # Use the provided feature weights or default to equal weights
+        if feature_weights is None:
+            feature_weights = {feature: 1 for feature in features}
+
+        # Ensure all features have a weight (use 1 as default if not specified)
+        weights = np.array([feature_weights.get(feature, 1) for feature in features])
+
+        self.logger.debug("Using feature weights: %s", feature_weights)
+
+        return normalized_data * weights.reshape(1, -1)  # Reshape weights to match normalized_data shape
+
     def clean_data(self, df, features):
-        for feature in features:
-            df[feature] = pd.to_numeric(df[feature], errors='coerce')
+        # Features are already numeric (coerced at load); fill gaps with the neighborhood median
         imputer = SimpleImputer(strategy='median')
         df[features] = imputer.fit_transform(df[features])
         return df
 
-    def filter_cities_by_distance(self, target_city_state, radius_miles):
-        target_lat, target_lon = self.city_data.loc[target_city_state, ['lat', 'lng']]
-        distances = self.haversine_distances(self.city_data[['lat', 'lng']].values, np.array([target_lat, target_lon]))
-        nearby_mask = distances <= radius_miles
-        return self.city_data[nearby_mask].copy()
+    def nearby_mask(self, target_city_state, radius_miles, city_data=None):
+        city_data = self.city_data if city_data is None else city_data
+        target_lat, target_lon = city_data.loc[target_city_state, ['lat', 'lng']]
+        distances = self.haversine_distances(city_data[['lat', 'lng']].values, np.array([target_lat, target_lon]))
+        return distances <= radius_miles
+
+    def filter_cities_by_distance(self, target_city_state, radius_miles, city_data=None):
+        city_data = self.city_data if city_data is None else city_data
+        return city_data[self.nearby_mask(target_city_state, radius_miles, city_data)].copy()
 
     @staticmethod
     def haversine_distances(points, target):
@@ -0,0 +1,68 @@
+"""
+Nationwide nearest-neighbor index over a preset's feature matrix.
+
+The radius search only ever compares a few hundred cities; a nationwide
+search compares the target with every city. NationalIndex answers it from a
+KD-tree built once per data version. With n_components set, the tree is
+built over a PCA projection instead (fewer dimensions, faster queries) and
+the candidates it returns are re-ranked by exact distance in the full
+feature space, so the only approximation is which candidates are considered.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+from sklearn.decomposition import PCA
+from sklearn.neighbors import KDTree
+
+class NationalIndex:
+    """
+    k-nearest-neighbor queries over the rows of a feature matrix.
+
+    Args:
+        matrix: (n_cities, n_features) weighted, standardized features
+        n_components: PCA dimensions to index (0 = index all features exactly)
+        oversample: With PCA, candidates fetched per requested neighbor before re-ranking
+        leaf_size: KD-tree leaf size
+    """
+
+    def __init__(self, matrix: np.ndarray, n_components: int = 0, oversample: int = 16, leaf_size: int = 40):
+        self.matrix = matrix
+        self.oversample = max(1, oversample)
+        self.pca: Optional[PCA] = None
+        indexed = matrix
+        if 0 < n_components < matrix.shape[1]:
+            self.pca = PCA(n_components=n_components, random_state=0).fit(matrix)
+            indexed = self.pca.transform(matrix).astype(np.float32)
+        self._indexed = indexed
+        self.tree = KDTree(indexed, leaf_size=leaf_size)
+
+    @property
+    def exact(self) -> bool:
+        return self.pca is None
+
+    def query(self, position: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Nearest rows to the row at `position` (which is itself included).
+
+        Returns:
+            (distances, positions), nearest first; distances are in the full feature space
+        """
+        k = min(k, len(self.matrix))
+        if self.pca is None:
+            distances, positions = self.tree.query(self._indexed[position:position + 1], k=k)
+            return distances[0], positions[0]
+
+        candidates = min(k * self.oversample, len(self.matrix))
+        _, positions = self.tree.query(self._indexed[position:position + 1], k=candidates)
+        positions = positions[0]
+        distances = np.linalg.norm(self.matrix[positions] - self.matrix[position], axis=1)
+        order = np.argsort(distances, kind='stable')[:k]
+        return distances[order], positions[order]
+
+def brute_force_neighbors(matrix: np.ndarray, position: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Exact k nearest rows by scanning the whole matrix (reference for recall checks)."""
+    distances = np.linalg.norm(matrix - matrix[position], axis=1)
+    k = min(k, len(matrix))
+    positions = np.argpartition(distances, k - 1)[:k]
+    order = np.argsort(distances[positions], kind='stable')
+    return distances[positions][order], positions[order]
@@ -1,16 +1,51 @@
 import logging
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import StandardScaler
-from typing import Tuple, List, Dict
+from typing import Tuple, List, Dict, Mapping, Optional
 
-from config.constants import MARKET_TAGS
+from config.constants import MARKET_TAGS, OPPORTUNITY_SCORE_WEIGHTS
+from .scoring_kernel import (
+    CATEGORY_LABELS, MARKET_METRIC_COLUMNS, RESCORE_COLUMNS, SCORE_COMPONENTS, SCORE_GA4_COLUMNS, combine_scores,
+    score_markets
+)
+from utils.logging_utils import Lazy
 
 logger = logging.getLogger(__name__)
 
+# Columns added by the scoring kernel after the std_* GA4 columns, in their historical order
+SCORE_COLUMNS = ['performance_diff'] + MARKET_METRIC_COLUMNS + [
+    'norm_similarity', 'raw_opportunity_score', 'normalized_log_housing', 'opportunity_score'
+]
+
+class _Columns(Mapping):
+    """Column lookup for tag conditions: whole columns as NumPy arrays instead of one row at a time."""
+
+    def __init__(self, df: pd.DataFrame, block: pd.DataFrame):
+        self._df = df
+        self._block = block
+        self.rows = len(df)
+
+    def __getitem__(self, column):
+        source = self._block if column in self._block.columns else self._df
+        return source[column].to_numpy()
+
+    def __iter__(self):
+        return iter(list(self._df.columns) + list(self._block.columns))
+
+    def __len__(self):
+        return len(self._df.columns) + len(self._block.columns)
+
+    def frame(self) -> pd.DataFrame:
+        return pd.concat([self._df, self._block], axis=1)
+
 class OpportunityEngine:
-    def __init__(self):
+    def __init__(self, weights: Optional[Mapping[str, float]] = None):
+        """
+        Args:
+            weights: Opportunity score component weights (default OPPORTUNITY_SCORE_WEIGHTS)
+        """
         self.logger = logging.getLogger(__name__)
+        self.weights = dict(OPPORTUNITY_SCORE_WEIGHTS if weights is None else weights)
     
     def calculate_opportunity_score(self, df: pd.DataFrame, target_city_state: str) -> Tuple[pd.DataFrame, List[str]]:
         """
@@ -25,129 +60,145 @@ class OpportunityEngine:
             - DataFrame with opportunity scores and categories added
             - List of standardized GA4 column names
         """
-        self.logger.info(f"Calculating opportunity score. DataFrame shape: {df.shape}")
-        self.logger.info(f"Columns in DataFrame: {df.columns.tolist()}")
+        self.logger.debug("Calculating opportunity score. DataFrame shape: %s", df.shape)
+        self.logger.debug("Columns in DataFrame: %s", Lazy(df.columns.tolist))
         
-        # Validate required columns
+        self._fill_required_columns(df)
+        frame, = self._score_frames([df], [target_city_state])
+        self.logger.debug("Opportunity score calculation and tag assignment completed successfully")
+        return frame, [col for col in frame.columns if col.startswith('std_')]
+
+    def calculate_opportunity_scores(self, frames: List[pd.DataFrame], target_city_states: List[str]) -> List[pd.DataFrame]:
+        """
+        Score several neighborhoods in one kernel call.
+
+        Args:
+            frames: One market DataFrame per neighborhood (sizes may differ)
+            target_city_states: The target market of each neighborhood
+
+        Returns:
+            The frames with opportunity scores and categories added, in order
+        """
+        for df in frames:
+            self._fill_required_columns(df)
+        return self._score_frames(frames, target_city_states)
+
+    def _fill_required_columns(self, df: pd.DataFrame):
+        """Validate required columns, defaulting missing ones to 1."""
         required_columns = ['unique_sites', 'housing_units', 'users_org', 'users_paid']
         missing_columns = [col for col in required_columns if col not in df.columns]
         if missing_columns:
-            self.logger.warning(f"Missing columns: {missing_columns}")
+            self.logger.warning("Missing columns: %s", missing_columns)
             for col in missing_columns:
                 df[col] = 1  # Default value
-        
-        # Calculate GA4 metrics
-        ga4_metrics = self._calculate_ga4_metrics(df, target_city_state)
-        df = df.join(ga4_metrics)
-        
-        # Calculate market metrics
-        market_metrics = self._calculate_market_metrics(df)
-        df = df.join(market_metrics)
-        
-        # Calculate final scores
-        df = self._calculate_final_scores(df)
-        
-        # Now assign tags
-        df['tags'] = df.apply(self._assign_tags, axis=1)
-        
-        self.logger.info("Opportunity score calculation and tag assignment completed successfully")
-        return df, [col for col in df.columns if col.startswith('std_')]
 
-    def _calculate_ga4_metrics(self, df: pd.DataFrame, target_city_state: str) -> pd.DataFrame:
-        """Calculate standardized GA4 metrics and performance difference."""
-        ga4_columns = ['users_org', 'cvr_org', 'leads_org', 'users_paid', 'cvr_paid', 'leads_paid']
-        scaler = StandardScaler()
-        
-        # Create standardized metrics
-        metrics_df = pd.DataFrame(index=df.index)
-        std_ga4_columns = [f'std_{col}' for col in ga4_columns]
-        metrics_df[std_ga4_columns] = scaler.fit_transform(df[ga4_columns].fillna(df[ga4_columns].mean()))
-        
-        # Calculate performance difference
-        avg_performance = metrics_df[metrics_df.index != target_city_state][std_ga4_columns].mean()
-        metrics_df['performance_diff'] = (metrics_df[std_ga4_columns] - avg_performance).mean(axis=1)
-        
-        return metrics_df
+    def _score_frames(self, frames: List[pd.DataFrame], target_city_states: List[str]) -> List[pd.DataFrame]:
+        """Pad the neighborhoods into (b, n) arrays, run the scoring kernel and attach its columns."""
+        sizes = [len(df) for df in frames]
+        width = max(sizes, default=0)
+        valid = np.arange(width) < np.array(sizes)[:, None]
 
-    def _calculate_market_metrics(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Calculate various market metrics used in opportunity score."""
-        metrics_df = pd.DataFrame(index=df.index)
-        
-        # Network penetration
-        metrics_df['network_penetration'] = (df['unique_sites'] / df['housing_units']) * 100
-        metrics_df['avg_network_penetration'] = metrics_df['network_penetration'].mean()
-        
-        # Engagement diversity
-        total_users = df['users_org'] + df['users_paid'] + 1  # Add 1 to avoid division by zero
-        metrics_df['engagement_diversity'] = df['unique_sites'] / total_users
-        
-        # Growth potential
-        avg_penetration = metrics_df['network_penetration'].mean()
-        metrics_df['growth_potential'] = (avg_penetration - metrics_df['network_penetration']) / avg_penetration
-        
-        # Performance efficiency
-        total_leads = df['leads_org'] + df['leads_paid']
-        metrics_df['performance_efficiency'] = total_leads / (df['unique_sites'] + 1)
-        
-        # Saturation risk
-        metrics_df['log_unique_sites'] = np.log1p(df['unique_sites'])
-        metrics_df['log_housing_units'] = np.log1p(df['housing_units'])
-        metrics_df['saturation_risk'] = 1 - (1 / (1 + np.exp(-(metrics_df['log_unique_sites'] - metrics_df['log_housing_units']))))
-        
-        return metrics_df
-
-    def _calculate_final_scores(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Calculate final opportunity scores and categories."""
-        # Normalize similarity score if it exists
-        if 'similarity_score' in df.columns:
-            if df['similarity_score'].isna().all():
-                df['norm_similarity'] = 1
-            else:
-                df['norm_similarity'] = 1 - (
-                    (df['similarity_score'] - df['similarity_score'].min()) / 
-                    (df['similarity_score'].max() - df['similarity_score'].min())
-                )
-        else:
-            df['norm_similarity'] = 1
-        
-        # Calculate raw opportunity score
-        df['raw_opportunity_score'] = (
-            0.3 * df['norm_similarity'] +
-            0.2 * (1 - df['performance_diff']) +
-            0.1 * df['network_penetration'] +
-            0.1 * df['engagement_diversity'] +
-            0.1 * df['growth_potential'] +
-            0.1 * df['performance_efficiency'] +
-            0.1 * (1 - df['saturation_risk'])
-        )
-        
-        # Apply market size adjustment
-        df['normalized_log_housing'] = (df['log_housing_units'] - df['log_housing_units'].min()) / (
-            df['log_housing_units'].max() - df['log_housing_units'].min()
-        )
-        
-        # Calculate final opportunity score
-        df['opportunity_score'] = df['raw_opportunity_score'] * (1 + df['normalized_log_housing'])
-        
-        # Normalize final score
-        min_score = df['opportunity_score'].min()
-        max_score = df['opportunity_score'].max()
-        if min_score != max_score:
-            df['opportunity_score'] = (df['opportunity_score'] - min_score) / (max_score - min_score)
-        else:
-            self.logger.warning("All opportunity scores are the same. Setting to a constant value.")
-            df['opportunity_score'] = 1
-        
-        # Categorize scores
-        df['opportunity_category'] = pd.qcut(
-            df['opportunity_score'], 
-            q=3, 
-            labels=['Low', 'Average', 'High'],
-            duplicates='drop'
+        def stack(column: str) -> np.ndarray:
+            out = np.full((len(frames), width), np.nan)
+            for i, df in enumerate(frames):
+                out[i, :len(df)] = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+            return out
+
+        ga4 = np.full((len(frames), width, len(SCORE_GA4_COLUMNS)), np.nan)
+        is_target = np.zeros((len(frames), width), dtype=bool)
+        for i, (df, target) in enumerate(zip(frames, target_city_states)):
+            ga4[i, :len(df)] = df[SCORE_GA4_COLUMNS].to_numpy(dtype=np.float64, na_value=np.nan)
+            is_target[i, :len(df)] = df.index == target
+        has_similarity = all('similarity_score' in df.columns for df in frames)
+
+        scores = score_markets(
+            ga4, stack('unique_sites'), stack('housing_units'),
+            stack('similarity_score') if has_similarity else None,
+            is_target, None if valid.all() else valid, self.weights
         )
-        
+        return [self._attach_scores(df, scores, i) for i, df in enumerate(frames)]
+
+    def resolve_weights(self, overrides: Optional[Mapping[str, float]] = None) -> Dict[str, float]:
+        """
+        The engine's weights with caller overrides applied.
+
+        Raises:
+            ValueError: For unknown components, negative or non-numeric weights,
+                or if every weight ends up zero
+        """
+        weights = dict(self.weights)
+        for name, value in (overrides or {}).items():
+            if name not in SCORE_COMPONENTS:
+                raise ValueError(f"Unknown score component '{name}'")
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Weight for '{name}' must be a number")
+            if not np.isfinite(value) or value < 0:
+                raise ValueError(f"Weight for '{name}' must be a non-negative number")
+            weights[name] = value
+        if not any(weights.values()):
+            raise ValueError("At least one score component needs a positive weight")
+        return weights
+
+    def rescore(self, df: pd.DataFrame, weights: Optional[Mapping[str, float]] = None) -> pd.DataFrame:
+        """
+        Re-weight an already scored result set.
+
+        Reads the component columns calculate_opportunity_score added and
+        recomputes the raw score, the normalized score and the categories;
+        nothing else is recalculated, so this is linear in the number of markets.
+
+        Args:
+            df: Output of calculate_opportunity_score
+            weights: Component weight overrides (see resolve_weights)
+
+        Returns:
+            Copy of df with raw_opportunity_score, opportunity_score and opportunity_category replaced
+        """
+        weights = self.resolve_weights(weights)
+        components = {name: df[name].to_numpy(dtype=np.float64, na_value=np.nan) for name in RESCORE_COLUMNS}
+        scores = combine_scores(components, weights)
+        df = df.copy()
+        df['raw_opportunity_score'] = scores['raw_opportunity_score']
+        df['opportunity_score'] = scores['opportunity_score']
+        df['opportunity_category'] = pd.Categorical.from_codes(scores['category_codes'], categories=CATEGORY_LABELS,
+                                                               ordered=True)
         return df
 
+    def _attach_scores(self, df: pd.DataFrame, scores: Dict[str, np.ndarray], i: int) -> pd.DataFrame:
+        """Add the kernel output for neighborhood i to df, in the columns' historical order."""
+        n = len(df)
+        names = [f'std_{col}' for col in SCORE_GA4_COLUMNS]
+        arrays = [scores['std_ga4'][i, :n]]
+        for name in SCORE_COLUMNS:
+            names.append(name)
+            arrays.append(scores[name][i, :n, None])
+        # One float block instead of a column at a time
+        block = pd.DataFrame(np.concatenate(arrays, axis=1), index=df.index, columns=names)
+        category = pd.Series(pd.Categorical.from_codes(scores['category_codes'][i, :n], categories=CATEGORY_LABELS,
+                                                       ordered=True), index=df.index, name='opportunity_category')
+        if n and np.all(scores['opportunity_score'][i, :n] == 1):
+            self.logger.warning("All opportunity scores are the same. Setting to a constant value.")
+
+        overlap = df.columns.intersection(names + ['opportunity_category', 'tags'])
+        if len(overlap):
+            df = df.drop(columns=overlap)
+        tags = pd.Series(self._assign_tags_frame(_Columns(df, block)), index=df.index, name='tags', dtype=object)
+        return pd.concat([df, block, category, tags], axis=1)
+
+    def _assign_tags_frame(self, columns: '_Columns') -> List[List[str]]:
+        """Evaluate each tag condition over whole columns at once."""
+        masks = []
+        for tag, data in MARKET_TAGS.items():
+            try:
+                mask = np.broadcast_to(np.asarray(data['condition'](columns), dtype=bool), (columns.rows,))
+            except Exception:
+                # Conditions that only work on a single row
+                mask = columns.frame().apply(data['condition'], axis=1).to_numpy(dtype=bool)
+            masks.append((tag, mask))
+        return [[tag for tag, mask in masks if mask[row]] for row in range(columns.rows)]
+
     def _assign_tags(self, row: pd.Series) -> List[str]:
         """Assign market tags based on metrics."""
         return [tag for tag, data in MARKET_TAGS.items() if data['condition'](row)]
\ No newline at end of file
@@ -0,0 +1,203 @@
+"""
+Opportunity scoring on plain NumPy arrays.
+
+The functions here compute the same columns as the original pandas
+pipeline in OpportunityEngine (standardized GA4 metrics, market metrics,
+weighted score, min-max normalization and tercile categories) without
+building intermediate DataFrames. Every input is either one neighborhood
+(shape (n,)) or a batch of neighborhoods (shape (b, n)); statistics are
+always taken along the last axis, i.e. within each neighborhood. Batches of
+uneven neighborhoods are padded and described by a `valid` mask.
+
+benchmarks/bench_scoring.py checks the results against the pandas
+implementation.
+"""
+from typing import Dict, Mapping, Optional
+
+import numpy as np
+
+from config.constants import OPPORTUNITY_SCORE_WEIGHTS
+
+# GA4 metrics standardized for performance_diff, in column order
+SCORE_GA4_COLUMNS = ['users_org', 'cvr_org', 'leads_org', 'users_paid', 'cvr_paid', 'leads_paid']
+
+# Market metric columns, in the order the pandas pipeline added them
+MARKET_METRIC_COLUMNS = [
+    'network_penetration', 'avg_network_penetration', 'engagement_diversity', 'growth_potential',
+    'performance_efficiency', 'log_unique_sites', 'log_housing_units', 'saturation_risk'
+]
+
+# Weighted components of the raw opportunity score; terms marked inverted enter as (1 - value)
+SCORE_COMPONENTS = [
+    'norm_similarity', 'performance_diff', 'network_penetration', 'engagement_diversity',
+    'growth_potential', 'performance_efficiency', 'saturation_risk'
+]
+INVERTED_COMPONENTS = {'performance_diff', 'saturation_risk'}
+
+# Columns combine_scores reads; callers can keep just these to re-score later
+RESCORE_COLUMNS = SCORE_COMPONENTS + ['normalized_log_housing']
+
+CATEGORY_LABELS = ['Low', 'Average', 'High']
+
+# NaN-skipping reductions like pandas' (and without np.nanmean's warnings on
+# all-NaN slices, which are expected for padding and missing GA4 data)
+def _nanmean(values: np.ndarray, axis: int, keepdims: bool = False) -> np.ndarray:
+    present = ~np.isnan(values)
+    total = np.where(present, values, 0).sum(axis=axis, keepdims=keepdims)
+    return total / present.sum(axis=axis, keepdims=keepdims)
+
+def _nanstd(values: np.ndarray, axis: int, keepdims: bool = False) -> np.ndarray:
+    present = ~np.isnan(values)
+    deviation = np.where(present, values - _nanmean(values, axis, keepdims=True), 0)
+    return np.sqrt((deviation ** 2).sum(axis=axis, keepdims=keepdims) / present.sum(axis=axis, keepdims=keepdims))
+
+def _nanmin(values: np.ndarray) -> np.ndarray:
+    return np.fmin.reduce(values, axis=-1, keepdims=True)
+
+def _nanmax(values: np.ndarray) -> np.ndarray:
+    return np.fmax.reduce(values, axis=-1, keepdims=True)
+
+def _masked(values, valid: Optional[np.ndarray]) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    return values if valid is None else np.where(valid, values, np.nan)
+
+def _minmax(values: np.ndarray) -> np.ndarray:
+    low, high = _nanmin(values), _nanmax(values)
+    return (values - low) / (high - low)
+
+def compute_components(ga4: np.ndarray, unique_sites: np.ndarray, housing_units: np.ndarray,
+                       similarity: Optional[np.ndarray], is_target: np.ndarray,
+                       valid: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Per-market inputs of the opportunity score.
+
+    Args:
+        ga4: (..., n, 6) GA4 metrics in SCORE_GA4_COLUMNS order (NaN = missing)
+        unique_sites: (..., n) network sites per market
+        housing_units: (..., n) housing units per market
+        similarity: (..., n) feature-space distance to the target, or None
+        is_target: (..., n) True for the target market
+        valid: (..., n) False for padding rows in a batch (default: all valid)
+
+    Returns:
+        Dictionary with the std_* GA4 columns (shape (..., n, 6) under 'std_ga4'),
+        performance_diff, the MARKET_METRIC_COLUMNS, norm_similarity and
+        normalized_log_housing, each shaped (..., n)
+    """
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        ga4 = np.asarray(ga4, dtype=np.float64)
+        if valid is not None:
+            ga4 = np.where(valid[..., None], ga4, np.nan)
+            # Padding rows stay NaN; missing values in real rows take the neighborhood mean
+            column_means = _nanmean(ga4, axis=-2, keepdims=True)
+            ga4 = np.where(np.isnan(ga4) & valid[..., None], column_means, ga4)
+        else:
+            column_means = _nanmean(ga4, axis=-2, keepdims=True)
+            ga4 = np.where(np.isnan(ga4), column_means, ga4)
+
+        # StandardScaler: population std, constant columns scaled by 1
+        mean = _nanmean(ga4, axis=-2, keepdims=True)
+        scale = _nanstd(ga4, axis=-2, keepdims=True)
+        scale = np.where(scale == 0, 1.0, scale)
+        std_ga4 = (ga4 - mean) / scale
+
+        others = np.where(np.asarray(is_target, dtype=bool)[..., None], np.nan, std_ga4)
+        avg_performance = _nanmean(others, axis=-2, keepdims=True)
+        performance_diff = _nanmean(std_ga4 - avg_performance, axis=-1)
+
+        unique_sites = _masked(unique_sites, valid)
+        housing_units = _masked(housing_units, valid)
+        users = ga4[..., SCORE_GA4_COLUMNS.index('users_org')] + ga4[..., SCORE_GA4_COLUMNS.index('users_paid')]
+        leads = ga4[..., SCORE_GA4_COLUMNS.index('leads_org')] + ga4[..., SCORE_GA4_COLUMNS.index('leads_paid')]
+
+        network_penetration = unique_sites / housing_units * 100
+        avg_penetration = _nanmean(network_penetration, axis=-1, keepdims=True)
+        log_unique_sites = np.log1p(unique_sites)
+        log_housing_units = np.log1p(housing_units)
+
+        if similarity is None:
+            norm_similarity = np.ones_like(unique_sites)
+        else:
+            similarity = _masked(similarity, valid)
+            all_missing = np.all(np.isnan(similarity), axis=-1, keepdims=True)
+            norm_similarity = np.where(all_missing, 1.0, 1 - _minmax(similarity))
+
+        components = {
+            'std_ga4': std_ga4,
+            'performance_diff': performance_diff,
+            'network_penetration': network_penetration,
+            'avg_network_penetration': np.broadcast_to(avg_penetration, network_penetration.shape).copy(),
+            'engagement_diversity': unique_sites / (users + 1),
+            'growth_potential': (avg_penetration - network_penetration) / avg_penetration,
+            'performance_efficiency': leads / (unique_sites + 1),
+            'log_unique_sites': log_unique_sites,
+            'log_housing_units': log_housing_units,
+            'saturation_risk': 1 - (1 / (1 + np.exp(-(log_unique_sites - log_housing_units)))),
+            'norm_similarity': norm_similarity,
+            'normalized_log_housing': _minmax(log_housing_units),
+        }
+    if valid is not None:
+        for name in ('norm_similarity', 'avg_network_penetration'):
+            components[name] = np.where(valid, components[name], np.nan)
+    return components
+
+def combine_scores(components: Mapping[str, np.ndarray],
+                   weights: Optional[Mapping[str, float]] = None) -> Dict[str, np.ndarray]:
+    """
+    Weighted opportunity score from precomputed components.
+
+    Only the RESCORE_COLUMNS components are read, and the work is linear in
+    the number of markets, so a result set can be re-weighted without
+    recomputing its components.
+
+    Args:
+        components: Output of compute_components
+        weights: Component name -> weight (default OPPORTUNITY_SCORE_WEIGHTS);
+            missing components get weight 0
+
+    Returns:
+        Dictionary with raw_opportunity_score, opportunity_score (min-max
+        normalized per neighborhood) and category codes (0 = Low, 1 = Average,
+        2 = High, -1 = missing)
+    """
+    weights = OPPORTUNITY_SCORE_WEIGHTS if weights is None else weights
+    with np.errstate(invalid='ignore'):
+        raw = np.zeros_like(components['norm_similarity'])
+        for name in SCORE_COMPONENTS:
+            weight = weights.get(name, 0)
+            if weight:
+                value = components[name]
+                raw = raw + weight * ((1 - value) if name in INVERTED_COMPONENTS else value)
+
+        score = raw * (1 + components['normalized_log_housing'])
+        low, high = _nanmin(score), _nanmax(score)
+        # Neighborhoods whose scores are all equal score 1, as in the pandas implementation
+        constant = low == high
+        score = np.where(constant, np.where(np.isnan(score), np.nan, 1.0), (score - low) / (high - low))
+
+    return {
+        'raw_opportunity_score': raw,
+        'opportunity_score': score,
+        'category_codes': categorize(score),
+    }
+
+def categorize(scores: np.ndarray) -> np.ndarray:
+    """
+    Tercile category codes per neighborhood, matching pd.qcut(q=3).
+
+    Ties that would make pd.qcut drop bin edges (and then fail on its three
+    labels) are binned against the remaining edges instead.
+    """
+    missing = np.isnan(scores)
+    # Neighborhoods without any score get no category; fill them so nanquantile does not warn
+    filled = np.where(np.all(missing, axis=-1, keepdims=True), 0.0, scores)
+    edges = np.nanquantile(filled, [1 / 3, 2 / 3], axis=-1)
+    codes = (scores > edges[0][..., None]).astype(np.int8) + (scores > edges[1][..., None])
+    return np.where(missing, -1, codes).astype(np.int8)
+
+def score_markets(ga4: np.ndarray, unique_sites: np.ndarray, housing_units: np.ndarray,
+                  similarity: Optional[np.ndarray], is_target: np.ndarray, valid: Optional[np.ndarray] = None,
+                  weights: Optional[Mapping[str, float]] = None) -> Dict[str, np.ndarray]:
+    """compute_components followed by combine_scores; returns both sets of arrays in one dictionary."""
+    components = compute_components(ga4, unique_sites, housing_units, similarity, is_target, valid)
+    return {**components, **combine_scores(components, weights)}
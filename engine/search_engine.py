@@ -1,13 +1,18 @@
-import logging
-from typing import Dict, List, Optional, Set
-from datetime import datetime
 import asyncio
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+from datetime import datetime, timedelta
 from collections import defaultdict
 
 from services.search_service import SearchService
 from services.seo_service import SEOService
+from services.snapshot_service import SnapshotStore
+from config import SERP_SNAPSHOT_DB_PATH, SERP_SNAPSHOT_MAX_AGE_HOURS
 from models import MarketMetrics, SearchResult, SEOMetrics
 from utils.domain_utils import extract_base_domain, deduplicate_domains, is_ibuyer
+from utils.metrics import span
+from utils.telemetry import TELEMETRY
+from .competitor_engine import CompetitorPresenceEngine
 
 class SearchEngine:
     """Coordinates search and SEO analysis for market research."""
@@ -16,23 +21,39 @@ class SearchEngine:
         self.logger = logging.getLogger(__name__)
         self.search_service = SearchService()
         self.seo_service = SEOService()
+        self.competitor_engine = CompetitorPresenceEngine()
+        self.snapshot_store = SnapshotStore(SERP_SNAPSHOT_DB_PATH) if SERP_SNAPSHOT_DB_PATH else None
+        self.snapshot_max_age = timedelta(hours=SERP_SNAPSHOT_MAX_AGE_HOURS)
 
-    async def analyze_market(self, city: str, state: str) -> Dict:
+    async def analyze_market(self, city: str, state: str, cached_only: bool = False) -> Optional[Dict]:
         """
         Perform comprehensive market analysis including search rankings and SEO metrics.
         
         Args:
             city: Target city name
             state: Target state code
+            cached_only: Use only the latest SERP snapshot (of any age) and cached SEO
+                metrics, calling neither API; for requests degraded under load
             
         Returns:
-            Dictionary containing complete market analysis
+            Dictionary containing complete market analysis, or None when cached_only
+            and the market has no snapshot
         """
         try:
             self.logger.info(f"Starting market analysis for {city}, {state}")
             
             # Step 1: Get search results
-            search_results = await self.search_service.get_all_search_terms(city, state)
+            if cached_only:
+                latest = None
+                if self.snapshot_store:
+                    latest = await asyncio.to_thread(self.snapshot_store.latest, city, state)
+                if latest is None:
+                    self.logger.info(f"No SERP snapshot for {city}, {state}; skipping search analysis")
+                    return None
+                search_results = latest[1]
+            else:
+                with span('serper'):
+                    search_results = await self._get_search_results(city, state)
             if not search_results:
                 raise ValueError(f"No search results found for {city}, {state}")
             
@@ -43,16 +64,21 @@ class SearchEngine:
             self.logger.info(f"Found {len(unique_domains)} unique domains")
             
             # Step 3: Get SEO metrics
-            seo_metrics = await self.seo_service.get_bulk_metrics(unique_domains)
+            if cached_only:
+                seo_metrics = self.seo_service.get_cached_metrics(unique_domains)
+            else:
+                with span('semrush'):
+                    seo_metrics = await self.seo_service.get_bulk_metrics(unique_domains)
             self.logger.info(f"Retrieved SEO metrics for {len(seo_metrics)} domains")
             
-            # Step 4: Calculate various metrics
-            ibuyer_metrics = self._calculate_ibuyer_metrics(unique_domains)
-            ranking_analysis = self._analyze_rankings(search_results, seo_metrics)
-            domain_performance = self._analyze_domain_performance(search_results, seo_metrics)
-            
-            # Step 5: Prepare chart data
-            chart_data = self._prepare_chart_data(search_results.get("we buy houses", []), seo_metrics)
+            with span('serp_aggregation'):
+                # Step 4: Calculate various metrics
+                ibuyer_metrics = self._calculate_ibuyer_metrics(unique_domains)
+                ranking_analysis = self._analyze_rankings(search_results, seo_metrics)
+                domain_performance = self._analyze_domain_performance(search_results, seo_metrics)
+                
+                # Step 5: Prepare chart data
+                chart_data = self._prepare_chart_data(search_results.get("we buy houses", []), seo_metrics)
             
             # Step 6: Compile complete analysis
             analysis = {
@@ -82,6 +108,114 @@ class SearchEngine:
             self.logger.error(f"Error in market analysis: {str(e)}")
             raise
 
+    async def analyze_competitor_presence(self, markets: List[Tuple[str, str]],
+                                          target_market: Optional[Tuple[str, str]] = None) -> Dict:
+        """
+        Fetch SERPs for several markets concurrently and score cross-market presence.
+        
+        Args:
+            markets: List of (city, state) pairs, e.g. the rows from find_similar_cities
+            target_market: The (city, state) pair overlap scores are reported against
+            
+        Returns:
+            Dictionary containing the domain x market rank matrix and presence scores
+        """
+        self.logger.info(f"Starting cross-market competitor analysis for {len(markets)} markets")
+        
+        # Markets without a fresh snapshot are fetched together: with batching,
+        # in as few Serper requests as the batch size allows, otherwise sharing
+        # the service's request semaphore like a single analysis.
+        fetched = await self._get_markets_search_results(markets)
+        
+        market_results = {}
+        for (city, state), results in fetched.items():
+            if results:
+                market_results[f"{city}, {state}"] = results
+        
+        self.logger.info(f"Retrieved search results for {len(market_results)}/{len(markets)} markets")
+        
+        target = None
+        if target_market:
+            # Match the target however it is cased, as market keys use the dataset's spelling
+            wanted = f"{target_market[0]}, {target_market[1]}".lower().strip()
+            target = next((key for key in market_results if key.lower() == wanted), None)
+        presence = self.competitor_engine.analyze(market_results, target_market=target)
+        presence['timestamp'] = datetime.now()
+        return presence
+
+    async def _get_search_results(self, city: str, state: str) -> Dict[str, List[SearchResult]]:
+        """Get search results for a market, reusing a fresh snapshot and recording new fetches."""
+        return (await self._get_markets_search_results([(city, state)]))[(city, state)]
+
+    async def _get_markets_search_results(
+            self, markets: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Dict[str, List[SearchResult]]]:
+        """Get search results per market, reusing fresh snapshots and fetching the rest in one go."""
+        markets = list(dict.fromkeys(markets))
+        # SQLite reads and writes run in a worker thread so they never block the event loop
+        stored = await asyncio.to_thread(self._latest_snapshots, markets) if self.snapshot_store else {}
+
+        results, missing = {}, []
+        for city, state in markets:
+            latest = stored.get((city, state))
+            if self.snapshot_store and self.snapshot_max_age > timedelta(0):
+                if latest and datetime.now() - latest[0] <= self.snapshot_max_age:
+                    taken_at, results[(city, state)] = latest
+                    TELEMETRY.record_cache('serper', 'hit')
+                    self.logger.info(f"Using SERP snapshot for {city}, {state} taken at {taken_at}")
+                    continue
+                TELEMETRY.record_cache('serper', 'stale' if latest else 'miss')
+            missing.append((city, state))
+
+        fetched, failures = (await self.search_service.get_search_terms_with_failures(missing)
+                             if missing else ({}, {}))
+        complete = {}
+        for city, state in missing:
+            search_results = fetched.get((city, state), {})
+            failed = failures.get((city, state), set())
+            latest = stored.get((city, state))
+
+            if failed and not search_results and latest:
+                # Serper is failing, its circuit is open or the request budget ran out: serve the last snapshot
+                taken_at, search_results = latest
+                TELEMETRY.record_cache('serper', 'stale')
+                self.logger.warning(f"Serper unavailable; using stale SERP snapshot for {city}, {state} "
+                                    f"taken at {taken_at}")
+            elif failed:
+                # A partial fetch would pass for a complete fresh snapshot on later requests
+                self.logger.warning(f"Not recording SERP snapshot for {city}, {state}: "
+                                    f"{len(failed)}/{len(self.search_service.search_terms)} terms failed")
+            elif self.snapshot_store:
+                # Terms with no organic results are part of a complete snapshot
+                complete[(city, state)] = search_results
+
+            results[(city, state)] = search_results
+
+        if complete:
+            await asyncio.to_thread(self._record_snapshots, complete)
+        return results
+
+    def _latest_snapshots(self, markets: List[Tuple[str, str]]
+                          ) -> Dict[Tuple[str, str], Tuple[datetime, Dict[str, List[SearchResult]]]]:
+        """Latest snapshot of any age per market that has one."""
+        stored = {}
+        for city, state in markets:
+            try:
+                latest = self.snapshot_store.latest(city, state)
+            except Exception as e:
+                self.logger.error(f"Error reading SERP snapshot for {city}, {state}: {str(e)}")
+                continue
+            if latest:
+                stored[(city, state)] = latest
+        return stored
+
+    def _record_snapshots(self, market_results: Dict[Tuple[str, str], Dict[str, List[SearchResult]]]):
+        """Record one snapshot per market."""
+        for (city, state), search_results in market_results.items():
+            try:
+                self.snapshot_store.record(city, state, search_results)
+            except Exception as e:
+                self.logger.error(f"Error recording SERP snapshot for {city}, {state}: {str(e)}")
+
     def _extract_unique_domains(self, search_results: Dict[str, List[SearchResult]]) -> Set[str]:
         """Extract and deduplicate domains from search results."""
         domains = set()
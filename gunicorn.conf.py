@@ -7,9 +7,10 @@ backlog = 2048
 
 # Worker processes
 workers = 2
-worker_class = "gevent"  # Changed from aiohttp to gevent
+# Threaded workers. Not gevent: with preload_app, asyncio binds its selector to epoll before gevent
+# patches select (which has no epoll), so every upstream call from an async view failed
+worker_class = "gthread"
 threads = 4
-worker_connections = 1000
 timeout = 30
 
 # Logging
@@ -0,0 +1,22 @@
+import os
+
+# Server socket
+bind = [f"0.0.0.0:{os.environ.get('PORT', '5000')}"]  # Use environment PORT or default to 5000
+backlog = 2048
+
+# Worker processes: each runs one persistent asyncio event loop; the WSGI side
+# of requests runs on ASGI_THREADS threads per worker (see asgi.py)
+workers = 2
+worker_class = "asyncio"
+
+# Logging
+accesslog = "-"
+errorlog = "-"
+loglevel = "INFO"
+
+# Timeout configuration
+graceful_timeout = 30
+keep_alive_timeout = 5
+
+# Maximum requests a worker will process before restarting
+max_requests = 1000
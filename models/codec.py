@@ -0,0 +1,95 @@
+"""
+Compact binary codec for model objects, built on msgpack.
+
+Each record is packed as a msgpack extension type whose payload is the
+array of its field values, so field names are never repeated on the wire.
+Plain containers, numbers and strings pass through as native msgpack.
+
+Compared with pickling the old plain dataclasses (benchmarks/bench_models.py),
+payloads are about 18% smaller and encoding about 10% faster, but decoding is
+about 20% slower, since every record goes through its frozen __init__.
+
+Nothing in the app serializes model records yet: the SEO metrics cache keeps
+objects in memory, SERP snapshots go to SQLite rows, and atlas workers
+exchange DataFrames. The codec is for a shared (out-of-process) cache or a
+worker handing records back, where its size and encode speed pay off.
+"""
+from dataclasses import fields
+from datetime import datetime
+from operator import attrgetter
+from typing import Any
+
+import msgpack
+
+from .search_results import (
+    SearchResult,
+    SEOMetrics,
+    DomainAnalysis,
+    MarketAnalysis,
+    ChartDataPoint,
+    SearchTermResults,
+    MarketMetrics
+)
+
+# Extension type codes are part of the wire format: only ever append.
+_EXT_TYPES = {
+    1: SearchResult,
+    2: SEOMetrics,
+    3: DomainAnalysis,
+    4: MarketAnalysis,
+    5: ChartDataPoint,
+    6: SearchTermResults,
+    7: MarketMetrics
+}
+_EXT_DATETIME = 64
+
+_EXT_CODES = {cls: code for code, cls in _EXT_TYPES.items()}
+_FIELD_GETTERS = {cls: attrgetter(*(f.name for f in fields(cls))) for cls in _EXT_TYPES.values()}
+# Records whose fields are only scalars/lists of scalars can be packed without a default hook
+_FLAT_TYPES = {SearchResult, SEOMetrics, DomainAnalysis, ChartDataPoint}
+
+def _make_default():
+    # Packer objects are not thread-safe, so each encode() call gets its own
+    flat_packer = msgpack.Packer(use_bin_type=True)
+
+    def default(obj: Any) -> msgpack.ExtType:
+        cls = type(obj)
+        code = _EXT_CODES.get(cls)
+        if code is not None:
+            values = _FIELD_GETTERS[cls](obj)
+            if cls in _FLAT_TYPES:
+                return msgpack.ExtType(code, flat_packer.pack(values))
+            return msgpack.ExtType(code, msgpack.packb(values, default=default, use_bin_type=True))
+        if isinstance(obj, datetime):
+            return msgpack.ExtType(_EXT_DATETIME, obj.isoformat().encode())
+        raise TypeError(f"Cannot encode object of type {cls.__name__}")
+
+    return default
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    if code == _EXT_DATETIME:
+        return datetime.fromisoformat(data.decode())
+    cls = _EXT_TYPES.get(code)
+    if cls is None:
+        return msgpack.ExtType(code, data)
+    return cls(*msgpack.unpackb(data, ext_hook=_ext_hook, raw=False, strict_map_key=False))
+
+def encode(obj: Any) -> bytes:
+    """
+    Serialize model objects (or containers of them) to bytes.
+
+    Args:
+        obj: A model instance, or any nesting of dicts/lists holding them
+
+    Returns:
+        The msgpack-encoded payload
+    """
+    return msgpack.packb(obj, default=_make_default(), use_bin_type=True)
+
+def decode(data: bytes) -> Any:
+    """
+    Deserialize bytes produced by encode().
+
+    Tuples come back as lists, as with any msgpack round trip.
+    """
+    return msgpack.unpackb(data, ext_hook=_ext_hook, raw=False, strict_map_key=False)
@@ -1,26 +1,43 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
+from functools import cached_property
 from typing import List, Dict, Optional
 from datetime import datetime
 
-@dataclass
-class SearchResult:
+class _Record:
+    """Base for frozen, slotted records.
+
+    Frozen dataclasses with __slots__ cannot be restored by the default
+    pickle protocol (it sets slot state through the frozen __setattr__),
+    so records reduce to a plain constructor call instead.
+    """
+    __slots__ = ()
+
+    def __reduce__(self):
+        return (self.__class__, tuple(getattr(self, f.name) for f in fields(self)))
+
+@dataclass(frozen=True)
+class SearchResult(_Record):
     """Individual search result from Serper API."""
+    __slots__ = ('domain', 'rank', 'url', 'title')
     domain: str
     rank: int
     url: str
     title: str
     
-@dataclass
-class SEOMetrics:
+@dataclass(frozen=True)
+class SEOMetrics(_Record):
     """SEO metrics from SEMrush API."""
+    __slots__ = ('domain', 'authority_score', 'backlink_count', 'referring_domains')
     domain: str
     authority_score: float
     backlink_count: int
     referring_domains: int
     
-@dataclass
-class DomainAnalysis:
+@dataclass(frozen=True)
+class DomainAnalysis(_Record):
     """Analysis of a single domain's performance."""
+    __slots__ = ('domain', 'best_rank', 'appearances', 'average_rank', 'terms_found',
+                 'authority_score', 'backlink_count', 'referring_domains', 'is_ibuyer')
     domain: str
     best_rank: int
     appearances: int
@@ -31,9 +48,12 @@ class DomainAnalysis:
     referring_domains: int
     is_ibuyer: bool
 
-@dataclass
+@dataclass(frozen=True)
 class MarketAnalysis:
-    """Complete market analysis results."""
+    """Complete market analysis results.
+
+    Derived properties are computed once and cached on the instance.
+    """
     city: str
     state: str
     timestamp: datetime
@@ -43,7 +63,7 @@ class MarketAnalysis:
     summary: Dict[str, float]
     chart_data: List[Dict]
     
-    @property
+    @cached_property
     def total_domains(self) -> int:
         """Get total number of unique domains found."""
         domains = set()
@@ -51,19 +71,19 @@ class MarketAnalysis:
             domains.update(result.domain for result in results)
         return len(domains)
     
-    @property
+    @cached_property
     def ibuyer_ratio(self) -> float:
         """Calculate ratio of iBuyer domains to total domains."""
         ibuyer_count = sum(1 for analysis in self.domain_analysis.values() if analysis.is_ibuyer)
         return ibuyer_count / len(self.domain_analysis) if self.domain_analysis else 0.0
     
-    @property
+    @cached_property
     def average_authority_score(self) -> float:
         """Calculate average authority score across all domains."""
         scores = [metrics.authority_score for metrics in self.seo_metrics.values()]
         return sum(scores) / len(scores) if scores else 0.0
     
-    @property
+    @cached_property
     def top_domains(self) -> List[DomainAnalysis]:
         """Get top 10 domains by best rank."""
         return sorted(
@@ -71,9 +91,10 @@ class MarketAnalysis:
             key=lambda x: (x.best_rank, -x.authority_score)
         )[:10]
 
-@dataclass
-class ChartDataPoint:
+@dataclass(frozen=True)
+class ChartDataPoint(_Record):
     """Data point for ranking/metrics chart."""
+    __slots__ = ('position', 'domain', 'authority_score', 'backlink_count', 'referring_domains', 'is_ibuyer')
     position: int
     domain: str
     authority_score: float
@@ -81,20 +102,20 @@ class ChartDataPoint:
     referring_domains: int
     is_ibuyer: bool
 
-@dataclass
+@dataclass(frozen=True)
 class SearchTermResults:
     """Results for a specific search term."""
     term: str
     results: List[SearchResult]
     timestamp: datetime
     
-    @property
+    @cached_property
     def ibuyer_count(self) -> int:
         """Count of iBuyer domains in results."""
         from utils.domain_utils import is_ibuyer
         return sum(1 for result in self.results if is_ibuyer(result.domain))
     
-    @property
+    @cached_property
     def average_rank(self) -> Dict[str, float]:
         """Calculate average rank for each domain."""
         domain_ranks = {}
@@ -108,7 +129,7 @@ class SearchTermResults:
             for domain, ranks in domain_ranks.items()
         }
 
-@dataclass
+@dataclass(frozen=True)
 class MarketMetrics:
     """Summary metrics for a market."""
     total_results: int
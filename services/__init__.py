@@ -1,4 +1,7 @@
 from .search_service import SearchService
 from .seo_service import SEOService
+from .snapshot_service import SnapshotStore
+from .cache_service import CacheService
+from .atlas_service import AtlasStore
 
-__all__ = ['SearchService', 'SEOService']
\ No newline at end of file
+__all__ = ['SearchService', 'SEOService', 'SnapshotStore', 'CacheService', 'AtlasStore']
\ No newline at end of file
@@ -0,0 +1,181 @@
+import json
+import logging
+import math
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Set
+
+import pandas as pd
+
+_META_SCHEMA = """
+CREATE TABLE IF NOT EXISTS atlas_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Indexes for the queries the web app serves: top markets overall, per state and per category
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_atlas_score ON atlas (opportunity_score DESC);
+CREATE INDEX IF NOT EXISTS idx_atlas_state_score ON atlas (state_id, opportunity_score DESC);
+CREATE INDEX IF NOT EXISTS idx_atlas_category_score ON atlas (opportunity_category, opportunity_score DESC);
+"""
+
+class AtlasStore:
+    """
+    SQLite table of precomputed opportunity scores, one row per market.
+
+    The atlas job writes each finished partition in its own transaction, so
+    the rows written so far double as its checkpoint: a run restarted with
+    the same parameters skips the markets already stored. The web app reads
+    the same table.
+    """
+
+    def __init__(self, db_path: str, columns: Mapping[str, str]):
+        """
+        Args:
+            db_path: SQLite database file
+            columns: Row columns -> 'str' or 'float' (e.g. engine.export.EXPORT_COLUMNS);
+                must include city_state, state_id, opportunity_score and opportunity_category
+        """
+        self.db_path = db_path
+        self.columns = dict(columns)
+        self.logger = logging.getLogger(__name__)
+        self._write_lock = threading.Lock()
+
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_META_SCHEMA)
+            conn.executescript(self._table_schema())
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=10.0)
+
+    def _table_schema(self) -> str:
+        definitions = ',\n    '.join(
+            f"{column} {'TEXT' if kind == 'str' else 'REAL'}{' PRIMARY KEY' if column == 'city_state' else ''}"
+            for column, kind in self.columns.items()
+        )
+        return f"CREATE TABLE IF NOT EXISTS atlas (\n    {definitions}\n) WITHOUT ROWID;\n{_INDEXES}"
+
+    def run_info(self) -> Optional[Dict]:
+        """Parameters and progress of the stored run, or None if no run has started."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM atlas_meta WHERE key = 'run'").fetchone()
+            if row is None:
+                return None
+            stored = conn.execute("SELECT COUNT(*) FROM atlas").fetchone()[0]
+        return {**json.loads(row[0]), 'stored': stored}
+
+    def start(self, params: Dict, total: int, reset: bool = False) -> Set[str]:
+        """
+        Begin or resume a run.
+
+        Args:
+            params: Parameters identifying the run (data version, radius, preset, ...)
+            total: Number of markets the run covers
+            reset: Start over even if the stored run has the same parameters
+
+        Returns:
+            city_state keys already stored by an earlier attempt with the same
+            parameters (empty when the table was reset for a new run)
+        """
+        with self._write_lock, closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM atlas_meta WHERE key = 'run'").fetchone()
+            previous = json.loads(row[0]) if row else None
+            if not reset and previous is not None and previous['params'] == params:
+                done = {key for key, in conn.execute("SELECT city_state FROM atlas")}
+                self.logger.info("Resuming atlas run: %d of %d markets already stored", len(done), total)
+                return done
+
+            with conn:
+                # The table is rebuilt so column changes take effect too
+                conn.execute("DROP TABLE IF EXISTS atlas")
+                conn.executescript(self._table_schema())
+                conn.execute(
+                    "INSERT OR REPLACE INTO atlas_meta (key, value) VALUES ('run', ?)",
+                    (json.dumps({'params': params, 'total': total, 'started_at': time.time(), 'finished_at': None}),)
+                )
+            self.logger.info("Started atlas run over %d markets: %s", total, params)
+            return set()
+
+    def write(self, rows: pd.DataFrame):
+        """Store a batch of rows (EXPORT_COLUMNS layout) in one transaction."""
+        columns = list(self.columns)
+        values = [
+            tuple(None if isinstance(value, float) and math.isnan(value) else value for value in row)
+            for row in rows.reindex(columns=columns).itertuples(index=False, name=None)
+        ]
+        placeholders = ', '.join('?' * len(columns))
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            conn.executemany(f"INSERT OR REPLACE INTO atlas ({', '.join(columns)}) VALUES ({placeholders})", values)
+
+    def finish(self, stats: Optional[Dict] = None):
+        """Mark the stored run complete, recording throughput statistics."""
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT value FROM atlas_meta WHERE key = 'run'").fetchone()
+            if row is None:
+                return
+            run = {**json.loads(row[0]), 'finished_at': time.time(), 'stats': stats or {}}
+            conn.execute("UPDATE atlas_meta SET value = ? WHERE key = 'run'", (json.dumps(run),))
+
+    def iter_rows(self, batch_size: int = 1000, limit: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        Stream every stored row in city_state order, batch_size rows at a time.
+
+        Reads walk the primary key with one open cursor, so memory stays at one
+        batch however large the table is.
+
+        Args:
+            batch_size: Rows per yielded frame
+            limit: Stop after this many rows
+        """
+        columns = list(self.columns)
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                f"SELECT {', '.join(columns)} FROM atlas ORDER BY city_state LIMIT ?",
+                (-1 if limit is None else max(limit, 0),)
+            )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield pd.DataFrame.from_records(rows, columns=columns)
+
+    def query(self, state: Optional[str] = None, category: Optional[str] = None, min_score: Optional[float] = None,
+              city_states: Optional[Iterable[str]] = None, limit: int = 100, offset: int = 0) -> List[Dict]:
+        """
+        Markets ordered by opportunity score, highest first.
+
+        Args:
+            state: Only this state code (case-insensitive)
+            category: Only this opportunity category ('Low', 'Average' or 'High')
+            min_score: Only markets scoring at least this much
+            city_states: Only these city_state keys
+            limit: Maximum number of rows
+            offset: Rows to skip, for paging
+        """
+        clauses, args = [], []
+        if state:
+            clauses.append("state_id = ?")
+            args.append(state.upper())
+        if category:
+            clauses.append("opportunity_category = ?")
+            args.append(category)
+        if min_score is not None:
+            clauses.append("opportunity_score >= ?")
+            args.append(min_score)
+        if city_states is not None:
+            keys = [key.lower().strip() for key in city_states]
+            clauses.append(f"city_state IN ({', '.join('?' * len(keys))})")
+            args.extend(keys)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                f"SELECT * FROM atlas {where} ORDER BY opportunity_score DESC LIMIT ? OFFSET ?",
+                (*args, limit, offset)
+            ).fetchall()
+        return [dict(row) for row in rows]
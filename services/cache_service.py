@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Set
+
+class CacheService:
+    """
+    Thread-safe in-process cache with TTL expiry, LRU eviction and tags.
+
+    Entries can be tagged (e.g. with the city_state keys a result was built
+    from) so a data change invalidates only the entries that depend on it.
+    """
+
+    def __init__(self, max_size: int = 512, ttl: Optional[float] = 3600.0):
+        """
+        Args:
+            max_size: Maximum number of entries (0 disables the cache)
+            ttl: Default time-to-live in seconds (None = no expiry)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.logger = logging.getLogger(__name__)
+        # key -> (expires_at, value, tags), least recently used first
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._tags: Dict[Hashable, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return default
+            expires_at, value, _ = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self._stats['stale'] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, tags: Iterable[Hashable] = ()):
+        """
+        Store a value.
+
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl: Time-to-live in seconds (defaults to the cache's ttl)
+            tags: Tags the entry can later be invalidated by
+        """
+        if self.max_size <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        tags = frozenset(tags)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Remove a single entry; returns whether it existed."""
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            self._stats['invalidations'] += 1
+            return True
+
+    def invalidate_tags(self, tags: Iterable[Hashable]) -> int:
+        """Remove every entry carrying any of the given tags; returns the number removed."""
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys.update(self._tags.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            self._stats['invalidations'] += len(keys)
+        if keys:
+            self.logger.info("Invalidated %d cached entries", len(keys))
+        return len(keys)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._stats['invalidations'] += len(self._entries)
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss/eviction counters and the current size."""
+        with self._lock:
+            return {**self._stats, 'size': len(self._entries)}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: Hashable):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
@@ -1,23 +1,49 @@
 import httpx
 import logging
 import asyncio
-from typing import List, Dict, Optional
+import time
+from typing import List, Dict, Optional, Set, Tuple
 from models import SearchResult
 from utils.domain_utils import extract_base_domain
-from config import SERPER_API_KEY
+from config import SERPER_API_KEY, SERPER_BASE_URL, SERPER_BATCH_SIZE, SERPER_CREDITS_PER_QUERY
+from utils.telemetry import TELEMETRY
+from utils.api_utils import LoopLocal, HTTPClientPool
+from utils.resilience import CircuitOpen, DeadlineExceeded, circuit_breaker, remaining
+
+# Shared by all instances so a persistent event loop reuses Serper connections
+_http_pool = HTTPClientPool()
+
+# Seconds batching stays paused after Serper rejects an array payload, before batches are tried again
+BATCH_RETRY_SECONDS = 600.0
+
+# (search term, city, state)
+SearchQuery = Tuple[str, str, str]
 
 class SearchService:
-    """Service for handling Serper.dev API interactions."""
+    """
+    Service for handling Serper.dev API interactions.
+
+    With batching on, the search terms of one or several markets go to Serper
+    as one JSON array per request, and the answers are fanned back out per
+    term. If a batch fails, its markets are fetched one query at a time; if
+    Serper rejects the array payload itself (400/422), batching is paused for
+    BATCH_RETRY_SECONDS.
+    """
     
-    def __init__(self):
+    def __init__(self, batch_size: int = SERPER_BATCH_SIZE):
         self.api_key = SERPER_API_KEY
-        self.base_url = "https://google.serper.dev/search"
+        self.base_url = f"{SERPER_BASE_URL}/search"
         self.logger = logging.getLogger(__name__)
         self.headers = {
             "X-API-KEY": self.api_key,
             "Content-Type": "application/json"
         }
-        self._request_semaphore = asyncio.Semaphore(3)  # Limit concurrent requests
+        self._request_semaphore = LoopLocal(lambda: asyncio.Semaphore(3))  # Limit concurrent requests
+        self._http = _http_pool
+        # Queries per batch request; 0 or 1 sends one query per request
+        self.batch_size = batch_size
+        # time.monotonic() until which batching is paused after Serper rejected an array payload
+        self._batching_paused_until = 0.0
         
         # Define search terms
         self.search_terms = [
@@ -26,7 +52,7 @@ class SearchService:
             "sell my house fast for cash"
         ]
 
-    async def get_search_results(self, search_term: str, city: str, state: str) -> List[SearchResult]:
+    async def get_search_results(self, search_term: str, city: str, state: str) -> Optional[List[SearchResult]]:
         """
         Get search results for a specific term in a location.
         
@@ -36,69 +62,112 @@ class SearchService:
             state: Target state
             
         Returns:
-            List of SearchResult objects
+            List of SearchResult objects (empty if the term has no organic
+            results), or None if the fetch failed, the circuit is open or the
+            request budget is spent
         """
         try:
             location = f"{city}, {state}"
-            payload = {
-                "q": f"{search_term} {location}",
-                "num": 10,
-                "gl": "us",
-                "hl": "en",
-                "autocorrect": True
-            }
+            payload = self._payload(search_term, location)
             
             self.logger.debug(f"Making Serper request for '{search_term}' in {location}")
             
-            async with self._request_semaphore:
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        self.base_url,
-                        headers=self.headers,
-                        json=payload,
-                        timeout=30.0
-                    )
-                    
-                    # Log response status
-                    self.logger.debug(f"Serper API response status: {response.status_code}")
-                    
-                    if response.status_code != 200:
-                        self.logger.error(f"Serper API error: {response.status_code} - {response.text}")
-                        return []
-                    
-                    data = response.json()
-                    organic_results = data.get('organic', [])
-                    
-                    if not organic_results:
-                        self.logger.warning(f"No organic results found for '{search_term}' in {location}")
-                        return []
-                    
-                    results = []
-                    for rank, result in enumerate(organic_results, 1):
-                        url = result.get('link', '')
-                        if not url:
-                            continue
-                            
-                        domain = extract_base_domain(url)
-                        if domain:
-                            search_result = SearchResult(
-                                domain=domain,
-                                rank=rank,
-                                url=url,
-                                title=result.get('title', '')
-                            )
-                            results.append(search_result)
-                            self.logger.debug(f"Found result: Rank {rank} - {domain}")
-                    
-                    self.logger.info(f"Retrieved {len(results)} results for '{search_term}' in {location}")
-                    return results
-                
+            with circuit_breaker('serper').guard() as guarded:
+                async with self._request_semaphore.get():
+                    async with self._http.client() as client:
+                        async with TELEMETRY.track('serper') as call:
+                            response = await guarded.within_budget(client.post(  # Never past the request's deadline
+                                self.base_url,
+                                headers=self.headers,
+                                json=payload,
+                                timeout=guarded.timeout(30.0)
+                            ))
+                            call.status = response.status_code
+                guarded.failed = response.status_code >= 500 or response.status_code == 429
+
+            # Log response status
+            self.logger.debug(f"Serper API response status: {response.status_code}")
+            
+            if response.status_code != 200:
+                self.logger.error(f"Serper API error: {response.status_code} - {response.text}")
+                return None
+            
+            data = response.json()
+            TELEMETRY.record_credits('serper', data.get('credits', SERPER_CREDITS_PER_QUERY))
+            return self._parse_results(data, search_term, location)
+        
+        except (CircuitOpen, DeadlineExceeded) as e:
+            # Fail fast: the caller serves a stored snapshot or whatever terms it already has
+            self.logger.warning(f"Skipping Serper request for '{search_term}' in {location}: {str(e)}")
+            return None
         except httpx.RequestError as e:
             self.logger.error(f"Serper API request error for '{search_term}' in {location}: {str(e)}")
-            return []
+            return None
         except Exception as e:
             self.logger.error(f"Unexpected error getting search results for '{search_term}' in {location}: {str(e)}")
-            return []
+            return None
+
+    async def get_batch_results(self, queries: List[SearchQuery]) -> Optional[List[Optional[List[SearchResult]]]]:
+        """
+        Get search results for several queries in one Serper request.
+        
+        Args:
+            queries: (search term, city, state) per query
+            
+        Returns:
+            List of SearchResult lists in query order (None per query when the
+            circuit is open or the request budget is spent), or None if the
+            batch failed and the queries should be sent one at a time
+        """
+        try:
+            payload = [self._payload(term, f"{city}, {state}") for term, city, state in queries]
+            
+            self.logger.debug(f"Making Serper batch request for {len(queries)} queries")
+            
+            with circuit_breaker('serper').guard() as guarded:
+                async with self._request_semaphore.get():
+                    async with self._http.client() as client:
+                        async with TELEMETRY.track('serper') as call:
+                            response = await guarded.within_budget(client.post(  # Never past the request's deadline
+                                self.base_url,
+                                headers=self.headers,
+                                json=payload,
+                                timeout=guarded.timeout(30.0)
+                            ))
+                            call.status = response.status_code
+                guarded.failed = response.status_code >= 500 or response.status_code == 429
+            
+            if response.status_code in (400, 422) and len(queries) > 1:
+                # The shape of error Serper gives for a payload it cannot take as an array
+                self._pause_batching(f"{response.status_code} - {response.text}")
+                return None
+            if response.status_code != 200:
+                # Auth, credit and throttling errors say nothing about batch support: fall back for this batch only
+                self.logger.error(f"Serper API batch error: {response.status_code} - {response.text}")
+                return None
+            
+            data = response.json()
+            if not isinstance(data, list) or len(data) != len(queries):
+                self.logger.error(f"Serper batch answer did not match its {len(queries)} queries; "
+                                  f"falling back to one query per request for this batch")
+                return None
+            
+            results = []
+            for (term, city, state), term_data in zip(queries, data):
+                TELEMETRY.record_credits('serper', term_data.get('credits', SERPER_CREDITS_PER_QUERY))
+                results.append(self._parse_results(term_data, term, f"{city}, {state}"))
+            return results
+        
+        except (CircuitOpen, DeadlineExceeded) as e:
+            # Single queries would fail fast too; the caller serves stored snapshots instead
+            self.logger.warning(f"Skipping Serper batch request for {len(queries)} queries: {str(e)}")
+            return [None for _ in queries]
+        except httpx.RequestError as e:
+            self.logger.error(f"Serper API batch request error for {len(queries)} queries: {str(e)}")
+            return None
+        except Exception as e:
+            self.logger.error(f"Unexpected error getting batch search results for {len(queries)} queries: {str(e)}")
+            return None
 
     async def get_all_search_terms(self, city: str, state: str) -> Dict[str, List[SearchResult]]:
         """
@@ -111,22 +180,127 @@ class SearchService:
         Returns:
             Dictionary mapping search terms to their results
         """
+        if self.batching:
+            return (await self.get_search_terms_for_markets([(city, state)])).get((city, state), {})
+        results, _ = await self._search_terms_one_by_one(city, state)
+        return results
+
+    async def get_search_terms_for_markets(
+            self, markets: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Dict[str, List[SearchResult]]]:
+        """
+        Get results for all predefined search terms in several markets.
+        
+        Args:
+            markets: List of (city, state) pairs
+            
+        Returns:
+            Dictionary mapping (city, state) to its search term results
+        """
+        results, _ = await self.get_search_terms_with_failures(markets)
+        return results
+
+    async def get_search_terms_with_failures(
+            self, markets: List[Tuple[str, str]]
+    ) -> Tuple[Dict[Tuple[str, str], Dict[str, List[SearchResult]]], Dict[Tuple[str, str], Set[str]]]:
+        """
+        Get results for all predefined search terms in several markets, and which terms failed.
+        
+        Terms with no organic results are left out of a market's results;
+        terms whose fetch failed (an error, an open circuit, a spent request
+        budget, or not reached before either) are left out and listed as
+        failed, so callers can tell an incomplete fetch from an empty one.
+        
+        With batching, all the markets' queries are sent in batches of
+        batch_size; markets in a failed batch are fetched one query at a time.
+        Without it, each market's terms are fetched one at a time, all markets
+        concurrently.
+        
+        Args:
+            markets: List of (city, state) pairs
+            
+        Returns:
+            Tuple of a dictionary mapping (city, state) to its search term
+            results and one mapping (city, state) to its failed terms
+        """
+        markets = list(dict.fromkeys(markets))
+        results = {market: {} for market in markets}
+        failures = {market: set() for market in markets}
+        fallback = markets
+        
+        if self.batching:
+            queries = [(term, city, state) for city, state in markets for term in self.search_terms]
+            chunks = [queries[i:i + self.batch_size] for i in range(0, len(queries), self.batch_size)]
+            self.logger.info(f"Fetching {len(queries)} queries for {len(markets)} markets "
+                             f"in {len(chunks)} Serper batch request(s)")
+            batches = await asyncio.gather(*(self.get_batch_results(chunk) for chunk in chunks))
+            
+            failed = set()
+            for chunk, batch in zip(chunks, batches):
+                if batch is None:
+                    failed.update((city, state) for _, city, state in chunk)
+                    continue
+                for (term, city, state), term_results in zip(chunk, batch):
+                    if term_results is None:
+                        failures[(city, state)].add(term)
+                    elif term_results:
+                        results[(city, state)][term] = term_results
+                    else:
+                        self.logger.warning(f"No results found for term: '{term}' in {city}, {state}")
+            fallback = [market for market in markets if market in failed]
+            if fallback:
+                self.logger.warning(f"Serper batch failed for {len(fallback)} market(s); "
+                                    f"falling back to one query per request")
+        
+        fetched = await asyncio.gather(
+            *(self._search_terms_one_by_one(city, state) for city, state in fallback),
+            return_exceptions=True
+        )
+        for (city, state), market_fetch in zip(fallback, fetched):
+            if isinstance(market_fetch, Exception):
+                self.logger.error(f"Error fetching search results for {city}, {state}: {str(market_fetch)}")
+                market_fetch = ({}, set(self.search_terms))
+            results[(city, state)], failures[(city, state)] = market_fetch
+        
+        return results, failures
+
+    @property
+    def batching(self) -> bool:
+        """Whether queries are sent to Serper in batches."""
+        return self.batch_size > 1 and time.monotonic() >= self._batching_paused_until
+
+    def _pause_batching(self, reason: str):
+        self.logger.warning(f"Serper rejected a batch ({reason}); sending one query per request "
+                            f"for the next {BATCH_RETRY_SECONDS:.0f}s")
+        self._batching_paused_until = time.monotonic() + BATCH_RETRY_SECONDS
+
+    async def _search_terms_one_by_one(
+            self, city: str, state: str) -> Tuple[Dict[str, List[SearchResult]], Set[str]]:
+        """Get results for all predefined search terms, one request per term, a second apart, and the failed terms."""
         try:
             self.logger.info(f"Starting search term analysis for {city}, {state}")
             
             results = {}
+            failed = set()
             total_terms = len(self.search_terms)
             
             for idx, term in enumerate(self.search_terms, 1):
                 self.logger.info(f"Processing term {idx}/{total_terms}: '{term}'")
                 
                 term_results = await self.get_search_results(term, city, state)
-                if term_results:
+                if term_results is None:
+                    failed.add(term)
+                elif term_results:
                     results[term] = term_results
                 else:
                     self.logger.warning(f"No results found for term: '{term}'")
                 
                 if idx < total_terms:  # Don't sleep after the last term
+                    left = remaining()
+                    if (left is not None and left < 1) or circuit_breaker('serper').is_open():
+                        self.logger.warning(f"Stopping after {idx}/{total_terms} terms for {city}, {state}: "
+                                            f"request budget spent or Serper circuit open")
+                        failed.update(self.search_terms[idx:])
+                        break
                     await asyncio.sleep(1)  # Rate limiting
             
             self.logger.info(f"Completed search term analysis. Found results for {len(results)}/{total_terms} terms")
@@ -135,12 +309,50 @@ class SearchService:
             for term, term_results in results.items():
                 self.logger.info(f"Term '{term}': {len(term_results)} results")
             
-            return results
+            return results, failed
             
         except Exception as e:
             self.logger.error(f"Error in get_all_search_terms for {city}, {state}: {str(e)}")
             raise
 
+    def _payload(self, search_term: str, location: str) -> Dict:
+        """Serper query for a search term in a location."""
+        return {
+            "q": f"{search_term} {location}",
+            "num": 10,
+            "gl": "us",
+            "hl": "en",
+            "autocorrect": True
+        }
+
+    def _parse_results(self, data: Dict, search_term: str, location: str) -> List[SearchResult]:
+        """SearchResult objects from one query's Serper response."""
+        organic_results = data.get('organic', [])
+        
+        if not organic_results:
+            self.logger.warning(f"No organic results found for '{search_term}' in {location}")
+            return []
+        
+        results = []
+        for rank, result in enumerate(organic_results, 1):
+            url = result.get('link', '')
+            if not url:
+                continue
+                
+            domain = extract_base_domain(url)
+            if domain:
+                search_result = SearchResult(
+                    domain=domain,
+                    rank=rank,
+                    url=url,
+                    title=result.get('title', '')
+                )
+                results.append(search_result)
+                self.logger.debug(f"Found result: Rank {rank} - {domain}")
+        
+        self.logger.info(f"Retrieved {len(results)} results for '{search_term}' in {location}")
+        return results
+
     def _clean_search_term(self, term: str, location: str) -> str:
         """Clean and format search term with location."""
         cleaned_term = term.strip().lower()
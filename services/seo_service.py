@@ -6,20 +6,27 @@ import csv
 from io import StringIO
 from datetime import datetime, timedelta
 
-from config import SEMRUSH_API_KEY
+from config import SEMRUSH_API_KEY, SEMRUSH_BASE_URL, SEMRUSH_UNITS_PER_REQUEST
 from models import SEOMetrics
 from utils.domain_utils import extract_base_domain
+from utils.telemetry import TELEMETRY
+from utils.api_utils import LoopLocal, HTTPClientPool
+from utils.resilience import CircuitOpen, DeadlineExceeded, circuit_breaker, remaining
+
+# Shared by all instances so a persistent event loop reuses SEMrush connections
+_http_pool = HTTPClientPool()
 
 class SEOService:
     """Service for handling SEMrush API interactions and SEO metrics."""
     
     def __init__(self):
         self.api_key = SEMRUSH_API_KEY
-        self.base_url = "https://api.semrush.com"
+        self.base_url = SEMRUSH_BASE_URL
         self.logger = logging.getLogger(__name__)
         self.cache = {}
         self.cache_duration = timedelta(hours=24)
-        self._request_semaphore = asyncio.Semaphore(5)
+        self._request_semaphore = LoopLocal(lambda: asyncio.Semaphore(5))
+        self._http = _http_pool
         
     async def get_domain_metrics(self, domain: str) -> Optional[SEOMetrics]:
         """Get SEO metrics for a single domain using SEMrush Backlinks API."""
@@ -51,52 +58,62 @@ class SEOService:
             
             self.logger.debug(f"Making SEMrush API request for domain: {domain}")
             
-            async with self._request_semaphore:
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(
-                        f"{self.base_url}/analytics/v1/",
-                        params=params,
-                        timeout=30.0
-                    )
-                    
-                    # Log full request URL for debugging (remove sensitive info)
-                    debug_url = str(response.url).replace(self.api_key, 'API_KEY')
-                    self.logger.debug(f"SEMrush API URL: {debug_url}")
-                    
-                    if response.status_code != 200:
-                        self.logger.error(f"SEMrush API error: {response.status_code} - {response.text}")
-                        return None
-                    
-                    # Log raw response for debugging
-                    self.logger.debug(f"Raw response: {response.text}")
-                    
-                    try:
-                        # Parse CSV response
-                        csv_data = StringIO(response.text)
-                        reader = csv.reader(csv_data, delimiter=';')
-                        header = next(reader)  # Skip header
-                        self.logger.debug(f"CSV Headers: {header}")
-                        
-                        row = next(reader)
-                        self.logger.debug(f"Data row: {row}")
-                        
-                        # Create metrics object
-                        metrics = SEOMetrics(
-                            domain=domain,
-                            authority_score=float(row[1]) if row[1] and row[1] != "none" else 0.0,
-                            backlink_count=int(row[2]) if row[2] and row[2] != "none" else 0,
-                            referring_domains=int(row[3]) if row[3] and row[3] != "none" else 0
-                        )
-                        
-                        # Cache the result
-                        self._add_to_cache(cache_key, metrics)
-                        self.logger.debug(f"Successfully got metrics for {domain}: {metrics}")
-                        return metrics
-                        
-                    except (IndexError, ValueError) as e:
-                        self.logger.error(f"Error parsing SEMrush data for {domain}: {str(e)}")
-                        return None
+            with circuit_breaker('semrush').guard() as guarded:
+                async with self._request_semaphore.get():
+                    async with self._http.client() as client:
+                        async with TELEMETRY.track('semrush') as call:
+                            response = await guarded.within_budget(client.get(  # Never past the request's deadline
+                                f"{self.base_url}/analytics/v1/",
+                                params=params,
+                                timeout=guarded.timeout(30.0)
+                            ))
+                            call.status = response.status_code
+                guarded.failed = response.status_code >= 500 or response.status_code == 429
+            
+            # Log full request URL for debugging (remove sensitive info)
+            debug_url = str(response.url).replace(self.api_key, 'API_KEY')
+            self.logger.debug(f"SEMrush API URL: {debug_url}")
+            
+            if response.status_code != 200:
+                self.logger.error(f"SEMrush API error: {response.status_code} - {response.text}")
+                return None
+            
+            TELEMETRY.record_credits('semrush', SEMRUSH_UNITS_PER_REQUEST)
+
+            # Log raw response for debugging
+            self.logger.debug(f"Raw response: {response.text}")
+            
+            try:
+                # Parse CSV response
+                csv_data = StringIO(response.text)
+                reader = csv.reader(csv_data, delimiter=';')
+                header = next(reader)  # Skip header
+                self.logger.debug(f"CSV Headers: {header}")
+                
+                row = next(reader)
+                self.logger.debug(f"Data row: {row}")
+                
+                # Create metrics object
+                metrics = SEOMetrics(
+                    domain=domain,
+                    authority_score=float(row[1]) if row[1] and row[1] != "none" else 0.0,
+                    backlink_count=int(row[2]) if row[2] and row[2] != "none" else 0,
+                    referring_domains=int(row[3]) if row[3] and row[3] != "none" else 0
+                )
+                
+                # Cache the result
+                self._add_to_cache(cache_key, metrics)
+                self.logger.debug(f"Successfully got metrics for {domain}: {metrics}")
+                return metrics
+                
+            except (IndexError, ValueError) as e:
+                self.logger.error(f"Error parsing SEMrush data for {domain}: {str(e)}")
+                return None
 
+        except (CircuitOpen, DeadlineExceeded) as e:
+            # Fail fast; get_bulk_metrics returns the domains it already has
+            self.logger.debug(f"Skipping SEMrush request for {domain}: {str(e)}")
+            return None
         except httpx.RequestError as e:
             self.logger.error(f"SEMrush API request error for {domain}: {str(e)}")
             return None
@@ -136,18 +153,36 @@ class SEOService:
             
             # Add delay between chunks
             if i + chunk_size < len(domains_list):
+                left = remaining()
+                if (left is not None and left < 1) or circuit_breaker('semrush').is_open():
+                    self.logger.warning(f"Stopping after {processed}/{total_domains} domains: "
+                                        f"request budget spent or SEMrush circuit open")
+                    break
                 await asyncio.sleep(1)
         
         self.logger.info(f"Completed bulk metrics fetch. Got {len(results)} results out of {total_domains} domains")
         return results
 
+    def get_cached_metrics(self, domains: Set[str]) -> Dict[str, SEOMetrics]:
+        """Get SEO metrics for the domains that are already cached, without calling SEMrush."""
+        results = {}
+        for domain in domains:
+            cached = self._get_from_cache(f"metrics_{domain}")
+            if cached:
+                results[domain] = cached
+        return results
+
     def _get_from_cache(self, key: str) -> Optional[SEOMetrics]:
         """Get metrics from cache if still valid."""
         if key in self.cache:
             timestamp, value = self.cache[key]
             if datetime.now() - timestamp < self.cache_duration:
+                TELEMETRY.record_cache('semrush', 'hit')
                 return value
             del self.cache[key]
+            TELEMETRY.record_cache('semrush', 'stale')
+            return None
+        TELEMETRY.record_cache('semrush', 'miss')
         return None
 
     def _add_to_cache(self, key: str, value: SEOMetrics):
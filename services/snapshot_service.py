@@ -0,0 +1,291 @@
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from models import SearchResult
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS markets (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    term TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS domains (
+    id INTEGER PRIMARY KEY,
+    domain TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    market_id INTEGER NOT NULL REFERENCES markets (id),
+    taken_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_market_time ON snapshots (market_id, taken_at);
+CREATE TABLE IF NOT EXISTS ranks (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id),
+    term_id INTEGER NOT NULL REFERENCES terms (id),
+    rank INTEGER NOT NULL,
+    domain_id INTEGER NOT NULL REFERENCES domains (id),
+    url TEXT NOT NULL,
+    title TEXT NOT NULL,
+    PRIMARY KEY (snapshot_id, term_id, rank)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_ranks_domain ON ranks (domain_id, snapshot_id);
+"""
+
+class SnapshotStore:
+    """Append-only SQLite store of Serper results keyed by market, term and time."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.logger = logging.getLogger(__name__)
+        self._write_lock = threading.Lock()
+        # Interned name -> id lookups, per table
+        self._ids: Dict[str, Dict[str, int]] = {'markets': {}, 'terms': {}, 'domains': {}}
+
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=10.0)
+
+    @staticmethod
+    def _market_key(city: str, state: str) -> str:
+        return f"{city}, {state}".lower().strip()
+
+    def _intern(self, conn: sqlite3.Connection, table: str, column: str, value: str) -> int:
+        """Return the id for a market/term/domain name, inserting it if new."""
+        cache = self._ids[table]
+        if value in cache:
+            return cache[value]
+        conn.execute(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", (value,))
+        row_id = conn.execute(f"SELECT id FROM {table} WHERE {column} = ?", (value,)).fetchone()[0]
+        cache[value] = row_id
+        return row_id
+
+    def _lookup(self, conn: sqlite3.Connection, table: str, column: str, value: str) -> Optional[int]:
+        """Return the id for a name without inserting it."""
+        cache = self._ids[table]
+        if value in cache:
+            return cache[value]
+        row = conn.execute(f"SELECT id FROM {table} WHERE {column} = ?", (value,)).fetchone()
+        if row is None:
+            return None
+        cache[value] = row[0]
+        return row[0]
+
+    def record(self, city: str, state: str, search_results: Dict[str, List[SearchResult]],
+               taken_at: Optional[datetime] = None) -> int:
+        """
+        Append a snapshot of get_all_search_terms results for a market.
+
+        Args:
+            city: Market city
+            state: Market state code
+            search_results: Dictionary mapping search terms to their results
+            taken_at: Snapshot time, defaults to now
+
+        Returns:
+            The new snapshot id
+        """
+        taken_at = taken_at or datetime.now()
+        with self._write_lock, closing(self._connect()) as conn:
+            try:
+                with conn:
+                    snapshot_id, row_count = self._insert_snapshot(conn, city, state, search_results, taken_at)
+            except sqlite3.Error:
+                # Ids interned inside the rolled-back transaction are no longer valid
+                for cache in self._ids.values():
+                    cache.clear()
+                raise
+
+        self.logger.debug(f"Recorded snapshot {snapshot_id} for {city}, {state} with {row_count} ranks")
+        return snapshot_id
+
+    def _insert_snapshot(self, conn: sqlite3.Connection, city: str, state: str,
+                         search_results: Dict[str, List[SearchResult]], taken_at: datetime) -> Tuple[int, int]:
+        """Insert one snapshot and its ranks inside the caller's transaction."""
+        market_id = self._intern(conn, 'markets', 'name', self._market_key(city, state))
+        cursor = conn.execute(
+            "INSERT INTO snapshots (market_id, taken_at) VALUES (?, ?)",
+            (market_id, taken_at.timestamp())
+        )
+        snapshot_id = cursor.lastrowid
+
+        rows = []
+        for term, results in search_results.items():
+            term_id = self._intern(conn, 'terms', 'term', term)
+            for result in results:
+                domain_id = self._intern(conn, 'domains', 'domain', result.domain)
+                rows.append((snapshot_id, term_id, result.rank, domain_id, result.url, result.title))
+        conn.executemany(
+            "INSERT OR REPLACE INTO ranks (snapshot_id, term_id, rank, domain_id, url, title) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        return snapshot_id, len(rows)
+
+    def list_snapshots(self, city: str, state: str, since: Optional[datetime] = None,
+                       until: Optional[datetime] = None) -> List[Tuple[int, datetime]]:
+        """List (snapshot_id, taken_at) pairs for a market, oldest first."""
+        with closing(self._connect()) as conn:
+            market_id = self._lookup(conn, 'markets', 'name', self._market_key(city, state))
+            if market_id is None:
+                return []
+            rows = conn.execute(
+                "SELECT id, taken_at FROM snapshots "
+                "WHERE market_id = ? AND taken_at >= ? AND taken_at <= ? ORDER BY taken_at",
+                (
+                    market_id,
+                    since.timestamp() if since else float('-inf'),
+                    until.timestamp() if until else float('inf')
+                )
+            ).fetchall()
+        return [(snapshot_id, datetime.fromtimestamp(ts)) for snapshot_id, ts in rows]
+
+    def load(self, snapshot_id: int) -> Dict[str, List[SearchResult]]:
+        """Rebuild the get_all_search_terms result stored in a snapshot."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT t.term, r.rank, d.domain, r.url, r.title FROM ranks r "
+                "JOIN terms t ON t.id = r.term_id JOIN domains d ON d.id = r.domain_id "
+                "WHERE r.snapshot_id = ? ORDER BY r.term_id, r.rank",
+                (snapshot_id,)
+            ).fetchall()
+
+        results: Dict[str, List[SearchResult]] = {}
+        for term, rank, domain, url, title in rows:
+            results.setdefault(term, []).append(SearchResult(domain=domain, rank=rank, url=url, title=title))
+        return results
+
+    def latest(self, city: str, state: str,
+               max_age: Optional[timedelta] = None) -> Optional[Tuple[datetime, Dict[str, List[SearchResult]]]]:
+        """
+        Get the most recent snapshot for a market.
+
+        Args:
+            city: Market city
+            state: Market state code
+            max_age: Ignore snapshots older than this
+
+        Returns:
+            Tuple of (taken_at, search results) or None if no usable snapshot exists
+        """
+        with closing(self._connect()) as conn:
+            market_id = self._lookup(conn, 'markets', 'name', self._market_key(city, state))
+            if market_id is None:
+                return None
+            row = conn.execute(
+                "SELECT id, taken_at FROM snapshots WHERE market_id = ? ORDER BY taken_at DESC LIMIT 1",
+                (market_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        taken_at = datetime.fromtimestamp(row[1])
+        if max_age is not None and datetime.now() - taken_at > max_age:
+            return None
+        return taken_at, self.load(row[0])
+
+    def diff(self, old_snapshot_id: int, new_snapshot_id: int) -> List[Dict]:
+        """
+        Compute per-term rank changes between two snapshots.
+
+        Returns:
+            One entry per (term, domain) present in either snapshot with its old
+            and new rank (None when absent) and a status of new/dropped/moved/unchanged
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT r.snapshot_id, t.term, d.domain, MIN(r.rank) FROM ranks r "
+                "JOIN terms t ON t.id = r.term_id JOIN domains d ON d.id = r.domain_id "
+                "WHERE r.snapshot_id IN (?, ?) GROUP BY r.snapshot_id, r.term_id, r.domain_id",
+                (old_snapshot_id, new_snapshot_id)
+            ).fetchall()
+
+        ranks: Dict[Tuple[str, str], List[Optional[int]]] = {}
+        for snapshot_id, term, domain, rank in rows:
+            entry = ranks.setdefault((term, domain), [None, None])
+            entry[0 if snapshot_id == old_snapshot_id else 1] = rank
+
+        changes = []
+        for (term, domain), (old_rank, new_rank) in ranks.items():
+            if old_rank is None:
+                status = 'new'
+            elif new_rank is None:
+                status = 'dropped'
+            elif old_rank != new_rank:
+                status = 'moved'
+            else:
+                status = 'unchanged'
+            changes.append({
+                'term': term,
+                'domain': domain,
+                'old_rank': old_rank,
+                'new_rank': new_rank,
+                'change': old_rank - new_rank if old_rank is not None and new_rank is not None else None,
+                'status': status
+            })
+
+        changes.sort(key=lambda c: (c['term'], c['new_rank'] or c['old_rank']))
+        return changes
+
+    def diff_latest(self, city: str, state: str) -> List[Dict]:
+        """Diff the two most recent snapshots of a market."""
+        snapshots = self.list_snapshots(city, state)
+        if len(snapshots) < 2:
+            return []
+        return self.diff(snapshots[-2][0], snapshots[-1][0])
+
+    def rank_history(self, city: str, state: str, days: int = 90) -> List[Dict]:
+        """
+        Get every recorded rank for a market over the last `days` days.
+
+        Reads through idx_snapshots_market_time and the ranks primary key,
+        so cost scales with the market's history rather than the whole store.
+        """
+        since = (datetime.now() - timedelta(days=days)).timestamp()
+        with closing(self._connect()) as conn:
+            market_id = self._lookup(conn, 'markets', 'name', self._market_key(city, state))
+            if market_id is None:
+                return []
+            rows = conn.execute(
+                "SELECT s.taken_at, t.term, d.domain, r.rank FROM snapshots s "
+                "JOIN ranks r ON r.snapshot_id = s.id "
+                "JOIN terms t ON t.id = r.term_id JOIN domains d ON d.id = r.domain_id "
+                "WHERE s.market_id = ? AND s.taken_at >= ? ORDER BY s.taken_at, r.term_id, r.rank",
+                (market_id, since)
+            ).fetchall()
+        return [
+            {'taken_at': datetime.fromtimestamp(ts), 'term': term, 'domain': domain, 'rank': rank}
+            for ts, term, domain, rank in rows
+        ]
+
+    def domain_history(self, domain: str, since: Optional[datetime] = None,
+                       until: Optional[datetime] = None) -> List[Dict]:
+        """Get every recorded rank for a domain across markets within a time range."""
+        with closing(self._connect()) as conn:
+            domain_id = self._lookup(conn, 'domains', 'domain', domain)
+            if domain_id is None:
+                return []
+            rows = conn.execute(
+                "SELECT s.taken_at, m.name, t.term, r.rank FROM ranks r "
+                "JOIN snapshots s ON s.id = r.snapshot_id "
+                "JOIN markets m ON m.id = s.market_id JOIN terms t ON t.id = r.term_id "
+                "WHERE r.domain_id = ? AND s.taken_at >= ? AND s.taken_at <= ? ORDER BY s.taken_at",
+                (
+                    domain_id,
+                    since.timestamp() if since else float('-inf'),
+                    until.timestamp() if until else float('inf')
+                )
+            ).fetchall()
+        return [
+            {'taken_at': datetime.fromtimestamp(ts), 'market': market, 'term': term, 'rank': rank}
+            for ts, market, term, rank in rows
+        ]
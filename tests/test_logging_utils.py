@@ -0,0 +1,46 @@
+"""
+AsyncQueueHandler capturing log messages on the calling thread.
+"""
+import logging
+
+import pytest
+
+from utils.logging_utils import AsyncQueueHandler, Lazy
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+
+@pytest.fixture
+def logged():
+    target = ListHandler()
+    target.set_name('test-list')
+    handler = AsyncQueueHandler(['test-list'])
+    logger = logging.getLogger('tests.logging_utils')
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(handler)
+    try:
+        yield logger, handler, target.messages
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+
+def test_message_reflects_arguments_at_call_time(logged):
+    logger, handler, messages = logged
+    items = ['a']
+    logger.info("items %s, count %s", items, Lazy(len, items))
+    items.append('b')
+    handler.flush()
+    assert messages == ["items ['a'], count 1"]
+
+def test_queued_record_holds_no_arguments(logged):
+    _, handler, _ = logged
+    record = logging.LogRecord('tests.logging_utils', logging.INFO, __file__, 1, "x=%s", ({'x': 1},), None)
+    prepared = handler.prepare(record)
+    assert prepared.args is None
+    assert prepared.msg == prepared.getMessage() == "x={'x': 1}"
@@ -0,0 +1,72 @@
+"""
+Recall of the nationwide similarity index against a brute-force scan.
+
+Timings for the real dataset are in benchmarks/bench_national.py.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from config.schema import FEATURE_COLUMNS
+from engine.feature_presets import build_preset_matrices
+from engine.national_index import NationalIndex, brute_force_neighbors
+
+K = 10
+
+@pytest.fixture(scope='module')
+def matrix() -> np.ndarray:
+    """400 cities x 20 features driven by 6 latent factors, like census features are."""
+    rng = np.random.default_rng(0)
+    latent = rng.normal(size=(400, 6))
+    mixing = rng.normal(size=(6, len(FEATURE_COLUMNS)))
+    noise = rng.normal(scale=0.05, size=(400, len(FEATURE_COLUMNS)))
+    return (latent @ mixing + noise).astype(np.float32)
+
+def recall(matrix: np.ndarray, index: NationalIndex, position: int) -> float:
+    _, found = index.query(position, K)
+    expected_distances, _ = brute_force_neighbors(matrix, position, K)
+    # Ties at the k-th distance can be broken either way; any row within that distance is a hit
+    hits = np.linalg.norm(matrix[found] - matrix[position], axis=1) <= expected_distances[-1] + 1e-5
+    return hits.sum() / K
+
+def test_exact_index_matches_brute_force(matrix):
+    index = NationalIndex(matrix)
+    assert index.exact
+    for position in range(0, len(matrix), 37):
+        distances, positions = index.query(position, K)
+        expected_distances, _ = brute_force_neighbors(matrix, position, K)
+        assert positions[0] == position
+        np.testing.assert_allclose(distances, expected_distances, rtol=1e-5, atol=1e-5)
+        assert recall(matrix, index, position) == 1.0
+
+def test_pca_index_recall(matrix):
+    index = NationalIndex(matrix, n_components=8, oversample=16)
+    assert not index.exact
+    recalls = [recall(matrix, index, position) for position in range(0, len(matrix), 7)]
+    assert np.mean(recalls) >= 0.95
+
+def test_pca_distances_are_in_full_feature_space(matrix):
+    index = NationalIndex(matrix, n_components=4)
+    distances, positions = index.query(5, K)
+    np.testing.assert_allclose(distances, np.linalg.norm(matrix[positions] - matrix[5], axis=1), rtol=1e-6)
+    assert list(distances) == sorted(distances)
+
+def test_k_larger_than_matrix(matrix):
+    small = matrix[:6]
+    for index in (NationalIndex(small), NationalIndex(small, n_components=3)):
+        _, positions = index.query(0, K)
+        assert sorted(positions) == list(range(6))
+
+def test_preset_indexes_are_built_over_their_matrices():
+    rng = np.random.default_rng(1)
+    city_data = pd.DataFrame(rng.normal(size=(50, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS,
+                             index=[f"city {i}, st" for i in range(50)])
+    city_data.iloc[::7, 0] = np.nan
+    presets = build_preset_matrices(city_data, {'flat': {}, 'heavy': {'weights': {FEATURE_COLUMNS[0]: 5}}})
+    for name in ('flat', 'heavy'):
+        matrix = presets.matrices[name]
+        assert not np.isnan(matrix).any()
+        assert presets.indexes[name].matrix is matrix
+        _, positions = presets.indexes[name].query(3, K)
+        _, expected = brute_force_neighbors(matrix, 3, K)
+        assert set(positions) == set(expected)
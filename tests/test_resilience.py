@@ -0,0 +1,93 @@
+"""
+Request budgets cutting off slow upstream calls, and disconnect cancellation under gunicorn.
+"""
+import asyncio
+import json
+import socket
+import time
+
+import pytest
+from flask import Flask
+
+import utils.resilience as resilience
+from benchmarks.standins import SerperHandler, StandInServer
+from services.search_service import SearchService
+from utils.resilience import ClientDisconnected, GUNICORN_SOCKET_ENVIRON_KEY, deadline, request_budget
+
+class TrickleSerperHandler(SerperHandler):
+    """Answers a query one byte every 100 ms, well inside any per-read timeout."""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.count('requests')
+        answer = json.dumps(self.search(json.loads(body))).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(answer)))
+        self.end_headers()
+        try:
+            for i in range(len(answer)):
+                self.wfile.write(answer[i:i + 1])
+                self.wfile.flush()
+                time.sleep(0.1)
+        except OSError:
+            pass  # The client gave up
+
+def test_budget_cuts_off_trickling_response():
+    server = StandInServer(TrickleSerperHandler).start()
+    try:
+        service = SearchService()
+        service.base_url = f"{server.url}/search"
+
+        async def search():
+            with deadline(0.5):
+                return await service.get_search_results('we buy houses', 'Austin', 'TX')
+
+        start = time.perf_counter()
+        results = asyncio.run(search())
+        elapsed = time.perf_counter() - start
+    finally:
+        server.stop()
+    assert results is None
+    assert elapsed < 2.0
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(resilience, 'DISCONNECT_POLL_SECONDS', 0.05)
+    app = Flask(__name__)
+    app.testing = True  # Let ClientDisconnected reach the test
+
+    @app.route('/slow')
+    @request_budget(0)
+    async def slow():
+        await asyncio.sleep(10)
+        return 'done'
+
+    @app.route('/fast')
+    @request_budget(0)
+    async def fast():
+        await asyncio.sleep(0.2)
+        return 'done'
+
+    return app
+
+def test_gunicorn_disconnect_cancels_view(app):
+    server_end, client_end = socket.socketpair()
+    client_end.close()
+    try:
+        start = time.perf_counter()
+        with pytest.raises(ClientDisconnected):
+            app.test_client().get('/slow', environ_base={GUNICORN_SOCKET_ENVIRON_KEY: server_end})
+        assert time.perf_counter() - start < 2.0
+    finally:
+        server_end.close()
+
+def test_connected_gunicorn_client_is_served(app):
+    server_end, client_end = socket.socketpair()
+    try:
+        response = app.test_client().get('/fast', environ_base={GUNICORN_SOCKET_ENVIRON_KEY: server_end})
+    finally:
+        server_end.close()
+        client_end.close()
+    assert response.status_code == 200
+    assert response.data == b'done'
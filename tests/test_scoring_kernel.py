@@ -0,0 +1,63 @@
+"""
+Golden parity of the opportunity scoring kernel with the original pandas implementation.
+
+The reference (legacy_score) and the timings live in benchmarks/bench_scoring.py.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.bench_scoring import compare, edge_cases, legacy_score
+from config.schema import GA4_COLUMNS
+from engine.opportunity_engine import OpportunityEngine
+
+RTOL = 1e-6
+
+def neighborhood(seed: int, size: int = 12):
+    """A synthetic neighborhood as find_similar_cities hands it to the opportunity engine, and its target."""
+    rng = np.random.default_rng(seed)
+    index = [f"city {seed}-{i}, st" for i in range(size)]
+    df = pd.DataFrame({
+        'city': [f"City {seed}-{i}" for i in range(size)],
+        'state_id': 'ST',
+        'housing_units': rng.integers(500, 200_000, size).astype(np.float64),
+        'distance_to_target': np.sort(rng.uniform(0, 100, size)),
+        'similarity_score': rng.uniform(0, 5, size),
+    }, index=index)
+    df.loc[index[0], 'similarity_score'] = 0.0
+    for column in GA4_COLUMNS:
+        scale = 1.0 if column.startswith('cvr') else 1000.0
+        df[column] = rng.uniform(0, scale, size)
+    df['unique_sites'] = rng.integers(1, 40, size).astype(np.float64)
+    return df, index[0]
+
+@pytest.fixture
+def engine() -> OpportunityEngine:
+    return OpportunityEngine()
+
+@pytest.mark.parametrize('seed', range(5))
+def test_kernel_matches_legacy(engine, seed):
+    df, target = neighborhood(seed)
+    expected = legacy_score(df.copy(), target)
+    actual, std_columns = engine.calculate_opportunity_score(df.copy(), target)
+    assert compare(expected, actual, RTOL) == []
+    assert std_columns == [col for col in expected.columns if col.startswith('std_')]
+
+# zero_housing_units is left out: the infinite penetration makes every score NaN, and pd.qcut raises on
+# the legacy side, so there is no golden output to compare with
+@pytest.mark.parametrize('case', ['missing_ga4_rows', 'no_similarity_column', 'all_nan_similarity',
+                                  'target_outside'])
+def test_kernel_matches_legacy_on_edge_cases(engine, case):
+    df, target = edge_cases([neighborhood(7)])[case]
+    expected = legacy_score(df.copy(), target)
+    actual, _ = engine.calculate_opportunity_score(df.copy(), target)
+    assert compare(expected, actual, RTOL) == []
+
+def test_batched_scores_match_single(engine):
+    # Different sizes, so the batch is padded
+    neighborhoods = [neighborhood(seed, size) for seed, size in zip(range(4), (12, 5, 20, 9))]
+    frames, targets = [df for df, _ in neighborhoods], [target for _, target in neighborhoods]
+    batched = engine.calculate_opportunity_scores([df.copy() for df in frames], targets)
+    for (df, target), actual in zip(neighborhoods, batched):
+        single, _ = engine.calculate_opportunity_score(df.copy(), target)
+        assert compare(single, actual, RTOL) == []
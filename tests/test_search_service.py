@@ -0,0 +1,170 @@
+"""
+Serper batching and failed-term reporting in SearchService against local Serper stand-ins.
+
+Request counts and wall time at scale are in benchmarks/bench_serper_batch.py.
+"""
+import asyncio
+import json
+from datetime import timedelta
+
+import pytest
+
+import engine.search_engine as search_engine
+import services.search_service as search_service
+from benchmarks.standins import SerperHandler, SingleQuerySerperHandler, StandInServer
+from services.search_service import SearchService
+
+MARKETS = [('Austin', 'TX'), ('Boise', 'ID')]
+
+class FailingBatchSerperHandler(SerperHandler):
+    """Answers single queries, but fails every batch with a server error."""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.count('requests')
+        query = json.loads(body)
+        if isinstance(query, list):
+            self._send(500, b'Internal Server Error', 'text/plain')
+            return
+        self._send(200, json.dumps(self.search(query)).encode(), 'application/json')
+
+class ShortBatchSerperHandler(SerperHandler):
+    """Answers a batch with one result fewer than it asked for."""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.count('requests')
+        query = json.loads(body)
+        if isinstance(query, list):
+            answer = [self.search(q) for q in query[:-1]]
+        else:
+            answer = self.search(query)
+        self._send(200, json.dumps(answer).encode(), 'application/json')
+
+class NoResultsForTermSerperHandler(SerperHandler):
+    """Has no organic results for 'we buy houses' anywhere."""
+
+    @staticmethod
+    def search(query: dict) -> dict:
+        answer = SerperHandler.search(query)
+        if query.get('q', '').startswith('we buy houses '):
+            answer['organic'] = []
+        return answer
+
+class ForbiddenSerperHandler(SerperHandler):
+    """Rejects every request, as Serper does for a bad API key."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.count('requests')
+        self._send(403, b'{"message": "Unauthorized"}', 'application/json')
+
+@pytest.fixture(scope='module')
+def serper():
+    server = StandInServer(SerperHandler).start()
+    yield server
+    server.stop()
+
+def service_for(server: StandInServer, **kwargs) -> SearchService:
+    service = SearchService(**kwargs)
+    service.base_url = f"{server.url}/search"
+    return service
+
+def fetch(server: StandInServer, service: SearchService, markets=MARKETS):
+    """Results of get_search_terms_for_markets and the requests the stand-in received for them."""
+    before = server.stats['requests']
+    results = asyncio.run(service.get_search_terms_for_markets(markets))
+    return results, server.stats['requests'] - before
+
+@pytest.fixture(scope='module')
+def expected(serper):
+    """One query per request, as before batching."""
+    results, requests = fetch(serper, service_for(serper, batch_size=0))
+    assert requests == len(MARKETS) * 3
+    assert all(len(terms) == 3 for terms in results.values())
+    return results
+
+def test_batch_matches_single_queries(serper, expected):
+    results, requests = fetch(serper, service_for(serper))
+    assert results == expected
+    assert requests == 1
+
+def test_small_batches(serper, expected):
+    results, requests = fetch(serper, service_for(serper, batch_size=4))
+    assert results == expected
+    assert requests == 2  # 6 queries in batches of 4
+
+def test_one_market_in_one_request(serper, expected):
+    service = service_for(serper)
+    before = serper.stats['requests']
+    results = asyncio.run(service.get_all_search_terms(*MARKETS[0]))
+    assert results == expected[MARKETS[0]]
+    assert serper.stats['requests'] - before == 1
+
+def test_rejected_array_falls_back_and_pauses_batching(expected):
+    server = StandInServer(SingleQuerySerperHandler).start()
+    try:
+        service = service_for(server)
+        results, requests = fetch(server, service)
+    finally:
+        server.stop()
+    assert results == expected
+    assert requests == 1 + len(MARKETS) * 3
+    assert not service.batching
+
+@pytest.mark.parametrize('handler', [FailingBatchSerperHandler, ShortBatchSerperHandler])
+def test_failed_batch_falls_back_without_pausing(expected, handler):
+    server = StandInServer(handler).start()
+    try:
+        service = service_for(server)
+        results, requests = fetch(server, service, MARKETS[:1])
+    finally:
+        server.stop()
+    assert results == {MARKETS[0]: expected[MARKETS[0]]}
+    assert requests == 1 + 3
+    assert service.batching
+
+def test_batching_resumes_after_pause(monkeypatch):
+    service = SearchService()
+    monkeypatch.setattr(search_service, 'BATCH_RETRY_SECONDS', 0.0)
+    service._pause_batching('test')
+    assert service.batching
+    monkeypatch.setattr(search_service, 'BATCH_RETRY_SECONDS', 600.0)
+    service._pause_batching('test')
+    assert not service.batching
+    assert not SearchService(batch_size=1).batching
+
+@pytest.mark.parametrize('batch_size', [0, 100])
+def test_term_without_results_is_not_a_failure(batch_size):
+    server = StandInServer(NoResultsForTermSerperHandler).start()
+    try:
+        service = service_for(server, batch_size=batch_size)
+        results, failures = asyncio.run(service.get_search_terms_with_failures(MARKETS[:1]))
+    finally:
+        server.stop()
+    assert sorted(results[MARKETS[0]]) == sorted(set(service.search_terms) - {'we buy houses'})
+    assert failures == {MARKETS[0]: set()}
+
+@pytest.mark.parametrize('batch_size', [0, 100])
+def test_failed_terms_are_reported(batch_size):
+    server = StandInServer(ForbiddenSerperHandler).start()
+    try:
+        service = service_for(server, batch_size=batch_size)
+        results, failures = asyncio.run(service.get_search_terms_with_failures(MARKETS[:1]))
+    finally:
+        server.stop()
+    assert results == {MARKETS[0]: {}}
+    assert failures == {MARKETS[0]: set(service.search_terms)}
+
+@pytest.mark.parametrize('handler, recorded', [(NoResultsForTermSerperHandler, True), (ForbiddenSerperHandler, False)])
+def test_snapshot_recorded_only_without_failed_terms(monkeypatch, tmp_path, handler, recorded):
+    monkeypatch.setattr(search_engine, 'SERP_SNAPSHOT_DB_PATH', str(tmp_path / 'snapshots.sqlite3'))
+    engine = search_engine.SearchEngine()
+    engine.snapshot_max_age = timedelta(hours=1)
+    server = StandInServer(handler).start()
+    try:
+        engine.search_service.base_url = f"{server.url}/search"
+        asyncio.run(engine._get_search_results(*MARKETS[0]))
+    finally:
+        server.stop()
+    assert (engine.snapshot_store.latest(*MARKETS[0]) is not None) == recorded
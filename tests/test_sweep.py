@@ -0,0 +1,34 @@
+"""
+Radius sweeps degrading per radius when one neighborhood cannot be built.
+"""
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate
+from engine.market_engine import MarketAnalysisEngine
+
+RADII = [25, 100, 400]
+
+@pytest.fixture(scope='module')
+def engine_and_target(tmp_path_factory):
+    info = generate(0.01, str(tmp_path_factory.mktemp('data')))
+    cities = pd.read_csv(info['city_data_path'])
+    target = cities.iloc[0]
+    # No city within the smallest radius has a median age, so imputing it fails there and only there
+    distances = MarketAnalysisEngine.haversine_distances(cities[['lat', 'lng']].values, (target['lat'], target['lng']))
+    cities.loc[distances <= RADII[0], 'age_median'] = float('nan')
+    cities.to_csv(info['city_data_path'], index=False)
+    engine = MarketAnalysisEngine(info['city_data_path'], info['ga4_data_path'], ga4_delta_dir=None,
+                                  result_cache_size=0)
+    return engine, target['city'], target['state_id']
+
+@pytest.mark.filterwarnings('ignore:Skipping features without any observed values')
+def test_failing_radius_does_not_abort_sweep(engine_and_target):
+    engine, city, state = engine_and_target
+    with pytest.raises(ValueError):
+        engine.find_similar_cities(city, state, radius_miles=RADII[0])
+    results = engine.sweep_similar_cities(city, state, RADII)
+    assert list(results) == RADII
+    assert isinstance(results[RADII[0]], ValueError)
+    for radius in RADII[1:]:
+        pd.testing.assert_frame_equal(results[radius], engine.find_similar_cities(city, state, radius_miles=radius))
@@ -1,5 +1,8 @@
 from .domain_utils import extract_base_domain, is_ibuyer, deduplicate_domains
-from .api_utils import handle_api_error, rate_limit_decorator
+from .api_utils import (
+    handle_api_error, rate_limit_decorator, LoopLocal, HTTPClientPool,
+    register_persistent_loop, close_client_pools
+)
 from .chart_utils import create_market_chart
 
 __all__ = [
@@ -8,5 +11,9 @@ __all__ = [
     'deduplicate_domains',
     'handle_api_error',
     'rate_limit_decorator',
+    'LoopLocal',
+    'HTTPClientPool',
+    'register_persistent_loop',
+    'close_client_pools',
     'create_market_chart'
 ]
\ No newline at end of file
@@ -0,0 +1,205 @@
+"""
+Admission control and graceful degradation for the analysis endpoints.
+
+Each worker runs at most max_in_flight analyses at once. Further requests
+wait in a bounded queue for a slot, for at most max_wait seconds, and are
+admitted in arrival order. A request that finds the queue full, or whose
+expected wait already exceeds max_wait, is shed at once with 429 Too Many
+Requests and a Retry-After estimate. It does not hold a worker until
+gunicorn's timeout kills everyone's request.
+
+Admitted requests also get a degradation tier from the worker's load (in
+flight plus queued, as a share of slots plus queue). Each tier skips more
+optional work (DEGRADATION_TIERS), so analyses finish sooner under load and
+the queue drains.
+"""
+import functools
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional, Sequence
+
+from flask import after_this_request, current_app, g, request
+from werkzeug.exceptions import TooManyRequests
+
+from .metrics import REGISTRY
+
+# Optional work skipped from each tier on, in order: tier 2 skips the first two
+DEGRADATION_TIERS = ['competitor_seo', 'map', 'live_serp']
+DEGRADATION_HEADER = 'X-Degraded'
+
+ADMISSION_REQUESTS = REGISTRY.counter(
+    'admission_requests_total',
+    'Analysis requests by admission outcome (admitted, queue_full, wait_exceeded, timed_out)',
+    ['endpoint', 'outcome']
+)
+DEGRADED_REQUESTS = REGISTRY.counter(
+    'degraded_requests_total',
+    'Admitted analyses served with optional work skipped, by degradation tier',
+    ['endpoint', 'tier']
+)
+QUEUE_WAIT = REGISTRY.histogram(
+    'admission_queue_wait_seconds',
+    'Time analyses waited for a slot before being admitted or shed',
+    ['endpoint']
+)
+IN_FLIGHT = REGISTRY.gauge('admission_in_flight', 'Analyses running in this worker')
+QUEUED = REGISTRY.gauge('admission_queued', 'Analyses waiting for a slot in this worker')
+
+class Overloaded(TooManyRequests):
+    """A request shed by admission control; retry_after is the suggested wait in seconds."""
+
+    def __init__(self, retry_after: int, reason: str):
+        super().__init__(description=f"The server is busy ({reason}); retry in {retry_after}s.",
+                         retry_after=retry_after)
+        self.reason = reason
+
+class AdmissionController:
+    """Bounds concurrent analyses per worker, queues a few, and sheds or degrades the rest."""
+
+    def __init__(self, max_in_flight: int = 8, max_queue: int = 16, max_wait: float = 10.0,
+                 degrade_at: Sequence[float] = (0.5, 0.75, 0.9)):
+        """
+        Args:
+            max_in_flight: Analyses run at once (0 = no admission control)
+            max_queue: Analyses allowed to wait for a slot
+            max_wait: Longest a request waits for a slot before it is shed, in seconds
+            degrade_at: Load (0-1) at which each tier in DEGRADATION_TIERS starts
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.degrade_at = sorted(degrade_at)[:len(DEGRADATION_TIERS)]
+        self.in_flight = 0
+        # One ticket per waiting request, oldest first; only the head may take a freed slot
+        self._waiting: deque = deque()
+        # Moving average of how long an admitted analysis holds its slot; None until one finishes
+        self.service_time: Optional[float] = None
+        self._cond = threading.Condition()
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_in_flight > 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiting)
+
+    def load(self) -> float:
+        """Occupancy of the worker: in flight plus queued, over slots plus queue."""
+        return (self.in_flight + self.queued) / (self.max_in_flight + self.max_queue)
+
+    def tier(self, load: float) -> int:
+        """Degradation tier for a load: how many of DEGRADATION_TIERS to skip."""
+        return sum(load >= threshold for threshold in self.degrade_at)
+
+    def expected_wait(self, position: int) -> float:
+        """Rough wait for the request at a queue position (1 = next), from the average service time."""
+        if self.service_time is None:
+            return 0.0
+        return self.service_time * position / self.max_in_flight
+
+    def retry_after(self) -> int:
+        """Seconds a shed client should wait: roughly until the current queue has drained."""
+        estimate = self.expected_wait(self.queued + 1) if self.service_time is not None else self.max_wait
+        return max(1, math.ceil(estimate))
+
+    def acquire(self, endpoint: str) -> int:
+        """
+        Take a slot, waiting in the queue if need be.
+
+        Returns:
+            The degradation tier for the admitted request
+
+        Raises:
+            Overloaded: The queue is full, the expected wait is too long, or max_wait passed
+        """
+        start = time.monotonic()
+        with self._cond:
+            if self.in_flight >= self.max_in_flight or self._waiting:
+                position = self.queued + 1
+                if position > self.max_queue:
+                    self._shed(endpoint, 'queue_full', 0.0)
+                if self.expected_wait(position) > self.max_wait:
+                    self._shed(endpoint, 'wait_exceeded', 0.0)
+                ticket = object()
+                self._waiting.append(ticket)
+                QUEUED.set(self.queued)
+                try:
+                    # A freed slot goes to the oldest waiter, never to whichever thread wakes first
+                    while self._waiting[0] is not ticket or self.in_flight >= self.max_in_flight:
+                        remaining = self.max_wait - (time.monotonic() - start)
+                        if remaining <= 0:
+                            self._shed(endpoint, 'timed_out', time.monotonic() - start)
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting.remove(ticket)
+                    QUEUED.set(self.queued)
+                    # Admitted or shed, the next waiter may now be at the head with a slot free
+                    self._cond.notify_all()
+            self.in_flight += 1
+            IN_FLIGHT.set(self.in_flight)
+            tier = self.tier(self.load())
+
+        QUEUE_WAIT.observe(time.monotonic() - start, endpoint=endpoint)
+        ADMISSION_REQUESTS.inc(endpoint=endpoint, outcome='admitted')
+        if tier:
+            DEGRADED_REQUESTS.inc(endpoint=endpoint, tier=str(tier))
+        return tier
+
+    def release(self, held: float):
+        """Give back a slot held for `held` seconds and wake the waiting requests to find the head."""
+        with self._cond:
+            self.in_flight -= 1
+            IN_FLIGHT.set(self.in_flight)
+            self.service_time = held if self.service_time is None else 0.8 * self.service_time + 0.2 * held
+            self._cond.notify_all()
+
+    def _shed(self, endpoint: str, reason: str, waited: float):
+        # Called with the lock held
+        retry_after = self.retry_after()
+        ADMISSION_REQUESTS.inc(endpoint=endpoint, outcome=reason)
+        if waited:
+            QUEUE_WAIT.observe(waited, endpoint=endpoint)
+        self.logger.warning("Shedding %s request (%s): %d in flight, %d queued, retry after %ds",
+                            endpoint, reason, self.in_flight, self.queued, retry_after)
+        raise Overloaded(retry_after, reason)
+
+    def admit(self, func: Callable) -> Callable:
+        """
+        Decorate a Flask view so it runs only once admitted.
+
+        The wrapper is synchronous even for async views: a queued request
+        waits on its own thread (or greenlet), never on an event loop that
+        other requests share. Returns the view itself when disabled.
+        """
+        if not self.enabled:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tier = self.acquire(request.endpoint or func.__name__)
+            g.degradation_tier = tier
+            if tier:
+                @after_this_request
+                def add_degraded_header(response):
+                    response.headers[DEGRADATION_HEADER] = ','.join(DEGRADATION_TIERS[:tier])
+                    return response
+
+            start = time.monotonic()
+            try:
+                return current_app.ensure_sync(func)(*args, **kwargs)
+            finally:
+                self.release(time.monotonic() - start)
+        return wrapper
+
+def degraded_features() -> List[str]:
+    """The optional work skipped for the current request."""
+    return DEGRADATION_TIERS[:g.get('degradation_tier', 0)]
+
+def degraded(feature: str) -> bool:
+    """Whether the current request's degradation tier skips `feature` (one of DEGRADATION_TIERS)."""
+    return feature in degraded_features()
@@ -1,7 +1,11 @@
 import functools
 import asyncio
 import logging
+import weakref
+from contextlib import asynccontextmanager
 from typing import Callable
+
+import httpx
 from httpx import RequestError
 
 logger = logging.getLogger(__name__)
@@ -26,4 +30,69 @@ async def rate_limit_decorator(func: Callable, delay: float = 1.0):
     async def wrapper(*args, **kwargs):
         await asyncio.sleep(delay)
         return await func(*args, **kwargs)
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+class LoopLocal:
+    """
+    One instance of a loop-bound object (semaphore, HTTP client) per event loop.
+
+    asyncio primitives must not be shared between event loops, and a service
+    may be called from the persistent loop of an ASGI worker or from the
+    short-lived loops Flask creates for async views under WSGI.
+    """
+
+    def __init__(self, factory: Callable):
+        self.factory = factory
+        self._values = weakref.WeakKeyDictionary()
+
+    def get(self):
+        loop = asyncio.get_running_loop()
+        value = self._values.get(loop)
+        if value is None:
+            value = self._values[loop] = self.factory()
+        return value
+
+    def pop(self):
+        """Remove and return the current loop's instance, if any."""
+        return self._values.pop(asyncio.get_running_loop(), None)
+
+# Event loops that outlive a single request (ASGI workers); clients are pooled only on these
+_persistent_loops = weakref.WeakSet()
+_client_pools = weakref.WeakSet()
+
+def register_persistent_loop(loop: asyncio.AbstractEventLoop):
+    """Mark `loop` as long-lived so HTTPClientPool keeps connections open on it."""
+    _persistent_loops.add(loop)
+
+async def close_client_pools():
+    """Close the pooled clients of every HTTPClientPool on the running loop."""
+    _persistent_loops.discard(asyncio.get_running_loop())
+    for pool in list(_client_pools):
+        await pool.aclose()
+
+class HTTPClientPool:
+    """
+    Hands out httpx.AsyncClient instances.
+
+    On a persistent loop every call shares one client, and so its connection
+    pool; on any other loop each call gets a fresh client that is closed
+    afterwards, since the loop will not be reused.
+    """
+
+    def __init__(self, **client_kwargs):
+        self.client_kwargs = client_kwargs
+        self._clients = LoopLocal(lambda: httpx.AsyncClient(**self.client_kwargs))
+        _client_pools.add(self)
+
+    @asynccontextmanager
+    async def client(self):
+        if asyncio.get_running_loop() in _persistent_loops:
+            yield self._clients.get()
+        else:
+            async with httpx.AsyncClient(**self.client_kwargs) as client:
+                yield client
+
+    async def aclose(self):
+        client = self._clients.pop()
+        if client is not None:
+            await client.aclose()
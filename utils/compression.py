@@ -0,0 +1,145 @@
+"""
+Response compression: gzip, or brotli when the optional brotli package is installed.
+
+ResponseCompressor picks an encoding from the request's Accept-Encoding and
+compresses a Flask response in place. Buffered bodies are compressed in one
+go if they are at least min_size bytes. Streamed bodies (e.g. /export) are
+compressed chunk by chunk, with a flush after every chunk, so each chunk
+still reaches the client as soon as it is produced.
+
+Responses that already carry a Content-Encoding (precompressed static
+assets), file responses, and types that do not compress (Parquet, images)
+are left alone.
+"""
+import logging
+import zlib
+from typing import Iterable, Iterator, List, Optional
+
+from flask import Request, Response
+
+from .metrics import REGISTRY, span
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSED_BYTES = REGISTRY.counter(
+    'http_compression_bytes_total',
+    'Response body bytes before and after compression',
+    ['encoding', 'stage']
+)
+
+# Mimetypes worth compressing; everything else is sent as is
+COMPRESSIBLE_TYPES = frozenset([
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'text/javascript', 'text/xml',
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+])
+
+def available_encodings() -> List[str]:
+    """Encodings this process can produce, most preferred first."""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+class _Encoder:
+    """Incremental gzip or brotli encoder."""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits 31: deflate with a gzip header and trailer
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        """Compress data; with flush, everything compressed so far is emitted."""
+        if self.encoding == 'br':
+            return self._brotli.process(data) + (self._brotli.flush() if flush else b'')
+        return self._zlib.compress(data) + (self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else b'')
+
+    def finish(self) -> bytes:
+        return self._brotli.finish() if self.encoding == 'br' else self._zlib.flush()
+
+class ResponseCompressor:
+    """Compresses dynamic Flask responses according to the client's Accept-Encoding."""
+
+    def __init__(self, min_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        """
+        Args:
+            min_size: Smallest buffered body to compress, in bytes; streamed bodies are always compressed
+            gzip_level: zlib level for gzip (1-9; 0 turns compression off)
+            brotli_quality: Brotli quality (0-11); dynamic responses favour speed over ratio
+        """
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.logger = logging.getLogger(__name__)
+
+    def choose_encoding(self, request: Request) -> Optional[str]:
+        """The best encoding the client accepts, or None."""
+        if not self.gzip_level:
+            return None
+        return request.accept_encodings.best_match(available_encodings())
+
+    def compress(self, request: Request, response: Response) -> Response:
+        """Compress response for request if the client, the status and the content allow it."""
+        if (not self.gzip_level or response.mimetype not in COMPRESSIBLE_TYPES
+                or response.status_code < 200 or response.status_code in (204, 304)):
+            return response
+        # Precompressed or file-backed bodies are left as they are
+        if response.direct_passthrough or 'Content-Encoding' in response.headers:
+            return response
+        if 'no-transform' in (response.headers.get('Cache-Control') or ''):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self.choose_encoding(request)
+        if encoding is None or request.method == 'HEAD':
+            return response
+
+        if response.is_streamed:
+            response.response = self._stream(response.response, _Encoder(encoding, self.gzip_level,
+                                                                          self.brotli_quality))
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            with span('compress'):
+                encoder = _Encoder(encoding, self.gzip_level, self.brotli_quality)
+                compressed = encoder.compress(data) + encoder.finish()
+            if len(compressed) >= len(data):
+                return response
+            COMPRESSED_BYTES.inc(len(data), encoding=encoding, stage='raw')
+            COMPRESSED_BYTES.inc(len(compressed), encoding=encoding, stage='compressed')
+            response.set_data(compressed)
+
+        response.headers['Content-Encoding'] = encoding
+        if response.headers.get('ETag'):
+            # A compressed body is a different representation
+            etag, weak = response.get_etag()
+            response.set_etag(f"{etag}-{encoding}", weak=weak)
+        return response
+
+    @staticmethod
+    def _stream(chunks: Iterable, encoder: _Encoder) -> Iterator[bytes]:
+        raw = compressed = 0
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                if not chunk:
+                    continue
+                out = encoder.compress(chunk, flush=True)
+                raw += len(chunk)
+                compressed += len(out)
+                yield out
+            out = encoder.finish()
+            compressed += len(out)
+            yield out
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+            COMPRESSED_BYTES.inc(raw, encoding=encoder.encoding, stage='raw')
+            COMPRESSED_BYTES.inc(compressed, encoding=encoder.encoding, stage='compressed')
@@ -0,0 +1,77 @@
+"""
+Schema-driven loaders for cities.csv and ga4data.csv.
+
+Types are validated and coerced once at load (see config/schema.py), so the
+request path can rely on compact numeric dtypes and interned city_state keys.
+"""
+import logging
+import sys
+from typing import Dict, List
+
+import pandas as pd
+
+from config.schema import CITY_SCHEMA, CITY_REQUIRED_COLUMNS, GA4_SCHEMA, GA4_REQUIRED_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+def city_state_keys(values: pd.Series) -> pd.Series:
+    """Normalize "City, ST" strings to lookup keys, interning each one."""
+    normalized = values.astype(str).str.lower().str.strip()
+    return pd.Series([sys.intern(key) for key in normalized], index=values.index, dtype=object)
+
+def read_with_schema(path: str, schema: Dict[str, str], required: List[str]) -> pd.DataFrame:
+    """
+    Read the schema's columns from a CSV file and coerce them to the declared dtypes.
+
+    Args:
+        path: CSV file path
+        schema: Column name -> dtype ('object', 'category' or a numpy numeric dtype)
+        required: Columns that must be present
+
+    Returns:
+        DataFrame with the schema's columns that exist in the file
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    missing = [column for column in required if column not in header]
+    if missing:
+        raise ValueError(f"{path} is missing required columns: {missing}")
+
+    usecols = [column for column in schema if column in header]
+    text_columns = {column: str for column in usecols if schema[column] in ('object', 'category')}
+    df = pd.read_csv(path, usecols=usecols, dtype=text_columns)
+
+    for column in usecols:
+        dtype = schema[column]
+        if dtype == 'object':
+            continue
+        if dtype == 'category':
+            df[column] = df[column].astype('category')
+            continue
+
+        values = pd.to_numeric(df[column], errors='coerce')
+        invalid = int((values.isna() & df[column].notna()).sum())
+        if invalid:
+            logger.warning("Found %d non-numeric values in %s", invalid, column)
+        if dtype.startswith('int'):
+            missing_values = int(values.isna().sum())
+            if missing_values:
+                logger.warning("Filling %d missing values in %s with 0", missing_values, column)
+                values = values.fillna(0)
+        df[column] = values.astype(dtype)
+    return df
+
+def load_city_data(path: str) -> pd.DataFrame:
+    """Load cities.csv with a city_state key column."""
+    df = read_with_schema(path, CITY_SCHEMA, CITY_REQUIRED_COLUMNS)
+    df['city_state'] = city_state_keys(df['city'] + ', ' + df['state_id'].astype(str))
+    return df
+
+def load_ga4_data(path: str) -> pd.DataFrame:
+    """Load ga4data.csv with a normalized city_state key column."""
+    df = read_with_schema(path, GA4_SCHEMA, GA4_REQUIRED_COLUMNS)
+    df['city_state'] = city_state_keys(df['city_state'])
+    return df
+
+def frame_memory(df: pd.DataFrame) -> int:
+    """Deep memory footprint of a DataFrame (including its index) in bytes."""
+    return int(df.memory_usage(deep=True, index=True).sum())
@@ -1,3 +1,4 @@
+import os
 from typing import List
 from urllib.parse import urlparse
 import tldextract
@@ -0,0 +1,116 @@
+"""
+Cached rendering of template fragments.
+
+A page such as results.html is assembled from fragments (components/*.html),
+each rendered from explicit inputs. A fragment is cached under a fingerprint
+of its template name and inputs, so a request whose target card or SERP table
+is unchanged reuses the rendered HTML and only the fragments whose inputs
+changed are rendered again.
+
+Fragments must depend only on the inputs they are given, not on the request.
+"""
+import datetime
+import hashlib
+import logging
+import math
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+from jinja2 import Environment
+from markupsafe import Markup
+
+from services.cache_service import CacheService
+from .metrics import REGISTRY, span
+
+FRAGMENT_LOOKUPS = REGISTRY.counter(
+    'template_fragment_lookups_total',
+    'Template fragment cache lookups by result (hit or miss)',
+    ['fragment', 'result']
+)
+
+def _update(digest, value: Any):
+    """Feed a canonical encoding of value into digest."""
+    if value is None or isinstance(value, (bool, int, str)):
+        digest.update(f"{type(value).__name__}:{value!r};".encode())
+    elif isinstance(value, (float, np.floating)):
+        # NaN != NaN, but missing values should fingerprint alike
+        digest.update(b"nan;" if math.isnan(value) else f"f:{float(value)!r};".encode())
+    elif isinstance(value, np.integer):
+        digest.update(f"int:{int(value)};".encode())
+    elif isinstance(value, pd.DataFrame):
+        digest.update(b"frame:")
+        _update(digest, value.index)
+        for column in value.columns:
+            _update(digest, column)
+            _update(digest, value[column])
+    elif isinstance(value, (pd.Series, pd.Index)):
+        digest.update(f"{type(value).__name__}:{value.dtype}:".encode())
+        _update(digest, value.to_numpy())
+    elif isinstance(value, np.ndarray):
+        digest.update(f"array:{value.dtype}:{value.shape}:".encode())
+        if value.dtype.kind in 'biufM':
+            # The raw buffer; hash_pandas_object costs more than this for the few rows of a results page
+            digest.update(np.ascontiguousarray(value).tobytes())
+        else:
+            _update(digest, value.tolist())
+    elif isinstance(value, dict):
+        digest.update(b"{")
+        for key in sorted(value, key=repr):
+            _update(digest, key)
+            _update(digest, value[key])
+        digest.update(b"}")
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        items = sorted(value, key=repr) if isinstance(value, (set, frozenset)) else value
+        digest.update(b"[")
+        for item in items:
+            _update(digest, item)
+        digest.update(b"]")
+    elif isinstance(value, (datetime.date, datetime.datetime)):
+        digest.update(f"date:{value.isoformat()};".encode())
+    else:
+        digest.update(f"{type(value).__name__}:{value!r};".encode())
+
+def fingerprint(template_name: str, context: Dict[str, Any]) -> str:
+    """Stable digest of a fragment's template name and inputs."""
+    digest = hashlib.blake2b(digest_size=16)
+    _update(digest, template_name)
+    _update(digest, context)
+    return digest.hexdigest()
+
+class FragmentCache:
+    """Renders template fragments through a bounded LRU cache keyed by their inputs."""
+
+    def __init__(self, env: Environment, max_size: int = 256, ttl: Optional[float] = 3600.0):
+        """
+        Args:
+            env: Jinja environment the fragment templates are loaded from
+            max_size: Maximum number of rendered fragments kept (0 renders every time)
+            ttl: Seconds a rendered fragment is kept (None = no expiry)
+        """
+        self.env = env
+        self.cache = CacheService(max_size=max_size, ttl=ttl)
+        self.logger = logging.getLogger(__name__)
+
+    def render(self, template_name: str, **context) -> Markup:
+        """
+        Render a fragment, or return the HTML rendered earlier from the same inputs.
+
+        Args:
+            template_name: Fragment template, e.g. 'components/target_card.html'
+            **context: The fragment's inputs; together with the template name they form the cache key
+        """
+        key = fingerprint(template_name, context)
+        html = self.cache.get(key)
+        fragment = template_name.rsplit('/', 1)[-1].rsplit('.', 1)[0]
+        if html is not None:
+            FRAGMENT_LOOKUPS.inc(fragment=fragment, result='hit')
+            return html
+        FRAGMENT_LOOKUPS.inc(fragment=fragment, result='miss')
+        with span(f'fragment_{fragment}'):
+            html = Markup(self.env.get_template(template_name).render(**context))
+        self.cache.set(key, html)
+        return html
+
+    def stats(self) -> Dict[str, int]:
+        return self.cache.stats()
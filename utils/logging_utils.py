@@ -0,0 +1,172 @@
+"""
+Logging pipeline helpers.
+
+config/settings.LOGGING wires these together: records pass a per-logger
+SamplingFilter on the calling thread, then AsyncQueueHandler merges each
+message with its arguments and hands the record to a QueueListener thread
+that does the formatting and I/O. Expensive payloads are wrapped in Lazy so
+they are only computed for records that pass the level and sampling checks.
+
+    logger.debug("Sample of GA4 data:\n%s", Lazy(frame_preview, ga4_data))
+"""
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Dict, List, Optional
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+class Lazy:
+    """Defers an expensive log argument until the record is emitted."""
+    __slots__ = ('func', 'args')
+
+    def __init__(self, func: Callable, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self) -> str:
+        return str(self.func(*self.args))
+
+    __repr__ = __str__
+
+def frame_preview(df, rows: int = 5) -> str:
+    """Render the first rows of a DataFrame for a log message."""
+    return df.head(rows).to_string()
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a share of DEBUG/INFO records per logger.
+
+    Args:
+        rates: Logger name (or dotted prefix) -> share of records kept, e.g.
+            {'engine': 0.1}. The longest matching prefix wins; WARNING and
+            above always pass.
+    """
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self._resolved: Dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate, best = 1.0, -1
+            for prefix, prefix_rate in self.rates.items():
+                if (name == prefix or name.startswith(prefix + '.')) and len(prefix) > best:
+                    rate, best = prefix_rate, len(prefix)
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the standard fields plus any `extra=` values."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload['exc_info'] = record.exc_text
+        if record.stack_info:
+            payload['stack_info'] = record.stack_info
+        return json.dumps(payload, default=str)
+
+class AsyncQueueHandler(QueueHandler):
+    """
+    Queue records for a background QueueListener that formats and writes them.
+
+    Like logging.handlers.QueueHandler, the message is merged with its
+    arguments (Lazy ones included) and the traceback rendered on the calling
+    thread, so the record reflects the state at the time of the call and holds
+    no references to the arguments. The formatter runs on the listener. The
+    listener starts on first use in each process, so it also works in forked
+    gunicorn workers.
+
+    Args:
+        handlers: Names of handlers (from the same dictConfig, defined before
+            this one) that the listener writes to
+        maxsize: Queue capacity; records are dropped and counted when full
+    """
+
+    def __init__(self, handlers: List[str], maxsize: int = 10000):
+        super().__init__(queue.Queue(maxsize))
+        self.maxsize = maxsize
+        self.targets = [self._resolve(name) for name in handlers]
+        self.dropped = 0
+        self._listener: Optional[QueueListener] = None
+        self._listener_pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+
+    @staticmethod
+    def _resolve(name: str) -> logging.Handler:
+        # dictConfig creates handlers in name order and registers each one by name
+        handler = logging._handlers.get(name)
+        if handler is None:
+            raise ValueError(f"Handler '{name}' must be configured before the queue handler")
+        return handler
+
+    def _ensure_listener(self):
+        with self._start_lock:
+            if self._listener_pid == os.getpid():
+                return
+            # A listener inherited over fork has no thread in this process
+            self.queue = queue.Queue(self.maxsize)
+            self._listener = QueueListener(self.queue, *self.targets, respect_handler_level=True)
+            self._listener.start()
+            self._listener_pid = os.getpid()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        # getMessage() renders Lazy arguments along with the rest
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if self._listener_pid != os.getpid():
+            self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Block until queued records have been written."""
+        if self._listener_pid == os.getpid():
+            self.queue.join()
+
+    def close(self):
+        # Called by logging.shutdown() at exit, which drains the queue before the targets close
+        if self._listener is not None and self._listener_pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+            self._listener_pid = None
+        super().close()
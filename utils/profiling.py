@@ -0,0 +1,248 @@
+"""
+Opt-in profiling of individual requests.
+
+A request is captured when it carries a valid signed X-Profile header or is
+picked by the PROFILE_SAMPLE_RATE admin setting. Each capture writes a
+cProfile dump, a tracemalloc snapshot and the request parameters to its own
+directory under PROFILE_DIR. When neither trigger is configured, profiled()
+returns the view unchanged.
+
+Usage:
+    python -m utils.profiling token [--ttl 600]        # header value for X-Profile
+    python -m utils.profiling list
+    python -m utils.profiling show CAPTURE [--sort cumulative] [--limit 30] [--memory-top 15]
+"""
+import argparse
+import asyncio
+import cProfile
+import functools
+import hashlib
+import hmac
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from config import PROFILE_DIR, PROFILE_SECRET, PROFILE_SAMPLE_RATE
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_CAPTURE_HEADER = 'X-Profile-Capture'
+
+# Form/query fields never written to request.json
+_REDACTED_FIELDS = {'key', 'api_key', 'token', 'password'}
+
+logger = logging.getLogger(__name__)
+
+# cProfile and tracemalloc are process-wide, so only one capture runs at a time
+_capture_lock = threading.Lock()
+
+def profiling_enabled() -> bool:
+    """Whether any profiling trigger is configured."""
+    return bool(PROFILE_SECRET) or PROFILE_SAMPLE_RATE > 0
+
+def sign_profile_token(expires: int, secret: str = PROFILE_SECRET) -> str:
+    """Create an X-Profile header value valid until the unix time `expires`."""
+    signature = hmac.new(secret.encode(), str(expires).encode(), hashlib.sha256).hexdigest()
+    return f"{expires}.{signature}"
+
+def verify_profile_token(token: str, secret: str = PROFILE_SECRET) -> bool:
+    """Check an X-Profile header value's signature and expiry."""
+    if not secret:
+        return False
+    expires, _, signature = token.partition('.')
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    expected = sign_profile_token(int(expires), secret).partition('.')[2]
+    return hmac.compare_digest(signature, expected)
+
+def _trigger() -> Optional[str]:
+    """Return why the current request should be profiled, or None."""
+    from flask import request
+
+    token = request.headers.get(PROFILE_HEADER)
+    if token and verify_profile_token(token):
+        return 'header'
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return 'sampled'
+    return None
+
+class _Capture:
+    """One request's CPU profile and allocation snapshot."""
+
+    def __init__(self, trigger: str):
+        from flask import request
+
+        self.trigger = trigger
+        self.capture_id = f"{datetime.now():%Y%m%dT%H%M%S}-{request.endpoint or 'unknown'}-{uuid.uuid4().hex[:8]}"
+        self.request_info = {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'args': {k: v for k, v in request.args.items() if k not in _REDACTED_FIELDS},
+            'form': {k: v for k, v in request.form.items() if k not in _REDACTED_FIELDS},
+        }
+        self.profiler = cProfile.Profile()
+        self.started_tracemalloc = False
+        self.start = 0.0
+
+    def begin(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            self.started_tracemalloc = True
+        self.start = time.perf_counter()
+        self.profiler.enable()
+
+    def end(self, error: Optional[BaseException] = None):
+        self.profiler.disable()
+        elapsed = time.perf_counter() - self.start
+        snapshot = tracemalloc.take_snapshot()
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+
+        path = os.path.join(PROFILE_DIR, self.capture_id)
+        os.makedirs(path, exist_ok=True)
+        self.profiler.dump_stats(os.path.join(path, 'cpu.prof'))
+        snapshot.dump(os.path.join(path, 'memory.snapshot'))
+        with open(os.path.join(path, 'request.json'), 'w') as f:
+            json.dump({
+                **self.request_info,
+                'trigger': self.trigger,
+                'captured_at': datetime.now().isoformat(),
+                'duration_seconds': elapsed,
+                'error': repr(error) if error else None,
+            }, f, indent=2)
+        logger.info(f"Wrote profile capture {path} ({elapsed:.2f}s)")
+
+def _start_capture() -> Optional[_Capture]:
+    trigger = _trigger()
+    if trigger is None or not _capture_lock.acquire(blocking=False):
+        return None
+    capture = _Capture(trigger)
+    try:
+        from flask import after_this_request
+
+        @after_this_request
+        def add_capture_header(response):
+            response.headers[PROFILE_CAPTURE_HEADER] = capture.capture_id
+            return response
+
+        capture.begin()
+    except BaseException:
+        _capture_lock.release()
+        raise
+    return capture
+
+def _finish_capture(capture: _Capture, error: Optional[BaseException]):
+    try:
+        capture.end(error)
+    except Exception as e:
+        logger.error(f"Error writing profile capture {capture.capture_id}: {str(e)}")
+    finally:
+        _capture_lock.release()
+
+def profiled(func: Callable) -> Callable:
+    """
+    Decorate a Flask view so triggered requests are profiled.
+
+    Returns the view itself when profiling is not configured, so there is no
+    per-request cost unless PROFILE_SECRET or PROFILE_SAMPLE_RATE is set.
+    """
+    if not profiling_enabled():
+        return func
+
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            capture = _start_capture()
+            if capture is None:
+                return await func(*args, **kwargs)
+            error = None
+            try:
+                return await func(*args, **kwargs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                _finish_capture(capture, error)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        capture = _start_capture()
+        if capture is None:
+            return func(*args, **kwargs)
+        error = None
+        try:
+            return func(*args, **kwargs)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _finish_capture(capture, error)
+    return wrapper
+
+def list_captures(profile_dir: str = PROFILE_DIR) -> List[Dict]:
+    """Return the request.json of every capture, newest first."""
+    if not os.path.isdir(profile_dir):
+        return []
+    captures = []
+    for name in sorted(os.listdir(profile_dir), reverse=True):
+        info_path = os.path.join(profile_dir, name, 'request.json')
+        if os.path.exists(info_path):
+            with open(info_path) as f:
+                captures.append({'id': name, **json.load(f)})
+    return captures
+
+def show_capture(capture_id: str, sort: str = 'cumulative', limit: int = 30, memory_top: int = 15,
+                 profile_dir: str = PROFILE_DIR):
+    """Print a capture's request parameters, CPU hot spots and top allocation sites."""
+    path = os.path.join(profile_dir, capture_id)
+    with open(os.path.join(path, 'request.json')) as f:
+        print(json.dumps(json.load(f), indent=2))
+
+    print(f"\n=== CPU profile (sorted by {sort}) ===")
+    pstats.Stats(os.path.join(path, 'cpu.prof')).strip_dirs().sort_stats(sort).print_stats(limit)
+
+    print(f"=== Top {memory_top} allocation sites ===")
+    snapshot = tracemalloc.Snapshot.load(os.path.join(path, 'memory.snapshot'))
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ])
+    for stat in snapshot.statistics('lineno')[:memory_top]:
+        print(stat)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    token_parser = subparsers.add_parser('token', help='Print a signed X-Profile header value')
+    token_parser.add_argument('--ttl', type=int, default=600, help='Seconds the token stays valid')
+    subparsers.add_parser('list', help='List captures')
+    show_parser = subparsers.add_parser('show', help='Print a capture')
+    show_parser.add_argument('capture')
+    show_parser.add_argument('--sort', default='cumulative', help='pstats sort key (cumulative, tottime, ...)')
+    show_parser.add_argument('--limit', type=int, default=30)
+    show_parser.add_argument('--memory-top', type=int, default=15)
+    args = parser.parse_args()
+
+    if args.command == 'token':
+        if not PROFILE_SECRET:
+            parser.error('PROFILE_SECRET is not set')
+        print(f"{PROFILE_HEADER}: {sign_profile_token(int(time.time()) + args.ttl)}")
+    elif args.command == 'list':
+        for capture in list_captures():
+            params = {**capture['args'], **capture['form']}
+            print(f"{capture['id']}  {capture['method']} {capture['path']}  "
+                  f"{capture['duration_seconds']:.2f}s  {capture['trigger']}  {params}")
+    else:
+        show_capture(args.capture, args.sort, args.limit, args.memory_top)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,362 @@
+"""
+Deadlines, circuit breakers and disconnect cancellation for outbound calls.
+
+A request gets one time budget (request_budget). Serper and SEMrush calls
+made while it runs take their timeout from what is left of it
+(call_timeout) and are cancelled when it runs out (within_budget), so a
+chain of calls cannot outlast the request timeout. Once the budget is spent,
+further calls fail fast with DeadlineExceeded and the request is served with
+what it has.
+
+Each upstream has a circuit breaker. After a run of consecutive failures
+(errors, timeouts, 5xx and 429 responses) the circuit opens, and calls fail
+at once with CircuitOpen instead of waiting out their timeout. Callers fall
+back to cached or partial data. After reset_timeout one trial call is let
+through; if it succeeds, the circuit closes again.
+
+A view wrapped in request_budget is also cancelled when its client
+disconnects, so abandoned analyses stop making upstream calls. Under the
+ASGI server, asgi.py reports the disconnect. Under gunicorn, request_budget
+polls the client socket that gunicorn exposes in the environ. Other WSGI
+servers expose neither, so their requests run to the end of their budget.
+"""
+import asyncio
+import functools
+import logging
+import socket
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+import httpx
+
+from config import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS
+from .metrics import REGISTRY
+
+# WSGI environ key under which asgi.py exposes the request's ClientDisconnect
+DISCONNECT_ENVIRON_KEY = 'carrot.client_disconnect'
+# WSGI environ key under which gunicorn exposes the client socket
+GUNICORN_SOCKET_ENVIRON_KEY = 'gunicorn.socket'
+# How often request_budget checks a gunicorn client socket for a disconnect, in seconds
+DISCONNECT_POLL_SECONDS = 0.5
+# Calls are not started with less budget than this, in seconds
+MIN_CALL_BUDGET = 0.05
+# A timed-out call counts against the upstream only if it was given at least this long, in seconds
+MIN_JUDGED_TIMEOUT = 1.0
+
+CIRCUIT_STATE = REGISTRY.gauge(
+    'upstream_circuit_state',
+    'Circuit breaker state per upstream (0 closed, 1 half-open, 2 open)',
+    ['upstream']
+)
+CIRCUIT_REJECTIONS = REGISTRY.counter(
+    'upstream_circuit_rejections_total',
+    'Outbound calls failed fast because the upstream circuit was open',
+    ['upstream']
+)
+DEADLINE_SKIPS = REGISTRY.counter(
+    'upstream_deadline_skips_total',
+    'Outbound calls not made because the request budget was spent',
+    ['upstream']
+)
+DEADLINE_CUTS = REGISTRY.counter(
+    'upstream_deadline_cuts_total',
+    'Outbound calls cancelled in flight because the request budget ran out',
+    ['upstream']
+)
+
+logger = logging.getLogger(__name__)
+
+# time.monotonic() by which the current request's outbound calls must finish; None = no deadline
+_deadline: ContextVar[Optional[float]] = ContextVar('request_deadline', default=None)
+
+class DeadlineExceeded(Exception):
+    """The request's time budget is spent."""
+
+class CircuitOpen(Exception):
+    """The upstream's circuit is open; the call was not made."""
+
+@contextmanager
+def deadline(seconds: float):
+    """Give the enclosed block a budget of `seconds`; never extends an enclosing deadline."""
+    target = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(target if current is None else min(current, target))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request's budget, or None without a deadline."""
+    target = _deadline.get()
+    return None if target is None else target - time.monotonic()
+
+def call_timeout(default: float, upstream: str) -> float:
+    """
+    Timeout for one outbound call: `default`, cut to the remaining budget.
+
+    Raises:
+        DeadlineExceeded: Less than MIN_CALL_BUDGET is left
+    """
+    left = remaining()
+    if left is None:
+        return default
+    if left < MIN_CALL_BUDGET:
+        DEADLINE_SKIPS.inc(upstream=upstream)
+        raise DeadlineExceeded(f"Request budget spent before calling {upstream}")
+    return min(default, left)
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one upstream, shared by every thread and loop."""
+
+    CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, upstream: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Args:
+            upstream: Name used in metrics and logs ('serper', 'semrush')
+            failure_threshold: Consecutive failures that open the circuit (0 = never open)
+            reset_timeout: Seconds the circuit stays open before a trial call
+        """
+        self.upstream = upstream
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+        CIRCUIT_STATE.set(0, upstream=upstream)
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; in half-open state only one trial call at a time."""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def is_open(self) -> bool:
+        """Whether calls are currently being failed fast (open, and not yet due for a trial call)."""
+        with self._lock:
+            return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial_running = False
+            if self.state != self.CLOSED:
+                self.logger.info("Circuit for %s closed", self.upstream)
+                self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or (
+                    self.failure_threshold and self.failures >= self.failure_threshold and self.state == self.CLOSED):
+                self.opened_at = time.monotonic()
+                self.logger.warning("Circuit for %s opened after %d consecutive failures; failing fast for %.0fs",
+                                    self.upstream, self.failures, self.reset_timeout)
+                self._set_state(self.OPEN)
+
+    def release(self):
+        """End a call that neither succeeded nor failed (cancelled, or cut short by the request budget)."""
+        with self._lock:
+            self._trial_running = False
+
+    @contextmanager
+    def guard(self):
+        """
+        Run one call through the breaker.
+
+        Exceptions count as failures, except cancellation and timeouts of calls
+        the request budget left too little time to judge the upstream by. Take
+        the call's timeout from call.timeout(), await it through
+        call.within_budget(), and set `call.failed` for failed responses.
+
+        Usage:
+            with breaker.guard() as call:
+                response = await call.within_budget(client.get(..., timeout=call.timeout(30.0)))
+                call.failed = response.status_code >= 500
+
+        Raises:
+            CircuitOpen: The circuit is open
+        """
+        if not self.allow():
+            CIRCUIT_REJECTIONS.inc(upstream=self.upstream)
+            raise CircuitOpen(f"Circuit for {self.upstream} is open")
+        call = _GuardedCall(self.upstream)
+        try:
+            yield call
+        except (asyncio.CancelledError, DeadlineExceeded):
+            self.release()
+            raise
+        except httpx.TimeoutException:
+            if call.timeout_seconds is not None and call.timeout_seconds < MIN_JUDGED_TIMEOUT:
+                self.release()
+            else:
+                self.record_failure()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        if call.failed:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def snapshot(self) -> Dict:
+        return {'state': self.state, 'consecutive_failures': self.failures}
+
+    def _set_state(self, state: str):
+        # Called with the lock held
+        self.state = state
+        CIRCUIT_STATE.set(self._STATE_VALUES[state], upstream=self.upstream)
+
+class _GuardedCall:
+    """Handle for a guarded call; set `failed` for a response that counts as a failure."""
+    __slots__ = ('upstream', 'failed', 'timeout_seconds')
+
+    def __init__(self, upstream: str):
+        self.upstream = upstream
+        self.failed = False
+        self.timeout_seconds: Optional[float] = None
+
+    def timeout(self, default: float) -> float:
+        """The call's timeout: `default`, cut to the request's remaining budget (see call_timeout)."""
+        self.timeout_seconds = call_timeout(default, self.upstream)
+        return self.timeout_seconds
+
+    async def within_budget(self, awaitable):
+        """
+        Await the call, cancelling it when the request's budget runs out.
+
+        httpx timeouts apply per phase (connect, each read), so a response that
+        keeps trickling in would otherwise outlast the budget.
+
+        Raises:
+            DeadlineExceeded: The budget ran out before the call finished
+        """
+        left = remaining()
+        if left is None:
+            return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, max(left, 0.0))
+        except asyncio.TimeoutError:
+            DEADLINE_CUTS.inc(upstream=self.upstream)
+            raise DeadlineExceeded(f"Request budget ran out during a {self.upstream} call") from None
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def circuit_breaker(upstream: str) -> CircuitBreaker:
+    """The process-wide breaker for an upstream."""
+    with _breakers_lock:
+        breaker = _breakers.get(upstream)
+        if breaker is None:
+            breaker = _breakers[upstream] = CircuitBreaker(upstream, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS)
+        return breaker
+
+def circuit_snapshot() -> Dict[str, Dict]:
+    """State of every upstream's breaker."""
+    with _breakers_lock:
+        return {upstream: breaker.snapshot() for upstream, breaker in sorted(_breakers.items())}
+
+class ClientDisconnect:
+    """Set by the server when the client goes away; cancels the tasks registered with it."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._tasks = []
+        self._lock = threading.Lock()
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def set(self):
+        with self._lock:
+            self._event.set()
+            tasks, self._tasks = self._tasks, []
+        for loop, task in tasks:
+            loop.call_soon_threadsafe(task.cancel)
+
+    def cancel_on_set(self, task: asyncio.Task):
+        """Cancel `task` (on its own loop) when the client disconnects."""
+        with self._lock:
+            if not self._event.is_set():
+                self._tasks.append((task.get_loop(), task))
+                return
+        task.cancel()
+
+class ClientDisconnected(Exception):
+    """The client went away while the view was running."""
+
+async def _watch_socket(sock: socket.socket, disconnect: ClientDisconnect):
+    """Set `disconnect` once the client closes its end of `sock`."""
+    while True:
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+        try:
+            # Pipelined bytes of a next request peek as data; only the client closing its end reads empty
+            closed = sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b''
+        except (BlockingIOError, InterruptedError):
+            continue
+        except ValueError:
+            return  # TLS sockets cannot be peeked at
+        except OSError:
+            closed = True
+        if closed:
+            disconnect.set()
+            return
+
+def request_budget(seconds: float) -> Callable:
+    """
+    Decorate an async Flask view with a time budget for its outbound calls.
+
+    The budget counts from the start of the request (so time spent queued
+    for admission counts too). Under asgi.py or gunicorn the view is
+    cancelled if the client disconnects, and ClientDisconnected is raised
+    instead.
+
+    Args:
+        seconds: The budget (0 = no deadline; disconnects still cancel)
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            from flask import g, request
+
+            budget = seconds - (time.perf_counter() - g.request_start) if 'request_start' in g else seconds
+            with deadline(budget) if seconds else nullcontext():
+                disconnect = request.environ.get(DISCONNECT_ENVIRON_KEY)
+                sock = request.environ.get(GUNICORN_SOCKET_ENVIRON_KEY) if disconnect is None else None
+                watcher = None
+                if sock is not None:
+                    disconnect = ClientDisconnect()
+                    watcher = asyncio.ensure_future(_watch_socket(sock, disconnect))
+                if disconnect is None:
+                    return await func(*args, **kwargs)
+                # The task copies the current context, deadline included
+                task = asyncio.ensure_future(func(*args, **kwargs))
+                disconnect.cancel_on_set(task)
+                try:
+                    return await task
+                except asyncio.CancelledError:
+                    if disconnect.is_set():
+                        logger.info("Client disconnected from %s; cancelled the request", request.path)
+                        raise ClientDisconnected(request.path)
+                    raise
+                finally:
+                    if watcher is not None:
+                        watcher.cancel()
+        return wrapper
+    return decorator
@@ -0,0 +1,186 @@
+"""
+Content-hashed, precompressed static assets.
+
+Building copies every file under static/ into a dist directory under a name
+that includes a hash of its content (js/chart_utils.js ->
+js/chart_utils.3f2a1b9c.js). Compressible files also get .gz and, with the
+optional brotli package, .br siblings at the highest compression levels. A
+manifest maps each source path to its hashed name. Templates link assets
+with asset_url(), and the app serves them from /assets/ with a one-year
+immutable Cache-Control: a changed file gets a new URL, so a cached copy
+never goes stale.
+
+Run the build as a deploy step; the app also rebuilds at import when the
+manifest is missing or out of date.
+
+Usage:
+    python -m utils.static_assets [--source static] [--dist static/dist]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import sys
+import tempfile
+from typing import Dict, Optional, Tuple
+
+from config.settings import BASE_DIR, STATIC_DIST_DIR
+from .compression import COMPRESSIBLE_TYPES
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+# Cache-Control for hashed assets: a year, and no revalidation
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Precompressed variants, most preferred first: (Content-Encoding, file suffix)
+_VARIANTS = [('br', '.br'), ('gzip', '.gz')]
+
+def _write_atomic(path: str, data: bytes):
+    """Write via a temporary file and rename, so concurrent readers never see a partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, partial = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.partial-')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(partial, path)
+
+class StaticAssets:
+    """Hashed, precompressed copies of a static directory, and the manifest that names them."""
+
+    def __init__(self, source_dir: str, dist_dir: str):
+        """
+        Args:
+            source_dir: Directory of source assets (the Flask static folder)
+            dist_dir: Where the hashed and compressed copies and the manifest are written
+        """
+        self.source_dir = os.path.abspath(source_dir)
+        self.dist_dir = os.path.abspath(dist_dir)
+        self.logger = logging.getLogger(__name__)
+        self.manifest: Dict[str, Dict] = {}
+        self._by_path: Dict[str, Dict] = {}
+
+    def _sources(self):
+        """Source files as (relative path, absolute path), skipping the dist directory."""
+        for root, dirs, files in os.walk(self.source_dir):
+            dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != self.dist_dir)
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, self.source_dir).replace(os.sep, '/'), path
+
+    def _digests(self) -> Dict[str, str]:
+        digests = {}
+        for rel, path in self._sources():
+            with open(path, 'rb') as f:
+                digests[rel] = hashlib.sha256(f.read()).hexdigest()
+        return digests
+
+    def build(self) -> Dict[str, Dict]:
+        """
+        Write hashed and precompressed copies of every source file and a new manifest.
+
+        Returns:
+            The manifest: source path -> {'path': hashed path, 'sha256', 'size', 'encodings': {...}}
+        """
+        manifest = {}
+        for rel, path in self._sources():
+            with open(path, 'rb') as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+            stem, ext = os.path.splitext(rel)
+            hashed = f"{stem}.{digest[:10]}{ext}"
+            target = os.path.join(self.dist_dir, hashed)
+            _write_atomic(target, data)
+
+            encodings = {}
+            if mimetypes.guess_type(rel)[0] in COMPRESSIBLE_TYPES:
+                # mtime=0 keeps the gzip output identical across builds
+                variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+                if brotli is not None:
+                    variants['br'] = brotli.compress(data, quality=11)
+                for encoding, suffix in _VARIANTS:
+                    if encoding in variants and len(variants[encoding]) < len(data):
+                        _write_atomic(target + suffix, variants[encoding])
+                        encodings[encoding] = len(variants[encoding])
+            manifest[rel] = {'path': hashed, 'sha256': digest, 'size': len(data), 'encodings': encodings}
+
+        _write_atomic(os.path.join(self.dist_dir, MANIFEST_NAME), json.dumps(manifest, indent=2).encode())
+        self._use(manifest)
+        self.logger.info("Built %d static assets into %s", len(manifest), self.dist_dir)
+        return manifest
+
+    def load(self, rebuild: bool = True) -> Dict[str, Dict]:
+        """
+        Load the manifest, rebuilding first if it is missing or a source changed.
+
+        Args:
+            rebuild: Rebuild a missing or stale manifest (otherwise stale entries are dropped)
+        """
+        manifest_path = os.path.join(self.dist_dir, MANIFEST_NAME)
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = None
+        digests = self._digests()
+        stale = manifest is None or {rel: entry['sha256'] for rel, entry in manifest.items()} != digests
+        if stale and rebuild:
+            try:
+                return self.build()
+            except OSError as e:
+                # A read-only deploy falls back to plain /static URLs for whatever is stale
+                self.logger.warning("Could not build static assets in %s: %s", self.dist_dir, e)
+        self._use({rel: entry for rel, entry in (manifest or {}).items() if digests.get(rel) == entry['sha256']})
+        return self.manifest
+
+    def _use(self, manifest: Dict[str, Dict]):
+        self.manifest = manifest
+        self._by_path = {entry['path']: entry for entry in manifest.values()}
+
+    def hashed_path(self, filename: str) -> Optional[str]:
+        """Hashed path of a source asset, or None if it is not in the manifest."""
+        entry = self.manifest.get(filename)
+        return entry['path'] if entry else None
+
+    def resolve(self, hashed: str, accepted) -> Optional[Tuple[str, Optional[str], str]]:
+        """
+        The file to send for a hashed asset path.
+
+        Args:
+            hashed: Hashed path, as returned by hashed_path
+            accepted: The request's accept_encodings
+
+        Returns:
+            (file path, Content-Encoding or None, mimetype), or None for unknown paths
+        """
+        entry = self._by_path.get(hashed)
+        if entry is None:
+            return None
+        path = os.path.join(self.dist_dir, hashed)
+        mimetype = mimetypes.guess_type(hashed)[0] or 'application/octet-stream'
+        for encoding, suffix in _VARIANTS:
+            if encoding in entry['encodings'] and accepted[encoding] and os.path.exists(path + suffix):
+                return path + suffix, encoding, mimetype
+        return path, None, mimetype
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default=os.path.join(BASE_DIR, 'static'), help='Source asset directory')
+    parser.add_argument('--dist', default=STATIC_DIST_DIR, help='Output directory')
+    args = parser.parse_args()
+
+    manifest = StaticAssets(args.source, args.dist).build()
+    for rel, entry in manifest.items():
+        sizes = ', '.join(f"{encoding} {size:,}" for encoding, size in entry['encodings'].items())
+        print(f"{rel} -> {entry['path']} ({entry['size']:,} bytes{'; ' + sizes if sizes else ''})", file=sys.stderr)
+    if brotli is None:
+        print("brotli is not installed; only .gz variants were written (pip install brotli)", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
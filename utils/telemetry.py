@@ -0,0 +1,116 @@
+"""
+Client-side telemetry for outbound API calls (Serper, SEMrush).
+
+Every call is recorded in the process metrics registry, so it is exported
+on /metrics alongside the stage timings; snapshot() returns the same data
+as a dictionary for in-process use.
+"""
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from utils.metrics import REGISTRY, MetricsRegistry
+
+UPSTREAM_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0, 10.0, 30.0)
+
+class _Call:
+    """Handle for an in-progress call; set `status` to the HTTP status code."""
+    __slots__ = ('status',)
+
+    def __init__(self):
+        self.status: Optional[int] = None
+
+class UpstreamTelemetry:
+    """Latency, status, in-flight, cache and credit metrics per upstream."""
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY):
+        self.latency = registry.histogram(
+            'upstream_request_duration_seconds',
+            'Latency of outbound API calls',
+            ['upstream'],
+            buckets=UPSTREAM_BUCKETS
+        )
+        self.responses = registry.counter(
+            'upstream_responses_total',
+            'Outbound API calls by response status (or exception type)',
+            ['upstream', 'status']
+        )
+        self.in_flight = registry.gauge(
+            'upstream_requests_in_flight',
+            'Outbound API calls currently waiting on a response',
+            ['upstream']
+        )
+        self.cache = registry.counter(
+            'upstream_cache_lookups_total',
+            'Cache lookups in front of outbound API calls by result (hit, miss, stale)',
+            ['upstream', 'result']
+        )
+        self.credits = registry.counter(
+            'upstream_credits_consumed_total',
+            'API credits/units consumed by successful calls',
+            ['upstream']
+        )
+        self._upstreams = set()
+
+    @asynccontextmanager
+    async def track(self, upstream: str):
+        """
+        Time one outbound call.
+
+        Usage:
+            async with telemetry.track('serper') as call:
+                response = await client.post(...)
+                call.status = response.status_code
+        """
+        self._upstreams.add(upstream)
+        call = _Call()
+        self.in_flight.inc(upstream=upstream)
+        start = time.perf_counter()
+        try:
+            yield call
+        except BaseException as e:
+            call.status = type(e).__name__
+            raise
+        finally:
+            self.in_flight.dec(upstream=upstream)
+            self.latency.observe(time.perf_counter() - start, upstream=upstream)
+            self.responses.inc(upstream=upstream, status=call.status if call.status is not None else 'unknown')
+
+    def record_cache(self, upstream: str, result: str):
+        """Record a cache lookup; result is 'hit', 'miss' or 'stale'."""
+        self._upstreams.add(upstream)
+        self.cache.inc(upstream=upstream, result=result)
+
+    def record_credits(self, upstream: str, amount: float):
+        """Record credits/units consumed by a successful call."""
+        self._upstreams.add(upstream)
+        self.credits.inc(amount, upstream=upstream)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Return current telemetry per upstream as plain values."""
+        statuses = self.responses.collect()
+        cache = self.cache.collect()
+        latency = self.latency.collect()
+
+        result = {}
+        for upstream in sorted(self._upstreams):
+            status_counts = {status: int(count) for (name, status), count in statuses.items() if name == upstream}
+            cache_counts = {kind: int(cache.get((upstream, kind), 0)) for kind in ('hit', 'miss', 'stale')}
+            lookups = sum(cache_counts.values())
+            series = latency.get((upstream,))
+            result[upstream] = {
+                'requests': sum(status_counts.values()),
+                'status_counts': status_counts,
+                'in_flight': int(self.in_flight.value(upstream=upstream)),
+                'latency_seconds': {
+                    'mean': series['sum'] / series['count'] if series and series['count'] else None,
+                    'p50': self.latency.quantile(0.50, upstream=upstream),
+                    'p95': self.latency.quantile(0.95, upstream=upstream),
+                    'p99': self.latency.quantile(0.99, upstream=upstream),
+                },
+                'cache': {**cache_counts, 'hit_ratio': cache_counts['hit'] / lookups if lookups else None},
+                'credits_consumed': self.credits.value(upstream=upstream),
+            }
+        return result
+
+TELEMETRY = UpstreamTelemetry()